@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+import os
+import sys
+import multiprocessing
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools import simulator
+
+help = """%prog [-P <processes>] [-a <agents>] [-t <targets>] [-i <interfaces>] [-m <metrics>] [-D <seconds>]
+Description: Measures the polls/second of the sharded collector for growing
+numbers of worker processes against local simulated agents, each device
+polled back to back. The simulators run in processes of their own, so keep
+cores free for them or the agents become the bottleneck."""
+
+def serveAgents(options, port, count, ready):
+    agent = simulator.SimulatedAgent(interfaces = options.interfaces,
+                                     disks      = options.disks,
+                                     latency    = options.latency / 1000.0)
+    agent.serve("127.0.0.1", port, ready=ready, count=count)
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-P", "--processes", dest = "processes", type = "string", default = None,
+        help = "comma separated numbers of worker processes, defaults to 1,2,4,... up to the number of cores")
+    parser.add_option("-a", "--agents", dest = "agents", type = "int", default = max(1, (os.cpu_count() or 2) // 2),
+        help = "simulator processes, defaults to half the cores")
+    parser.add_option("-t", "--targets", dest = "targets", type = "int", default = 64,
+        help = "simulated devices, one UDP port each, defaults to '64'")
+    parser.add_option("-i", "--interfaces", dest = "interfaces", type = "int", default = 100)
+    parser.add_option("-k", "--disks", dest = "disks", type = "int", default = 10)
+    parser.add_option("-m", "--metrics", dest = "metrics", default = "load,memory,uptime,interface")
+    parser.add_option("-w", "--workers", dest = "workers", type = "int", default = 8,
+        help = "polling threads per worker process, defaults to '8'")
+    parser.add_option("-s", "--snmp-version", dest = "snmp_version", default = "2", choices = ("1", "2"))
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 20000)
+    parser.add_option("-D", "--duration", dest = "duration", type = "float", default = 10.0,
+        help = "seconds each configuration polls, defaults to '10'")
+    parser.add_option("--latency", dest = "latency", type = "float", default = 0.0)
+    (options, args) = parser.parse_args()
+
+    from snmp_tools.collector import Collector
+    from snmp_tools.options import addStateOptions, addTableOptions, createParser
+
+    # The agents, each serving a range of the target ports
+    agents = []
+    per_agent = (options.targets + options.agents - 1) // options.agents
+    for number in range(options.agents):
+        count = min(per_agent, options.targets - number * per_agent)
+        if count <= 0:
+            break
+        ready = multiprocessing.Event()
+        agent = multiprocessing.Process(target=serveAgents, args=(options, options.port + number * per_agent, count, ready))
+        agent.daemon = True
+        agent.start()
+        ready.wait()
+        agents.append(agent)
+
+    parser = createParser("")
+    addTableOptions(parser)
+    addStateOptions(parser)
+    (collector_options, collector_args) = parser.parse_args(["-s", options.snmp_version, "-w", str(options.workers)])
+    targets = [{"host": "127.0.0.1", "port": options.port + number, "community": "public"}
+               for number in range(options.targets)]
+    metrics = options.metrics.split(",")
+    if options.processes:
+        counts = [int(n) for n in options.processes.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+
+    first = None
+    print("%9s %12s %10s %9s" % ("processes", "polls/s", "speedup", "errors"))
+    for processes in counts:
+        errors = [0]
+        def sink(target, timestamp, results, error):
+            if error is not None:
+                errors[0] += 1
+        collector = Collector(collector_options, targets, metrics, sink, processes, 0.0)
+        collector.start()
+        try:
+            collector.run(options.duration)
+        finally:
+            collector.stop()
+        rate = collector.results / options.duration
+        if first is None:
+            first = rate
+        print("%9d %12.1f %9.2fx %9d" % (processes, rate, rate / first if first else 0.0, errors[0]))
+    for agent in agents:
+        agent.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import multiprocessing
+from optparse import OptionParser
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools import simulator
+from snmp_tools.engine import EngineSession
+from snmp_tools.pollers import if_table_columns, sys_uptime_oid
+from snmp_tools.table import walkTable
+from snmp_tools.varbind import VarList, Varbind
+
+help = """%prog [-n <polls>] [-p <port>] [-D <devices>] [-i <interfaces>] [-w <workers>]
+Description: Compares the netsnmp bindings with the pure-Python engine of
+--snmp-engine python against a local simulated agent: GETBULK walks of the
+ifTable of one device, and GETs of sysUpTime of many devices from a pool of
+threads. Reports PDUs per second and milliseconds per poll of each."""
+
+def serveAgent(port, devices, interfaces, ready):
+    simulator.SimulatedAgent(interfaces=interfaces).serve("127.0.0.1", port, ready=ready, count=devices)
+
+def netsnmpSession(port):
+    import netsnmp
+    return netsnmp.Session(DestHost="127.0.0.1", Version=2, Community="public", RemotePort=port,
+                           UseNumeric=True, Timeout=1000000, Retries=3)
+
+def engineSession(port):
+    return EngineSession(DestHost="127.0.0.1", Version=2, Community="public", RemotePort=port,
+                         UseNumeric=True, Timeout=1000000, Retries=3)
+
+def benchWalk(create, port, polls, max_repetitions):
+    session = create(port)
+    counters = {}
+    started = time.perf_counter()
+    for i in range(polls):
+        rows = walkTable(session, if_table_columns, max_repetitions, counters)
+        if session.ErrorStr:
+            raise RuntimeError(session.ErrorStr)
+    return time.perf_counter() - started, sum(counters.values()), len(rows)
+
+def benchScalars(create, port, devices, polls, workers):
+    sessions = [create(port + number) for number in range(devices)]
+    def poll(session):
+        for i in range(polls):
+            session.get(VarList(Varbind(sys_uptime_oid)))
+            if session.ErrorStr:
+                raise RuntimeError(session.ErrorStr)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(poll, sessions):
+            pass
+    return time.perf_counter() - started, devices * polls
+
+def report(label, elapsed, pdus, polls):
+    print("%-24s %10.0f PDUs/s %10.2f ms/poll" % (label, pdus / elapsed, elapsed * 1000.0 / polls))
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-n", "--polls", dest = "polls", type = "int", default = 20)
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 11163)
+    parser.add_option("-D", "--devices", dest = "devices", type = "int", default = 50)
+    parser.add_option("-i", "--interfaces", dest = "interfaces", type = "int", default = 200)
+    parser.add_option("-r", "--max-repetitions", dest = "max_repetitions", type = "int", default = 25)
+    parser.add_option("-w", "--workers", dest = "workers", type = "int", default = 16)
+    (options, args) = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    agent = multiprocessing.Process(target=serveAgent, args=(options.port, options.devices, options.interfaces, ready))
+    agent.daemon = True
+    agent.start()
+    ready.wait()
+
+    engines = [("python", engineSession)]
+    try:
+        import netsnmp
+        engines.insert(0, ("netsnmp", netsnmpSession))
+    except ImportError:
+        print("netsnmp is not installed, measuring the python engine only")
+    for name, create in engines:
+        elapsed, pdus, rows = benchWalk(create, options.port, options.polls, options.max_repetitions)
+        report("%s ifTable walk" % name, elapsed, pdus, options.polls)
+        elapsed, pdus = benchScalars(create, options.port, options.devices, options.polls, options.workers)
+        report("%s %d-device GETs" % (name, options.devices), elapsed, pdus, options.polls)
+
+if __name__ == "__main__":
+    main()
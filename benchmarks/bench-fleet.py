@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import multiprocessing
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools import simulator
+from snmp_tools.fleet import pollFleet, pollTarget
+from snmp_tools.options import createParser
+from snmp_tools.pollers import pollInterfaces, pollUptime
+
+help = """%prog [-n <hosts>] [-P <agents>] [-w <workers>] [-l <latency-ms>] [-j <jitter-ms>] [-m <metric>]
+Description: Measures the hosts/second of the concurrent fleet polls of -f:
+every target goes through the same pollTarget, createSession, transport and
+BER encoding and decoding as get-snmp-* -f, against a local simulated agent
+serving one device per port and answering after a random latency. With more
+hosts than agents the targets cycle over the agents."""
+
+polls = {"uptime": pollUptime, "interface": pollInterfaces}
+
+def serveAgents(port, agents, latency, jitter, ready):
+    simulator.SimulatedAgent(latency=latency, jitter=jitter).serve("127.0.0.1", port, ready=ready, count=agents)
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-n", "--hosts", dest = "hosts", type = "string", default = "200,1000",
+        help = "comma separated numbers of targets polled, defaults to '200,1000'")
+    parser.add_option("-P", "--agents", dest = "agents", type = "int", default = 200,
+        help = "simulated devices, one UDP port each, defaults to '200'")
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 12161)
+    parser.add_option("-w", "--workers", dest = "workers", type = "int", default = 64)
+    parser.add_option("-l", "--latency", dest = "latency", type = "float", default = 20.0,
+        help = "mean agent response time in ms, defaults to '20'")
+    parser.add_option("-j", "--jitter", dest = "jitter", type = "float", default = 10.0,
+        help = "uniform +/- jitter of the response time in ms, defaults to '10'")
+    parser.add_option("-m", "--metric", dest = "metric", type = "choice", choices = sorted(polls), default = "uptime")
+    parser.add_option("--snmp-engine", dest = "snmp_engine", type = "choice", choices = ("auto", "netsnmp", "python"),
+        default = "auto")
+    (options, args) = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    agent = multiprocessing.Process(target=serveAgents, args=(options.port, options.agents, options.latency / 1000.0,
+                                                              options.jitter / 1000.0, ready))
+    agent.daemon = True
+    agent.start()
+    ready.wait()
+
+    # The options a get-snmp-* -f run would have
+    tool_options, tool_args = createParser("").parse_args(["-s", "2", "--snmp-engine", options.snmp_engine])
+    poll = polls[options.metric]
+    for hosts in [int(n) for n in options.hosts.split(",")]:
+        targets = [{"host": "127.0.0.1", "port": options.port + i % options.agents, "community": "public"}
+                   for i in range(hosts)]
+        started = time.time()
+        first = None
+        errors = 0
+        for target, result, error in pollFleet(targets, lambda target: pollTarget(tool_options, options.metric, poll, target),
+                                               options.workers):
+            if first is None:
+                first = time.time() - started
+            if error is not None:
+                errors += 1
+        elapsed = time.time() - started
+        print("%6d hosts %4d workers: %8.1f hosts/s, first result after %.1f ms, %d errors, serial would take %.1f s"
+              % (hosts, options.workers, hosts / elapsed, first * 1000.0, errors, hosts * options.latency / 1000.0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import multiprocessing
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools import simulator
+
+help = """%prog [-i <interfaces>] [-k <disks>] [-n <polls>] [-s <snmp-version>] [--latency <ms>] [--loss <ratio>] [--save <file>] [--compare <file>]
+Description: Polls a local simulated agent with the poll path of every get-snmp-*
+tool and reports PDUs, bytes, latency percentiles and CPU time per poll.
+Save a run with --save and check a later one against it with --compare."""
+
+def serveAgent(options, stats, ready):
+    agent = simulator.SimulatedAgent(interfaces = options.interfaces,
+                                     disks      = options.disks,
+                                     latency    = options.latency / 1000.0,
+                                     loss       = options.loss,
+                                     stats      = stats)
+    agent.serve("127.0.0.1", options.port, ready=ready)
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(ratio * len(values)))]
+
+# Run polls polls of poll(session) and measure each of them
+def measure(poll, session, polls, stats):
+    wall, cpu = [], []
+    pdus_before  = stats[simulator.STAT_PDUS_IN]
+    bytes_before = stats[simulator.STAT_BYTES_IN] + stats[simulator.STAT_BYTES_OUT]
+    for i in range(polls):
+        wall_start, cpu_start = time.time(), time.process_time()
+        result = poll(session)
+        if hasattr(result, "__next__"):
+            result = list(result)
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.time() - wall_start)
+    pdus   = stats[simulator.STAT_PDUS_IN] - pdus_before
+    octets = stats[simulator.STAT_BYTES_IN] + stats[simulator.STAT_BYTES_OUT] - bytes_before
+    return {"pdus"   : float(pdus) / polls,
+            "bytes"  : float(octets) / polls,
+            "p50_ms" : percentile(wall, 0.50) * 1000.0,
+            "p90_ms" : percentile(wall, 0.90) * 1000.0,
+            "p99_ms" : percentile(wall, 0.99) * 1000.0,
+            "cpu_ms" : sum(cpu) * 1000.0 / polls}
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-i", "--interfaces", dest = "interfaces", type = "int", default = 1000)
+    parser.add_option("-k", "--disks", dest = "disks", type = "int", default = 100)
+    parser.add_option("-n", "--polls", dest = "polls", type = "int", default = 20)
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 11161)
+    parser.add_option("-s", "--snmp-version", dest = "snmp_version", default = "2", choices = ("1", "2"))
+    parser.add_option("-r", "--max-repetitions", dest = "max_repetitions", type = "int", default = 25)
+    parser.add_option("--latency", dest = "latency", type = "float", default = 0.0)
+    parser.add_option("--loss", dest = "loss", type = "float", default = 0.0)
+    parser.add_option("--save", dest = "save", default = None, help = "write the results as JSON to this file")
+    parser.add_option("--compare", dest = "compare", default = None, help = "show the change against results saved with --save")
+    (options, args) = parser.parse_args()
+
+    from snmp_tools.options import createParser
+    from snmp_tools.session import createSession
+    from snmp_tools import pollers
+
+    stats = multiprocessing.Array("d", simulator.STAT_COUNT, lock=False)
+    ready = multiprocessing.Event()
+    agent = multiprocessing.Process(target=serveAgent, args=(options, stats, ready))
+    agent.daemon = True
+    agent.start()
+    ready.wait()
+
+    (session_options, session_args) = createParser("").parse_args(["-d", "127.0.0.1", "-p", str(options.port),
+                                                                   "-s", options.snmp_version])
+    session = createSession(session_options)
+    repetitions = options.max_repetitions
+    tools = (("cpu-load",   pollers.pollCpuLoad),
+             ("ram-stats",  pollers.pollMemory),
+             ("uptime",     pollers.pollUptime),
+             ("disk-stats", lambda session: pollers.pollDisks(session, repetitions)),
+             ("net-stats",  lambda session: pollers.pollInterfaces(session, repetitions)))
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    results = {}
+    print("%-11s %9s %11s %9s %9s %9s %9s" % ("tool", "PDUs", "bytes", "p50 ms", "p90 ms", "p99 ms", "CPU ms"))
+    for name, poll in tools:
+        result = measure(poll, session, options.polls, stats)
+        results[name] = result
+        print("%-11s %9.1f %11.0f %9.2f %9.2f %9.2f %9.2f" % (name, result["pdus"], result["bytes"], result["p50_ms"],
+                                                              result["p90_ms"], result["p99_ms"], result["cpu_ms"]))
+        if name in baseline:
+            changes = []
+            for key in ("pdus", "bytes", "p50_ms", "p99_ms", "cpu_ms"):
+                if baseline[name].get(key):
+                    changes.append("%s %+.1f%%" % (key, (result[key] / baseline[name][key] - 1.0) * 100.0))
+            print("%-11s %s" % ("", ", ".join(changes)))
+    agent.terminate()
+    if options.save:
+        with open(options.save, "w") as save_file:
+            json.dump(results, save_file, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
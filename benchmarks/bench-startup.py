@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import multiprocessing
+from optparse import OptionParser
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+from snmp_tools import simulator
+
+help = """%prog [-n <runs>] [-p <port>] [--modules]
+Description: Measures the wall time of get-snmp-* calls from process start to
+exit: --help, --version and a query of a local simulated agent in table and
+jsonl output, each run locally and through snmp-tools-server.py.
+With --modules the slowest imports of a jsonl query are listed too."""
+
+def serveAgent(port, ready):
+    simulator.SimulatedAgent().serve("127.0.0.1", port, ready=ready)
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def timeCommand(command, runs, env):
+    times = []
+    for i in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+        times.append(time.perf_counter() - started)
+    return median(times) * 1000.0, max(times) * 1000.0
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-n", "--runs", dest = "runs", type = "int", default = 20)
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 11162)
+    parser.add_option("--modules", dest = "modules", action = "store_true", default = False)
+    (options, args) = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    agent = multiprocessing.Process(target=serveAgent, args=(options.port, ready))
+    agent.daemon = True
+    agent.start()
+    ready.wait()
+
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="bench-startup-"), "server.sock")
+    server = subprocess.Popen([sys.executable, os.path.join(root, "snmp-tools-server.py"), "-S", socket_path])
+    while not os.path.exists(socket_path) and server.poll() is None:
+        time.sleep(0.01)
+
+    query = ["-d", "127.0.0.1", "-p", str(options.port), "-s", "2"]
+    cases = (("--help",      ["--help"]),
+             ("--version",   ["--version"]),
+             ("query table", query),
+             ("query jsonl", query + ["-o", "jsonl"]))
+    local  = dict(os.environ)
+    local.pop("SNMP_TOOLS_SOCKET", None)
+    served = dict(local, SNMP_TOOLS_SOCKET=socket_path)
+    try:
+        print("%-22s %-12s %10s %10s %10s %10s" % ("tool", "call", "local ms", "max", "server ms", "max"))
+        for tool in ("get-snmp-cpu-load", "get-snmp-disk-stats", "get-snmp-net-stats"):
+            script = os.path.join(root, tool + ".py")
+            for label, arguments in cases:
+                local_median, local_max = timeCommand([sys.executable, script] + arguments, options.runs, local)
+                served_median, served_max = timeCommand([sys.executable, script] + arguments, options.runs, served)
+                print("%-22s %-12s %10.1f %10.1f %10.1f %10.1f" % (tool, label, local_median, local_max, served_median, served_max))
+        if options.modules:
+            output = subprocess.run([sys.executable, "-X", "importtime", os.path.join(root, "get-snmp-cpu-load.py")] +
+                                    query + ["-o", "jsonl"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    env=local, universal_newlines=True).stderr
+            imports = []
+            for line in output.splitlines():
+                fields = line.split("|")
+                if len(fields) == 3 and fields[1].strip().isdigit():
+                    imports.append((int(fields[1]), fields[2].strip()))
+            print("\nslowest imports of a jsonl query (cumulative us):")
+            for cumulative, name in sorted(imports, reverse=True)[:15]:
+                print("%10d  %s" % (cumulative, name))
+    finally:
+        server.terminate()
+        server.wait()
+        agent.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import netsnmp
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools.pollers import if_table_columns
+from snmp_tools.table import walkTable
+
+help = """%prog [-d <destination>] [-p <port>] [-c <community>] [-n <polls>] [-r <max-repetitions>]
+Description: Compares the per-column GETNEXT walks of get-snmp-net-stats.py
+with the combined ifTable fetch, reports PDUs and wall time per poll.
+Point it at benchmarks/snmp-simulator.py, not at production devices."""
+
+# The old net-stats behaviour, one GETNEXT chain per column
+def pollPerColumn(session, max_repetitions, counters):
+    for name in if_table_columns:
+        walkTable(session, {name: if_table_columns[name]}, 0, counters)
+
+def pollGetNext(session, max_repetitions, counters):
+    walkTable(session, if_table_columns, 0, counters)
+
+def pollGetBulk(session, max_repetitions, counters):
+    walkTable(session, if_table_columns, max_repetitions, counters)
+
+def run(label, poll, session, polls, max_repetitions):
+    counters = {}
+    started = time.time()
+    for i in range(polls):
+        poll(session, max_repetitions, counters)
+    elapsed = time.time() - started
+    pdus = sum(counters.values())
+    print("%-12s %10.1f PDUs/poll %10.2f ms/poll" % (label, float(pdus)/polls, elapsed*1000.0/polls))
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-d", "--destination", dest = "snmp_destination", default = "127.0.0.1")
+    parser.add_option("-p", "--port", dest = "snmp_port", type = "int", default = 1161)
+    parser.add_option("-c", "--community", dest = "snmp_community", default = "public")
+    parser.add_option("-n", "--polls", dest = "polls", type = "int", default = 10)
+    parser.add_option("-r", "--max-repetitions", dest = "max_repetitions", type = "int", default = 25)
+    (options, args) = parser.parse_args()
+    for version, label, poll in ((1, "per-column", pollPerColumn),
+                                 (1, "getnext", pollGetNext),
+                                 (2, "getbulk", pollGetBulk)):
+        session = netsnmp.Session(DestHost   = options.snmp_destination,
+                                  Version    = version,
+                                  UseNumeric = True,
+                                  Community  = options.snmp_community,
+                                  RemotePort = options.snmp_port)
+        run(label, poll, session, options.polls, options.max_repetitions)
+
+if __name__ == "__main__":
+    main()
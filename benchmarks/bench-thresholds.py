@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools.thresholds import Rule, RuleSet, parseRange
+
+help = """%prog [-H <hosts>] [-i <interfaces>] [-c <cycles>]
+Description: Measures the evaluation of per-host, per-interface thresholds
+on the interface rates of a fleet, one rule per host, interface and
+field, plus a glob rule over every host, the first cycle resolving the
+rules and the following ones reusing the resolution."""
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-H", "--hosts", dest = "hosts", type = "int", default = 1000)
+    parser.add_option("-i", "--interfaces", dest = "interfaces", type = "int", default = 50)
+    parser.add_option("-c", "--cycles", dest = "cycles", type = "int", default = 5)
+    (options, args) = parser.parse_args()
+
+    hosts = ["10.%d.%d.%d" % (n >> 16 & 255, n >> 8 & 255, n & 255) for n in range(options.hosts)]
+    labels = ["eth%d" % n for n in range(options.interfaces)]
+    rules = [Rule(host, field, label, parseRange("800000000"), parseRange("950000000"))
+             for host in hosts for label in labels for field in ("in_bps", "out_bps")]
+    rules.append(Rule("*", "in_pps", "eth*", parseRange("100000"), parseRange("1000000")))
+
+    started = time.perf_counter()
+    rule_set = RuleSet(rules)
+    compiled = time.perf_counter() - started
+    rows = [(host, "interface_rate", label,
+             {"descr": label, "in_bps": float((i * 19999999) % 10**9), "out_bps": 5e8, "in_pps": 5e4})
+            for host in hosts for i, label in enumerate(labels)]
+    print("%d rules compiled in %.1f ms, %d rows of %d values" % (len(rule_set), compiled * 1000, len(rows), len(rows) * 3))
+    for cycle in range(options.cycles):
+        started = time.perf_counter()
+        checks = rule_set.evaluate(rows)
+        elapsed = time.perf_counter() - started
+        alerts = sum(1 for check in checks if check.state)
+        print("cycle %d: %d checks, %d alerts in %.1f ms" % (cycle + 1, len(checks), alerts, elapsed * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import shutil
+import random
+import tempfile
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools.tsdb import TimeSeriesStore, header_size
+
+help = """%prog [-n <hosts>] [-s <series>] [-m <minutes>] [-D <directory>]
+Description: Measures the write and range query cost of the time-series
+store for a fleet polled every minute, each host writing that many distinct
+metrics of 3 fields, a counter, a gauge and a percentage, each to its own
+chunk, e.g. -n 10000 -s 50 for 10k hosts x 50 metrics. The store buffers
+and writes with its defaults, so the minutes in which blocks are written
+cost more than the others, the average is what a poller pays."""
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-n", "--hosts", dest = "hosts", type = "int", default = 1000)
+    parser.add_option("-s", "--series", dest = "series", type = "int", default = 50,
+        help = "distinct metrics per host, defaults to '50'")
+    parser.add_option("-m", "--minutes", dest = "minutes", type = "int", default = 15)
+    parser.add_option("-D", "--directory", dest = "directory", default = None,
+        help = "store directory, defaults to a temporary one that is removed afterwards")
+    (options, args) = parser.parse_args()
+
+    directory = options.directory or tempfile.mkdtemp(prefix="bench-tsdb-")
+    store = TimeSeriesStore(directory)
+    hosts = ["10.%d.%d.%d" % (i >> 16 & 255, i >> 8 & 255, i & 255) for i in range(options.hosts)]
+    metrics = ["metric%03d" % series for series in range(options.series)]
+    rows = options.hosts * options.series
+    start = time.time() - options.minutes * 60
+    try:
+        total = 0.0
+        for minute in range(options.minutes):
+            timestamp = start + minute * 60 + random.random()
+            started = time.time()
+            for number, host in enumerate(hosts):
+                for series, metric in enumerate(metrics):
+                    rate = (number + series) % 1000 + 1
+                    store.append(host, metric, [{"counter": (number * 50 + series) * 1000003 + rate * minute * 60,
+                                                 "gauge": round(random.random() * 4, 2),
+                                                 "percent": random.randint(0, 100)}], timestamp)
+            elapsed = time.time() - started
+            total += elapsed
+            print("minute %3d: %8d rows in %6.2f s, %9.0f rows/s, %4.1f%% of the minute"
+                  % (minute, rows, elapsed, rows / elapsed, elapsed * 100.0 / 60))
+        started = time.time()
+        store.close()
+        elapsed = time.time() - started
+        total += elapsed
+        sizes = [os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(directory) for name in names]
+        print("close: %.2f s, average %.1f%% of a minute, %.1f bytes per row in blocks, %.1f with the chunk headers"
+              % (elapsed, total * 100.0 / 60 / options.minutes, (sum(sizes) - len(sizes) * header_size) / float(rows * options.minutes),
+                 sum(sizes) / float(rows * options.minutes)))
+        started = time.time()
+        queries = min(1000, rows)
+        samples = 0
+        for i in range(queries):
+            stamps, values = store.query(random.choice(hosts), random.choice(metrics), start, None)
+            samples += len(stamps)
+        elapsed = time.time() - started
+        print("range query: %.3f ms per series, %d samples each" % (elapsed * 1000.0 / queries, samples // queries))
+    finally:
+        if not options.directory:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import os
+import sys
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snmp_tools.simulator import SimulatedAgent
+
+help = """%prog [-l <address>] [-p <port>] [-c <community>] [-i <interfaces>] [-k <disks>] [--latency <ms>] [--loss <ratio>] [--wrap]
+Description: Runs a local SNMPv1/v2c agent serving the OIDs of the get-snmp-* tools,
+for benchmarks and tests without a real snmpd."""
+
+def main():
+    parser = OptionParser(usage = help)
+    parser.add_option("-l", "--listen", dest = "address", default = "127.0.0.1",
+        help = "address to listen on, defaults to 127.0.0.1")
+    parser.add_option("-p", "--port", dest = "port", type = "int", default = 1161,
+        help = "UDP port, defaults to '1161'")
+    parser.add_option("-c", "--community", dest = "community", default = "public",
+        help = "community string, default to 'public'")
+    parser.add_option("-i", "--interfaces", dest = "interfaces", type = "int", default = 4,
+        help = "number of ifTable rows, defaults to '4'")
+    parser.add_option("-k", "--disks", dest = "disks", type = "int", default = 4,
+        help = "number of dskTable rows, defaults to '4'")
+    parser.add_option("--latency", dest = "latency", type = "float", default = 0.0,
+        help = "response delay in ms, defaults to '0'")
+    parser.add_option("--jitter", dest = "jitter", type = "float", default = 0.0,
+        help = "uniform +/- jitter of the delay in ms, defaults to '0'")
+    parser.add_option("--loss", dest = "loss", type = "float", default = 0.0,
+        help = "ratio of requests dropped, defaults to '0'")
+    parser.add_option("--wrap", dest = "wrap", action = "store_true", default = False,
+        help = "start the Counter32 interface counters 5 seconds before they wrap")
+    parser.add_option("--max-message-size", dest = "max_message_size", type = "int", default = 1472,
+        help = "largest response in bytes, bigger GETs answer tooBig, defaults to '1472'")
+    (options, args) = parser.parse_args()
+    agent = SimulatedAgent(interfaces       = options.interfaces,
+                           disks            = options.disks,
+                           community        = options.community,
+                           latency          = options.latency / 1000.0,
+                           jitter           = options.jitter / 1000.0,
+                           loss             = options.loss,
+                           wrap             = options.wrap,
+                           max_message_size = options.max_message_size)
+    print("Serving %d OIDs on %s:%d" % (len(agent.oids), options.address, options.port))
+    try:
+        agent.serve(options.address, options.port)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+import sys
+from snmp_tools.client import forwardToServer
+
+help = """%prog [-d <destination> | -f <targets-file>] [-p <port>] [-c <community>] [-s <snmp-version>] [-o <output>] [-m <metrics>] [-i <interval> [-n <count>]]
+Description: Returns the CPU load, memory statistics and uptime of a linux
+host with a single GET, or as few as the agent's message size allows.
+Copyright 2015, Konstantinos Patronas, Email: kpatronas@gmail.com"""
+
+def main():
+    # Calls made with SNMP_TOOLS_SOCKET set run in snmp-tools-server.py
+    forwardToServer()
+    # Parse the command line options
+    from snmp_tools.options import addWatchOptions, createParser
+    parser = createParser(help)
+    addWatchOptions(parser, "load,memory,uptime")
+    (options, args) = parser.parse_args()
+    # The poller and renderers are imported once the options are parsed, so
+    # --help and --version return without loading them
+    from snmp_tools.cli import run
+    from snmp_tools.pollers import pollScalars, scalar_metrics
+    from snmp_tools.render import renderSummary, scalar_renderers
+    from snmp_tools.watch import runWatch
+    names = [name.strip() for name in options.metrics.split(",") if name.strip()]
+    for name in names:
+        if name not in scalar_metrics:
+            parser.error("unknown metric '%s', possible values [%s]" % (name, ",".join(sorted(scalar_metrics))))
+    if options.interval:
+        if options.targets_file:
+            parser.error("--interval watches the -d host, it cannot be combined with -f")
+        sys.exit(runWatch(options, scalar_renderers))
+    sys.exit(run(options, "summary", lambda session: pollScalars(session, names, options.max_message_size), renderSummary))
+        
+if __name__ == "__main__":
+    main()
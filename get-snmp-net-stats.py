@@ -1,131 +1,85 @@
 #!/usr/bin/env python
+import re
 import sys
-import netsnmp
-import time
-import math
-from prettytable import PrettyTable
-from optparse import OptionParser
+from snmp_tools.client import forwardToServer
 
-def PortStatus(status):
-    status = int(status)
-    if status == 1:
-        return "up"
-    if status == 2:
-        return "down"
-    if status == 3:
-        return "testing"
-    if status == 4:
-        return "unknow"
-    if status == 5:
-        return "dormant"
-    if status == 6:
-        return "notPresent"
-    if status == 7:
-        return "lowerLayerDown"
-
-def convertSize(size):
-    size_name = ("B","KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size,1024)))
-    p = math.pow(1024,i)
-    s = round(size/p,2)
-    if (s > 0):
-        return '%s %s' % (s,size_name[i])
-    else:
-        return '0B'
-
-# Check if port is in the range of 1-65535
-def IsPortValid(option, opt_str, value, parser):
-    if (value <= 0 or value >65535):
-        parser.values.snmp_port = 161
-        print("snmp port must be in range of 1-6535, defaulting to '161'")
-    else:
-        parser.values.snmp_port = value
-
-help = """%prog [-d <destination>] [-p <port>] [-c <community>] [-s <snmp-version>]
-Description: Returns the network statistics of a linux host.
+help = """%prog [-d <destination> | -f <targets-file>] [-p <port>] [-c <community>] [-s <snmp-version>] [-o <output>] [-r <max-repetitions>]
+       %prog [--descr <regex>] [--type <types>] [--oper-status <states>] [--index <indexes>] [--columns <columns>] ...
+       %prog --rate [-i <interval>] [-n <samples>] ...
+       %prog --inventory --state-dir <dir> ...
+Description: Returns the network statistics of a linux host. With filters
+only the matching interfaces are fetched, by index. With --inventory only
+the interfaces added, removed or renamed since the last run are returned.
 Copyright 2015, Konstantinos Patronas, Email: kpatronas@gmail.com"""
 
 def main():
+    # Calls made with SNMP_TOOLS_SOCKET set run in snmp-tools-server.py
+    forwardToServer()
     # Parse the command line options
-    parser = OptionParser(usage = help,version = "%prog 1.0")
-    parser.add_option("-d", "--destination",
-        action  = "store",
-        type    = "string",
-        dest    = "snmp_destination",
-        default = "127.0.0.1",
-        help    = "destination to query, defaults to 127.0.0.1")
-    parser.add_option("-p", "--port",
-        action  = "callback",
-        type    = "int",
-        dest    = "snmp_port",
-        callback = IsPortValid,
-        default = 161,
-        help    = "SNMP port, defaults to '161'")
-    parser.add_option("-c", "--community",
+    from snmp_tools.options import addInterfaceOptions, addInventoryOptions, addStateOptions, addTableOptions, createParser
+    parser = createParser(help)
+    addTableOptions(parser)
+    addStateOptions(parser)
+    addInventoryOptions(parser)
+    addInterfaceOptions(parser)
+    parser.add_option("--rate",
+        action  = "store_true",
+        dest    = "rate",
+        default = False,
+        help    = "sample the counters and print bits and packets per second instead of totals")
+    parser.add_option("-i", "--interval",
         action  = "store",
-        type    = "string",
-        dest    = "snmp_community",
-        default = "public",
-        help    = "community string, default to 'public'")
-    parser.add_option("-s", "--snmp-version",
+        type    = "float",
+        dest    = "interval",
+        default = 10.0,
+        help    = "seconds between the samples of --rate, defaults to '10'")
+    parser.add_option("-n", "--samples",
         action  = "store",
-        type    = "choice",
-        choices = ("1","2"),
-        dest    = "snmp_version",
-        default = "1",
-        help    = "SNMP version, defaults to '1', possible values [1,2]")
+        type    = "int",
+        dest    = "samples",
+        default = 2,
+        help    = "number of samples taken by --rate, at least 2, defaults to '2', with --state-dir the sample of the previous run counts as the first")
     (options, args) = parser.parse_args()
+    if options.rate and options.columns:
+        parser.error("--columns does not apply to --rate")
+    if options.inventory and not options.state_dir:
+        parser.error("--inventory needs --state-dir, the last inventory is kept there")
+    if options.inventory and (options.rate or options.columns):
+        parser.error("--inventory does not apply to --rate or --columns")
     try:
-        snmp_hostname   = options.snmp_destination  # string
-        snmp_port       = int(options.snmp_port)    # integer
-        snmp_community  = options.snmp_community    # string
-        snmp_version    = int(options.snmp_version) # string
-        # Create the session object
-        session = netsnmp.Session(DestHost   = snmp_hostname,
-                                  Version    = snmp_version,
-                                  Community  = snmp_community,
-                                  RemotePort = snmp_port)
-
-        ifDescr             = ".1.3.6.1.2.1.2.2.1.2"                # Description of the IP interface
-        ifType              = ".1.3.6.1.2.1.2.2.1.3"                # Type of the interface
-        ifInOctets          = ".1.3.6.1.2.1.2.2.1.10"               # The total number of octets received on the interface,including framing characters.
-        ifOutOctets         = ".1.3.6.1.2.1.2.2.1.16"               # The total number of octets transmitted out of the interface, including framing characters.
-        ifPhysAddress       = ".1.3.6.1.2.1.2.2.1.6"                # Get the MAC address
-        ifAdminStatus       = ".1.3.6.1.2.1.2.2.1.7"                # The desired state of the interface 1: Up 2: Down 3: Test
-        ifOperStatus        = ".1.3.6.1.2.1.2.2.1.8"                # The current operational state of the interface. 1: Up 2: Down 3: Test
-
-        # SNMP Get the CPU load OIDs
-        ifDescr_vars            = netsnmp.VarList(netsnmp.Varbind(ifDescr))
-        ifType_vars             = netsnmp.VarList(netsnmp.Varbind(ifType))
-        ifInOctets_vars         = netsnmp.VarList(netsnmp.Varbind(ifInOctets))
-        ifOutOctets_vars        = netsnmp.VarList(netsnmp.Varbind(ifOutOctets))
-        ifPhysAddress_vars      = netsnmp.VarList(netsnmp.Varbind(ifPhysAddress))
-        ifAdminStatus_vars      = netsnmp.VarList(netsnmp.Varbind(ifAdminStatus))
-        ifOperStatus_vars       = netsnmp.VarList(netsnmp.Varbind(ifOperStatus))
-
-        ifDescr_res             = session.walk(ifDescr_vars)
-        ifType_res              = session.walk(ifType_vars)
-        ifInOctets_res          = session.walk(ifInOctets_vars)
-        ifOutOctets_res         = session.walk(ifOutOctets_vars)
-        ifPhysAddress_res       = session.walk(ifPhysAddress_vars)
-        ifAdminStatus_res       = session.walk(ifAdminStatus_vars)
-        ifOperStatus_res        = session.walk(ifOperStatus_vars)
-
-        if (session.ErrorStr):
-            print ('Error occurred during SNMP query: '+session.ErrorStr)
-            sys.exit(2)
-        i = 0
-        x = PrettyTable(["Interface Description","Total-In","Total-Out","Admin Status","Operational Status"])
-        x.border = False
-        x.align["Interface Description"] = "l"
-        for ifDescr_str in ifDescr_res:
-            if (int(ifInOctets_res[i]) != 0 and int(ifOutOctets_res[i]) != 0):
-                x.add_row([ifDescr_str,convertSize(int(ifInOctets_res[i])),convertSize(int(ifOutOctets_res[i])),PortStatus(ifAdminStatus_res[i]),PortStatus(ifOperStatus_res[i])])
-            i=i+1
-        print(x)
-    except Exception as exception_error:
-        print ('Error occurred during executing script: '+str(exception_error))
-        sys.exit(2)
+        descr = re.compile(options.descr) if options.descr else None
+    except re.error as pattern_error:
+        parser.error("--descr: %s" % pattern_error)
+    types       = set(options.if_types) if options.if_types is not None else None
+    oper_status = set(options.oper_status) if options.oper_status is not None else None
+    indexes     = set(options.if_indexes) if options.if_indexes is not None else None
+    filtered    = descr is not None or types is not None or oper_status is not None or indexes is not None
+    # The poller and renderers are imported once the options are parsed, so
+    # --help and --version return without loading them
+    from snmp_tools.cli import run
+    from snmp_tools.pollers import iterInterfaces, iterInterfacesMatching, matchInterfaces
+    from snmp_tools.render import default_interface_columns, renderInterfaces, renderRates
+    from snmp_tools.state import openStateStore
+    state = openStateStore(options)
+    if options.inventory:
+        from snmp_tools.inventory import syncInventory
+        from snmp_tools.render import renderInventory
+        sys.exit(run(options, "inventory", lambda session: syncInventory(session, "interface", options.max_repetitions, state, options.max_message_size, options.resync), renderInventory))
+    if options.rate:
+        # numpy is only needed for rates
+        from snmp_tools.rates import sampleRates
+        def pollRates(session):
+            matches = None
+            if filtered:
+                matches = matchInterfaces(session, descr, types, oper_status, indexes, options.max_repetitions, state, options.max_varbinds)
+            return sampleRates(session, max(options.samples, 2), options.interval, options.max_repetitions, state, matches, options.max_varbinds)
+        sys.exit(run(options, "interface_rate", pollRates, renderRates))
+    columns = options.columns
+    render_columns = columns if columns is not None or not filtered else default_interface_columns
+    render = lambda interfaces: renderInterfaces(interfaces, render_columns)
+    if filtered:
+        sys.exit(run(options, "interface", lambda session: iterInterfacesMatching(session, descr, types, oper_status, indexes, columns, options.max_repetitions, state, options.max_varbinds), render))
+    sys.exit(run(options, "interface", lambda session: iterInterfaces(session, options.max_repetitions, state, columns), render))
         
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+import os
+import sys
+import signal
+from snmp_tools.collector import Collector, collector_tables
+from snmp_tools.fleet import optionTargets
+from snmp_tools.options import addStateOptions, addTableOptions, createParser
+from snmp_tools.output import CheckWriter, TableWriter, createWriter
+from snmp_tools.pollers import scalar_metrics
+
+help = """%prog -f <targets-file> [-o <output>] [-m <metrics>] [-i <interval>] [-P <processes>] [-w <workers>] [--pin]
+Description: Polls every host of the targets file on a fixed interval, sharded over
+worker processes, and writes the results as they arrive until interrupted.
+Copyright 2015, Konstantinos Patronas, Email: kpatronas@gmail.com"""
+
+collector_metrics = tuple(sorted(scalar_metrics)) + collector_tables
+
+class Stop(Exception):
+    pass
+
+def stop(signum, frame):
+    raise Stop()
+
+def main():
+    # Parse the command line options
+    parser = createParser(help)
+    addTableOptions(parser)
+    addStateOptions(parser)
+    parser.set_defaults(output = "jsonl")
+    parser.add_option("-m", "--metrics",
+        action  = "store",
+        type    = "string",
+        dest    = "metrics",
+        default = "load,memory,uptime",
+        help    = "comma separated metrics polled on each host, any of [%s], defaults to 'load,memory,uptime'"
+                  % ",".join(collector_metrics))
+    parser.add_option("-i", "--interval",
+        action  = "store",
+        type    = "float",
+        dest    = "interval",
+        default = 60.0,
+        help    = "seconds between polls of a host, defaults to '60'")
+    parser.add_option("-P", "--processes",
+        action  = "store",
+        type    = "int",
+        dest    = "processes",
+        default = os.cpu_count() or 1,
+        help    = "worker processes the targets are sharded over, defaults to the number of cores")
+    parser.add_option("--pin",
+        action  = "store_true",
+        dest    = "pin",
+        default = False,
+        help    = "bind each worker process to its own core")
+    parser.add_option("--ring-size",
+        action  = "store",
+        type    = "int",
+        dest    = "ring_size",
+        default = 4,
+        help    = "MiB of shared memory each worker hands its results back through, defaults to '4'")
+    (options, args) = parser.parse_args()
+    if not options.targets_file:
+        parser.error("the collector polls the hosts of -f")
+    metrics = [name.strip() for name in options.metrics.split(",") if name.strip()]
+    for name in metrics:
+        if name not in collector_metrics:
+            parser.error("unknown metric '%s', possible values [%s]" % (name, ",".join(collector_metrics)))
+    try:
+        writer = createWriter(options, {})
+    except ValueError as option_error:
+        parser.error(str(option_error))
+    if isinstance(writer, (TableWriter, CheckWriter)):
+        parser.error("the collector writes jsonl, csv, prometheus or tsdb output")
+    try:
+        targets = optionTargets(options)
+    except ValueError as targets_error:
+        parser.error(str(targets_error))
+
+    def sink(target, timestamp, results, error):
+        if error is not None:
+            writer.error(target, error)
+            return
+        for metric in metrics:
+            if metric in results:
+                writer.writeRecords(target, metric, results[metric], timestamp)
+
+    collector = Collector(options, targets, metrics, sink, max(1, options.processes), options.interval,
+                          ring_size = options.ring_size << 20,
+                          pin       = options.pin,
+                          flush     = writer.flush)
+    signal.signal(signal.SIGTERM, stop)
+    collector.start()
+    try:
+        collector.run()
+    except (KeyboardInterrupt, Stop):
+        pass
+    finally:
+        collector.stop()
+        writer.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+import os
+import sys
+import signal
+from optparse import OptionParser
+from snmp_tools.client import socket_variable
+from snmp_tools.server import ToolServer
+
+help = """%prog [-S <socket>] [--max-children <n>]
+Description: Keeps the get-snmp-* tools loaded and runs their calls in forked
+children, so a call skips the interpreter start and the imports. Tools called
+with SNMP_TOOLS_SOCKET=<socket> in their environment hand their arguments,
+working directory and stdin/stdout/stderr to the server, and run locally
+when no server listens.
+Copyright 2015, Konstantinos Patronas, Email: kpatronas@gmail.com"""
+
+def stop(signum, frame):
+    raise KeyboardInterrupt()
+
+def main():
+    parser = OptionParser(usage = help,version = "%prog 1.0")
+    parser.add_option("-S", "--socket",
+        action  = "store",
+        type    = "string",
+        dest    = "socket",
+        default = os.environ.get(socket_variable),
+        help    = "Unix socket to listen on, defaults to $%s" % socket_variable)
+    parser.add_option("--max-children",
+        action  = "store",
+        type    = "int",
+        dest    = "max_children",
+        default = 64,
+        help    = "calls run at the same time, defaults to '64'")
+    (options, args) = parser.parse_args()
+    if not options.socket:
+        parser.error("-S or $%s is required" % socket_variable)
+    server = ToolServer(options.socket, os.path.dirname(os.path.abspath(__file__)), options.max_children)
+    server.listen()
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
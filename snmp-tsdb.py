@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+import re
+import sys
+import csv
+import json
+import time
+import datetime
+from optparse import OptionParser
+from snmp_tools.tsdb import TimeSeriesStore
+
+help = """%prog --tsdb-dir <dir> [-d <destination>] [-m <metric>] [-i <index>] [--start <time>] [--end <time>] [-r <resolution>] [-o <output>] [--list] [--rollup]
+Description: Queries the time-series store the get-snmp-* tools write with '-o tsdb'.
+Times are unix seconds, ISO dates or relative to now like '-90m', '-6h' or '-7d'.
+Copyright 2015, Konstantinos Patronas, Email: kpatronas@gmail.com"""
+
+relative_time = re.compile(r"^-(\d+(?:\.\d+)?)([smhd])$")
+time_units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parseTime(value, now):
+    if value is None:
+        return None
+    match = relative_time.match(value)
+    if match:
+        return now - float(match.group(1)) * time_units[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for date_format in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(datetime.datetime.strptime(value, date_format).timetuple())
+        except ValueError:
+            pass
+    raise ValueError("invalid time '%s'" % value)
+
+def formatTime(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat()
+
+def writeRows(output, host, metric, stamps, values):
+    fields = sorted(field for field in values if field != "index")
+    if len(set(values["index"])) > 1:
+        fields.insert(0, "index")
+    if output == "jsonl":
+        for i in range(len(stamps)):
+            record = dict((field, None if values[field][i] != values[field][i] else float(values[field][i])) for field in fields)
+            record.update(timestamp=float(stamps[i]), host=host, metric=metric)
+            sys.stdout.write(json.dumps(record, sort_keys=True) + "\n")
+    elif output == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["timestamp", "host", "metric"] + fields)
+        for i in range(len(stamps)):
+            writer.writerow([float(stamps[i]), host, metric] + ["" if values[field][i] != values[field][i] else float(values[field][i]) for field in fields])
+    else:
+        from prettytable import PrettyTable
+        x = PrettyTable(["Time"] + fields)
+        x.border = False
+        for i in range(len(stamps)):
+            x.add_row([formatTime(stamps[i])] + ["-" if values[field][i] != values[field][i] else "%g" % values[field][i] for field in fields])
+        print('%s %s:' % (host, metric))
+        print(x)
+
+def main():
+    parser = OptionParser(usage = help,version = "%prog 1.0")
+    parser.add_option("--tsdb-dir",
+        action  = "store",
+        type    = "string",
+        dest    = "tsdb_dir",
+        default = None,
+        help    = "time-series store directory")
+    parser.add_option("-d", "--destination",
+        action  = "store",
+        type    = "string",
+        dest    = "host",
+        default = None,
+        help    = "host to query, host:port for an agent polled on another port than 161, defaults to every host in the store")
+    parser.add_option("-m", "--metric",
+        action  = "store",
+        type    = "string",
+        dest    = "metric",
+        default = None,
+        help    = "metric to query, like 'load' or 'disk', defaults to all of them")
+    parser.add_option("-i", "--index",
+        action  = "store",
+        type    = "int",
+        dest    = "index",
+        default = None,
+        help    = "only this row of a table metric, e.g. the dskIndex of a disk")
+    parser.add_option("--start",
+        action  = "store",
+        type    = "string",
+        dest    = "start",
+        default = "-1h",
+        help    = "start of the range, defaults to '-1h'")
+    parser.add_option("--end",
+        action  = "store",
+        type    = "string",
+        dest    = "end",
+        default = None,
+        help    = "end of the range, defaults to now")
+    parser.add_option("-r", "--resolution",
+        action  = "store",
+        type    = "choice",
+        choices = ("raw", "5m", "1h"),
+        dest    = "resolution",
+        default = "raw",
+        help    = "raw samples or rollups, defaults to 'raw', possible values [raw,5m,1h]")
+    parser.add_option("-o", "--output",
+        action  = "store",
+        type    = "choice",
+        choices = ("table", "jsonl", "csv"),
+        dest    = "output",
+        default = "table",
+        help    = "output format, defaults to 'table', possible values [table,jsonl,csv]")
+    parser.add_option("--list",
+        action  = "store_true",
+        dest    = "list",
+        default = False,
+        help    = "list the hosts and metrics instead of querying them")
+    parser.add_option("--rollup",
+        action  = "store_true",
+        dest    = "rollup",
+        default = False,
+        help    = "fold the raw samples of past days into the 5m and 1h rollups and drop expired data, e.g. daily from cron")
+    (options, args) = parser.parse_args()
+    if not options.tsdb_dir:
+        parser.error("--tsdb-dir is required")
+    store = TimeSeriesStore(options.tsdb_dir)
+    if options.rollup:
+        print("Rolled up %d chunks" % store.rollup())
+        sys.exit(0)
+    now = time.time()
+    try:
+        start, end = parseTime(options.start, now), parseTime(options.end, now)
+    except ValueError as time_error:
+        parser.error(str(time_error))
+    hosts = [options.host] if options.host else store.hosts()
+    for host in hosts:
+        for metric in store.metrics(host):
+            if options.metric and metric != options.metric:
+                continue
+            if options.list:
+                print('%s %s' % (host, metric))
+                continue
+            stamps, values = store.query(host, metric, start, end, options.resolution, options.index)
+            if len(stamps):
+                writeRows(options.output, host, metric, stamps, values)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Shared helpers for the get-snmp-* tools, usable in-process by long running
+# collectors: create a session with createSession() and call the poll*
+# functions, which return typed results instead of printing tables.
+#
+# The names are resolved on first use, so modules that do not talk to an
+# agent through netsnmp (the BER codec, the simulator) import without it.
+lazy_names = {
+    "QueryError"     : "snmp_tools.session",
+    "createSession"  : "snmp_tools.session",
+    "CpuLoad"        : "snmp_tools.pollers",
+    "MemoryStats"    : "snmp_tools.pollers",
+    "Disk"           : "snmp_tools.pollers",
+    "Interface"      : "snmp_tools.pollers",
+    "pollCpuLoad"    : "snmp_tools.pollers",
+    "pollMemory"     : "snmp_tools.pollers",
+    "pollUptime"     : "snmp_tools.pollers",
+    "pollDisks"      : "snmp_tools.pollers",
+    "pollInterfaces" : "snmp_tools.pollers",
+}
+
+def __getattr__(name):
+    if name not in lazy_names:
+        raise AttributeError("module 'snmp_tools' has no attribute '%s'" % name)
+    import importlib
+    return getattr(importlib.import_module(lazy_names[name]), name)
@@ -0,0 +1,201 @@
+import struct
+
+# BER encoding of SNMPv1/v2c messages (RFC 1157, RFC 3416), enough for the
+# OIDs the tools poll. OIDs are tuples of ints, values are (tag, value).
+
+INTEGER           = 0x02
+OCTET_STRING      = 0x04
+NULL              = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE          = 0x30
+IP_ADDRESS        = 0x40
+COUNTER32         = 0x41
+GAUGE32           = 0x42
+TIMETICKS         = 0x43
+OPAQUE            = 0x44
+COUNTER64         = 0x46
+NO_SUCH_OBJECT    = 0x80
+NO_SUCH_INSTANCE  = 0x81
+END_OF_MIB_VIEW   = 0x82
+
+GET_REQUEST       = 0xa0
+GET_NEXT_REQUEST  = 0xa1
+GET_RESPONSE      = 0xa2
+SET_REQUEST       = 0xa3
+GET_BULK_REQUEST  = 0xa5
+REPORT            = 0xa8
+
+# PDU error-status values
+NO_ERROR          = 0
+TOO_BIG           = 1
+NO_SUCH_NAME      = 2
+GEN_ERR           = 5
+
+# Tags whose contents are unsigned integers
+unsigned_tags = (COUNTER32, GAUGE32, TIMETICKS, COUNTER64)
+
+# Tags that carry no value and end a walk of a column
+exception_tags = (NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW)
+
+class DecodeError(Exception):
+    pass
+
+def parseOid(text):
+    return tuple(int(subid) for subid in text.strip(".").split("."))
+
+def formatOid(oid):
+    return "." + ".".join(str(subid) for subid in oid)
+
+def encodeLength(length):
+    if length < 0x80:
+        return struct.pack("B", length)
+    octets = []
+    while length:
+        octets.insert(0, length & 0xff)
+        length >>= 8
+    return struct.pack("B", 0x80 | len(octets)) + bytes(bytearray(octets))
+
+def encodeTlv(tag, contents):
+    return struct.pack("B", tag) + encodeLength(len(contents)) + contents
+
+def encodeIntegerContents(value, unsigned=False):
+    octets = bytearray()
+    while True:
+        octets.insert(0, value & 0xff)
+        value >>= 8
+        if unsigned:
+            # Keep a leading zero octet so the top bit does not read as a sign
+            if value == 0 and not octets[0] & 0x80:
+                break
+        elif (value == 0 and not octets[0] & 0x80) or (value == -1 and octets[0] & 0x80):
+            break
+    return bytes(octets)
+
+def encodeOidContents(oid):
+    if len(oid) < 2:
+        oid = tuple(oid) + (0,) * (2 - len(oid))
+    octets = bytearray([oid[0] * 40 + oid[1]])
+    for subid in oid[2:]:
+        chunk = [subid & 0x7f]
+        subid >>= 7
+        while subid:
+            chunk.insert(0, 0x80 | (subid & 0x7f))
+            subid >>= 7
+        octets.extend(chunk)
+    return bytes(octets)
+
+def encodeValue(tag, value):
+    if tag == INTEGER:
+        return encodeTlv(tag, encodeIntegerContents(value))
+    if tag in unsigned_tags:
+        return encodeTlv(tag, encodeIntegerContents(value, True))
+    if tag == OBJECT_IDENTIFIER:
+        return encodeTlv(tag, encodeOidContents(value))
+    if tag in (NULL,) + exception_tags:
+        return encodeTlv(tag, b"")
+    if not isinstance(value, bytes):
+        value = value.encode("utf-8")
+    return encodeTlv(tag, value)
+
+def encodeVarbind(oid, tag, value):
+    return encodeTlv(SEQUENCE, encodeTlv(OBJECT_IDENTIFIER, encodeOidContents(oid)) + encodeValue(tag, value))
+
+# The encoded varbind list of [(oid, tag, value), ...]
+def encodeVarbinds(varbinds):
+    return encodeTlv(SEQUENCE, b"".join([encodeVarbind(oid, tag, value) for oid, tag, value in varbinds]))
+
+# An SNMPv1/v2c message, version is the message version (0 for v1, 1 for
+# v2c). For GET_BULK_REQUEST error_status and error_index carry
+# non-repeaters and max-repetitions.
+def encodeMessage(version, community, pdu_type, request_id, error_status, error_index, varbinds):
+    if not isinstance(community, bytes):
+        community = community.encode("utf-8")
+    pdu = encodeTlv(pdu_type, encodeTlv(INTEGER, encodeIntegerContents(request_id)) +
+                              encodeTlv(INTEGER, encodeIntegerContents(error_status)) +
+                              encodeTlv(INTEGER, encodeIntegerContents(error_index)) +
+                              encodeVarbinds(varbinds))
+    return encodeTlv(SEQUENCE, encodeTlv(INTEGER, encodeIntegerContents(version)) +
+                               encodeTlv(OCTET_STRING, community) + pdu)
+
+# Read the tag and length at offset, returns (tag, start, end) of the contents
+def decodeHeader(data, offset, limit):
+    if offset + 2 > limit:
+        raise DecodeError("truncated header at %d" % offset)
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7f
+        if count == 0 or count > 4 or offset + count > limit:
+            raise DecodeError("bad length at %d" % offset)
+        length = 0
+        for i in range(count):
+            length = (length << 8) | data[offset + i]
+        offset += count
+    if offset + length > limit:
+        raise DecodeError("truncated value at %d" % offset)
+    return tag, offset, offset + length
+
+def decodeInteger(data, start, end, unsigned=False):
+    value = 0
+    for i in range(start, end):
+        value = (value << 8) | data[i]
+    if not unsigned and end > start and data[start] & 0x80:
+        value -= 1 << (8 * (end - start))
+    return value
+
+def decodeOid(data, start, end):
+    if start == end:
+        return ()
+    first = data[start]
+    oid = [first // 40, first % 40] if first < 80 else [2, first - 80]
+    subid = 0
+    for i in range(start + 1, end):
+        octet = data[i]
+        subid = (subid << 7) | (octet & 0x7f)
+        if not octet & 0x80:
+            oid.append(subid)
+            subid = 0
+    return tuple(oid)
+
+def decodeValue(data, tag, start, end):
+    if tag == INTEGER:
+        return decodeInteger(data, start, end)
+    if tag in unsigned_tags:
+        return decodeInteger(data, start, end, True)
+    if tag == OBJECT_IDENTIFIER:
+        return decodeOid(data, start, end)
+    if tag in (NULL,) + exception_tags:
+        return None
+    return bytes(data[start:end])
+
+# Decode an SNMPv1/v2c message from bytes or a memoryview, without copying
+# anything but the values. Returns (version, community, pdu_type, request_id,
+# error_status, error_index, [(oid, tag, value), ...]).
+def decodeMessage(data):
+    if not isinstance(data, memoryview):
+        data = memoryview(data)
+    limit = len(data)
+    tag, start, end = decodeHeader(data, 0, limit)
+    if tag != SEQUENCE:
+        raise DecodeError("not a message")
+    tag, start, offset = decodeHeader(data, start, end)
+    version = decodeInteger(data, start, offset)
+    tag, start, offset = decodeHeader(data, offset, end)
+    community = bytes(data[start:offset])
+    pdu_type, start, pdu_end = decodeHeader(data, offset, end)
+    fields = []
+    for i in range(3):
+        tag, start, offset = decodeHeader(data, start, pdu_end)
+        fields.append(decodeInteger(data, start, offset))
+        start = offset
+    tag, start, list_end = decodeHeader(data, start, pdu_end)
+    varbinds = []
+    while start < list_end:
+        tag, start, varbind_end = decodeHeader(data, start, list_end)
+        tag, oid_start, oid_end = decodeHeader(data, start, varbind_end)
+        oid = decodeOid(data, oid_start, oid_end)
+        tag, value_start, value_end = decodeHeader(data, oid_end, varbind_end)
+        varbinds.append((oid, tag, decodeValue(data, tag, value_start, value_end)))
+        start = varbind_end
+    return version, community, pdu_type, fields[0], fields[1], fields[2], varbinds
@@ -0,0 +1,57 @@
+import os
+import sys
+import types
+from snmp_tools import stats
+from snmp_tools.fleet import optionTargets, runFleet
+from snmp_tools.output import createWriter
+from snmp_tools.session import createSession, describeError, optionsTarget
+
+# Report an option that turned out unusable once the tool started the way
+# parser.error() does, returns its exit code
+def usageError(message):
+    sys.stderr.write("%s: error: %s\n" % (os.path.basename(sys.argv[0]), message))
+    sys.stderr.flush()
+    return 2
+
+# Poll the -d host, or every host of -f, with poll(session) and write the
+# result in the -o/--output format, render is the table renderer of the
+# metric. Returns the exit code of the tool, with '-o nagios' the plugin state.
+def run(options, metric, poll, render):
+    targets = None
+    try:
+        if options.targets_file:
+            targets = optionTargets(options)
+        stats.startStats(options)
+    except ValueError as option_error:
+        return usageError(option_error)
+    try:
+        writer = createWriter(options, {metric: render}, bool(options.targets_file))
+    except ValueError as option_error:
+        print(str(option_error))
+        return 3 if options.output == "nagios" else 2
+    exit_code = 0
+    try:
+        if options.targets_file:
+            exit_code = runFleet(options, metric, poll, writer, targets)
+        else:
+            target = optionsTarget(options)
+            try:
+                started = stats.timer()
+                result = poll(createSession(options))
+                if stats.registry is not None:
+                    # Streamed tables are read before the render is timed
+                    if isinstance(result, types.GeneratorType):
+                        result = list(result)
+                    stats.observe("poll_seconds", stats.elapsed(started), host="%s:%s" % (target["host"], target["port"]), metric=metric)
+                started = stats.timer()
+                writer.write(target, metric, result)
+                if stats.registry is not None:
+                    stats.observe("render_seconds", stats.elapsed(started), metric=metric)
+            except Exception as poll_error:
+                stats.recordError(options, "%s:%s" % (target["host"], target["port"]), poll_error)
+                writer.error(target, describeError(poll_error))
+                exit_code = 2
+    finally:
+        writer.close()
+        stats.dumpStats(options)
+    return writer.exitCode(exit_code)
@@ -0,0 +1,38 @@
+import os
+import sys
+
+# Environment variable naming the Unix socket of a resident snmp-tools-server.py
+socket_variable = "SNMP_TOOLS_SOCKET"
+
+# Hand this invocation of a get-snmp-* tool to the resident server when
+# SNMP_TOOLS_SOCKET is set: the server runs it in a warm process with the
+# arguments, working directory and stdin/stdout/stderr of this one, and this
+# process exits with its exit code. Returns, so the tool runs locally, when
+# the variable is unset or no server listens on the socket.
+def forwardToServer():
+    path = os.environ.get(socket_variable)
+    if not path:
+        return
+    import socket
+    import struct
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        tool = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        request = "\0".join([tool, os.getcwd()] + sys.argv[1:]).encode("utf-8")
+        sys.stdout.flush()
+        socket.send_fds(client, [request], [0, 1, 2])
+    except OSError:
+        client.close()
+        return
+    reply = b""
+    while len(reply) < 4:
+        data = client.recv(4 - len(reply))
+        if not data:
+            break
+        reply += data
+    client.close()
+    if len(reply) < 4:
+        sys.stderr.write("Error occurred during executing script: the snmp-tools server closed the connection\n")
+        sys.exit(2)
+    sys.exit(struct.unpack("!i", reply)[0])
@@ -0,0 +1,339 @@
+import os
+import time
+import bisect
+import signal
+import struct
+import marshal
+import hashlib
+import multiprocessing
+from multiprocessing import shared_memory
+from snmp_tools.fleet import hostDeadline, pollFleet
+from snmp_tools.output import records
+from snmp_tools.pollers import iterDisks, iterInterfaces, pollScalars
+from snmp_tools.session import createSession, describeError
+from snmp_tools.state import openStateStore
+
+# Metrics a collector polls: the scalars go out in a single GET per device
+# and tick, each table is walked
+collector_tables = ("disk", "interface")
+
+# Points of a worker on the hash ring, more spread the shards more evenly
+ring_replicas = 128
+
+def hashKey(key):
+    return struct.unpack_from(">Q", hashlib.md5(key.encode("utf-8")).digest())[0]
+
+def targetKey(target):
+    return "%s:%s" % (target["host"], target["port"])
+
+# Consistent hash ring of worker ids. Removing a worker moves only the
+# targets it had to the others, adding one takes over a 1/N share of them.
+class HashRing(object):
+    def __init__(self, nodes=(), replicas=ring_replicas):
+        self.replicas = replicas
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = hashKey("%s#%d" % (node, replica))
+            bisect.insort(self.points, point)
+            self.owners[point] = node
+
+    def remove(self, node):
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = dict((point, self.owners[point]) for point in self.points)
+
+    def __len__(self):
+        return len(set(self.owners.values()))
+
+    def node(self, key):
+        if not self.points:
+            return None
+        position = bisect.bisect(self.points, hashKey(key)) % len(self.points)
+        return self.owners[self.points[position]]
+
+    # The targets of each node
+    def assign(self, targets):
+        shards = dict((node, []) for node in set(self.owners.values()))
+        for target in targets:
+            shards[self.node(targetKey(target))].append(target)
+        return shards
+
+# Single producer, single consumer ring of length prefixed records in shared
+# memory. The first cache line holds the write and read positions, counted
+# in bytes since the start, the records follow and wrap around at capacity.
+# The producer moves the write position only after the record is in place,
+# so the consumer never reads a partial one.
+ring_positions = struct.Struct("<QQ")
+ring_length    = struct.Struct("<I")
+ring_offset    = 64
+
+class RingBuffer(object):
+    def __init__(self, memory, owner=False):
+        self.memory = memory
+        self.owner = owner
+        self.buffer = memory.buf
+        self.capacity = memory.size - ring_offset
+
+    @classmethod
+    def create(cls, capacity):
+        memory = shared_memory.SharedMemory(create=True, size=capacity + ring_offset)
+        ring_positions.pack_into(memory.buf, 0, 0, 0)
+        return cls(memory, owner=True)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def copyIn(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buffer[ring_offset + start:ring_offset + start + first] = data[:first]
+        if first < len(data):
+            self.buffer[ring_offset:ring_offset + len(data) - first] = data[first:]
+
+    def copyOut(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.buffer[ring_offset + start:ring_offset + start + first])
+        if first < size:
+            data += bytes(self.buffer[ring_offset:ring_offset + size - first])
+        return data
+
+    # Append a record, False when the ring has no room for it. A record
+    # larger than the whole ring raises ValueError.
+    def put(self, data):
+        size = ring_length.size + len(data)
+        if size > self.capacity:
+            raise ValueError("record of %d bytes does not fit a ring of %d" % (len(data), self.capacity))
+        head, tail = ring_positions.unpack_from(self.buffer, 0)
+        if self.capacity - (head - tail) < size:
+            return False
+        self.copyIn(head, ring_length.pack(len(data)) + data)
+        struct.pack_into("<Q", self.buffer, 0, head + size)
+        return True
+
+    # The next record, None when the ring is empty
+    def get(self):
+        head, tail = ring_positions.unpack_from(self.buffer, 0)
+        if head == tail:
+            return None
+        size = ring_length.unpack(self.copyOut(tail, ring_length.size))[0]
+        data = self.copyOut(tail + ring_length.size, size)
+        struct.pack_into("<Q", self.buffer, 8, tail + ring_length.size + size)
+        return data
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+# A poll of one device as a ring record: where and when it was polled, then
+# the flat records of each metric or the error of the poll
+def encodeResult(target, timestamp, results, error=None):
+    return marshal.dumps((target["host"], target["port"], target["community"], timestamp, results, error))
+
+def decodeResult(data):
+    host, port, community, timestamp, results, error = marshal.loads(data)
+    return {"host": host, "port": port, "community": community}, timestamp, results, error
+
+# Poll metrics of one device and flatten the results in the worker, so only
+# plain records cross the process boundary
+def pollTarget(options, target, metrics, state):
+    session = createSession(options, target, hostDeadline(options))
+    results = {}
+    scalars = [metric for metric in metrics if metric not in collector_tables]
+    if scalars:
+        for metric, result in pollScalars(session, scalars, options.max_message_size).items():
+            results[metric] = list(records(metric, result))
+    if "disk" in metrics:
+        results["disk"] = list(records("disk", iterDisks(session, options.max_repetitions, state)))
+    if "interface" in metrics:
+        results["interface"] = list(records("interface", iterInterfaces(session, options.max_repetitions, state)))
+    return results
+
+# Put a record into the ring, waiting for the daemon to make room instead of
+# dropping results
+def putResult(ring, data):
+    while not ring.put(data):
+        time.sleep(0.001)
+
+# Body of a worker process: poll the shard it was given on the fixed interval
+# with a pool of threads and put each result into its ring. The shard is
+# replaced whenever the daemon sends a new one over control, None stops it.
+# Like watch.schedule() the ticks do not drift and missed ones are skipped,
+# but the wait for the next one is a wait on control.
+def runWorker(options, metrics, interval, ring, control, core=None):
+    # The daemon decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, [core])
+    parent = os.getppid()
+    state = openStateStore(options)
+    targets = control.recv()
+    if targets is None:
+        return
+    start = time.monotonic()
+    tick = 0
+    while True:
+        if control.poll(max(0.0, start + tick*interval - time.monotonic())):
+            targets = control.recv()
+            if targets is None:
+                return
+            continue
+        if os.getppid() != parent:
+            return
+        timestamp = time.time()
+        for target, results, error in pollFleet(targets, lambda target: pollTarget(options, target, metrics, state),
+                                                options.workers):
+            data = encodeResult(target, timestamp, results, None if error is None else describeError(error))
+            try:
+                putResult(ring, data)
+            except ValueError as ring_error:
+                # One host with too large a result must not take the worker
+                # and the rest of its shard down
+                putResult(ring, encodeResult(target, timestamp, None, "%s, raise --ring-size" % ring_error))
+        tick += 1
+        if interval > 0:
+            tick = max(tick, int((time.monotonic() - start) / interval))
+
+class Worker(object):
+    def __init__(self, process, ring, control, core):
+        self.process = process
+        self.ring = ring
+        self.control = control
+        self.core = core
+
+# Collector daemon: shards the targets over processes worker processes by
+# consistent hashing, hands each result to sink(target, timestamp, results,
+# error) as the workers put them in their shared memory rings, and when a
+# worker dies spreads its shard over the others and starts a replacement
+# after respawn_delay seconds. With pin each worker is bound to one core.
+# flush() is called after every batch of results handed to the sink.
+class Collector(object):
+    def __init__(self, options, targets, metrics, sink, processes, interval,
+                 ring_size=4 << 20, pin=False, respawn_delay=5.0, flush=None):
+        self.options = options
+        self.targets = targets
+        self.metrics = metrics
+        self.sink = sink
+        self.flush = flush
+        self.processes = processes
+        self.interval = interval
+        self.ring_size = ring_size
+        self.pin = pin
+        self.respawn_delay = respawn_delay
+        self.context = multiprocessing.get_context("fork")
+        self.ring = HashRing()
+        self.workers = {}
+        self.respawns = []
+        self.next_id = 0
+        self.results = 0
+
+    def start(self):
+        for slot in range(self.processes):
+            self.spawn()
+        self.rebalance()
+
+    def spawn(self):
+        worker_id = self.next_id
+        self.next_id += 1
+        cores = os.cpu_count() or 1
+        core = worker_id % cores if self.pin else None
+        ring = RingBuffer.create(self.ring_size)
+        control, worker_control = self.context.Pipe()
+        process = self.context.Process(target=runWorker, name="snmp-collector-%d" % worker_id,
+                                       args=(self.options, self.metrics, self.interval, ring, worker_control, core))
+        process.daemon = True
+        process.start()
+        worker_control.close()
+        self.workers[worker_id] = Worker(process, ring, control, core)
+        self.ring.add(worker_id)
+        return worker_id
+
+    # Send every worker its shard of the targets
+    def rebalance(self):
+        shards = self.ring.assign(self.targets)
+        for worker_id, worker in self.workers.items():
+            try:
+                worker.control.send(shards.get(worker_id, []))
+            except (OSError, EOFError):
+                pass
+
+    # Hand every result waiting in the rings to the sink, returns how many
+    def drain(self):
+        drained = 0
+        for worker in list(self.workers.values()):
+            while True:
+                data = worker.ring.get()
+                if data is None:
+                    break
+                self.sink(*decodeResult(data))
+                drained += 1
+        self.results += drained
+        return drained
+
+    # Replace the workers that died, returns the ids of the dead ones
+    def check(self):
+        dead = [worker_id for worker_id, worker in self.workers.items() if not worker.process.is_alive()]
+        for worker_id in dead:
+            self.drain()
+            worker = self.workers.pop(worker_id)
+            worker.process.join()
+            worker.control.close()
+            worker.ring.close()
+            self.ring.remove(worker_id)
+            self.respawns.append(time.monotonic() + self.respawn_delay)
+        if dead and self.workers:
+            self.rebalance()
+        now = time.monotonic()
+        due = [when for when in self.respawns if when <= now]
+        if due:
+            self.respawns = [when for when in self.respawns if when > now]
+            for when in due:
+                self.spawn()
+            self.rebalance()
+        return dead
+
+    # Drain the rings until duration seconds passed (forever with None),
+    # checking on the workers every second
+    def run(self, duration=None):
+        deadline = None if duration is None else time.monotonic() + duration
+        checked = time.monotonic()
+        idle = 0.001
+        while deadline is None or time.monotonic() < deadline:
+            if self.drain():
+                if self.flush is not None:
+                    self.flush()
+                idle = 0.001
+            else:
+                time.sleep(idle)
+                idle = min(idle * 2, 0.05)
+            if time.monotonic() - checked >= 1.0:
+                self.check()
+                checked = time.monotonic()
+
+    def stop(self):
+        for worker in self.workers.values():
+            try:
+                worker.control.send(None)
+            except (OSError, EOFError):
+                pass
+        deadline = time.monotonic() + 10.0
+        for worker in self.workers.values():
+            while worker.process.is_alive() and time.monotonic() < deadline:
+                self.drain()
+                worker.process.join(0.05)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        self.drain()
+        for worker in self.workers.values():
+            worker.control.close()
+            worker.ring.close()
+        self.workers = {}
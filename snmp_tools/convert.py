@@ -0,0 +1,43 @@
+import math
+
+size_names = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+# Human readable size, unit is the unit of size: "B" for octet counters,
+# "KB" for the UCD-SNMP memory and disk values which are in kilobytes
+def convertSize(size, unit="B"):
+    if (size <= 0):
+        return '0 %s' % unit
+    names = size_names[size_names.index(unit):]
+    i = min(int(math.floor(math.log(size,1024))), len(names)-1)
+    p = math.pow(1024,i)
+    s = round(size/p,2)
+    return '%s %s' % (s,names[i])
+
+rate_names = ("", "K", "M", "G", "T", "P")
+
+# Human readable rate in SI units, e.g. convertRate(1.5e9, "bps") is
+# '1.5 Gbps', a rate that could not be computed (NaN) is shown as '-'
+def convertRate(rate, unit="bps"):
+    if (rate != rate):
+        return '-'
+    if (rate < 1000):
+        return '%s %s' % (round(rate,2),unit)
+    i = min(int(math.floor(math.log(rate,1000))), len(rate_names)-1)
+    return '%s %s%s' % (round(rate/math.pow(1000,i),2),rate_names[i],unit)
+
+def PortStatus(status):
+    status = int(status)
+    if status == 1:
+        return "up"
+    if status == 2:
+        return "down"
+    if status == 3:
+        return "testing"
+    if status == 4:
+        return "unknow"
+    if status == 5:
+        return "dormant"
+    if status == 6:
+        return "notPresent"
+    if status == 7:
+        return "lowerLayerDown"
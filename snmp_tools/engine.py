@@ -0,0 +1,349 @@
+import time
+import heapq
+import random
+import select
+import socket
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from snmp_tools import ber
+
+# A pure-Python SNMPv1/v2c engine, the --snmp-engine python alternative to
+# the net-snmp bindings. Every session of the process shares one
+# non-blocking UDP socket per address family: requests are matched to their
+# responses by request-id, so one dispatcher thread serves any number of
+# devices and polling threads at once. Responses are read into one
+# preallocated buffer and decoded from memoryview slices of it, only the
+# values are copied out.
+
+# The netsnmp ErrorNum of a request that got no response
+SNMPERR_TIMEOUT = -24
+
+# Request ids are positive 32-bit INTEGERs
+max_request_id = 0x7fffffff
+
+# netsnmp varbind type names by tag
+type_names = {
+    ber.INTEGER           : "INTEGER",
+    ber.OCTET_STRING      : "OCTETSTR",
+    ber.NULL              : "NULL",
+    ber.OBJECT_IDENTIFIER : "OBJECTID",
+    ber.IP_ADDRESS        : "IPADDR",
+    ber.COUNTER32         : "COUNTER",
+    ber.GAUGE32           : "GAUGE",
+    ber.TIMETICKS         : "TICKS",
+    ber.OPAQUE            : "OPAQUE",
+    ber.COUNTER64         : "COUNTER64",
+    ber.NO_SUCH_OBJECT    : "NOSUCHOBJECT",
+    ber.NO_SUCH_INSTANCE  : "NOSUCHINSTANCE",
+    ber.END_OF_MIB_VIEW   : "ENDOFMIBVIEW",
+}
+
+# ErrorStr of the response error-status values, as net-snmp words them
+error_messages = {
+    1 : "(tooBig) Response message would have been too large.",
+    2 : "(noSuchName) There is no such variable name in this MIB.",
+    3 : "(badValue) The value given has the wrong type or length.",
+    4 : "(readOnly) The two parties used do not have access to use the specified SNMP PDU.",
+    5 : "(genError) A general failure occured",
+}
+
+# Hands requests to the network and their responses, or None once their
+# timeout passed, to callbacks on the dispatcher thread. Late responses,
+# and responses from another address, of another version or community
+# than the request, or that are not a GetResponse, are dropped.
+class Engine(object):
+    def __init__(self, buffer_size=65535):
+        self.lock = threading.Lock()
+        self.sockets = {}
+        self.pending = {}
+        self.deadlines = []
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.next_id = random.randint(1, max_request_id)
+        self.waker, self.wakeup = socket.socketpair()
+        self.waker.setblocking(False)
+        self.wakeup.setblocking(False)
+        self.thread = None
+
+    def requestId(self):
+        with self.lock:
+            self.next_id = self.next_id % max_request_id + 1
+            return self.next_id
+
+    def socketFor(self, family):
+        sock = self.sockets.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+            self.sockets[family] = sock
+        return sock
+
+    # Send message to address and call callback(reply) with the decoded
+    # response to request_id, or callback(None) after timeout seconds.
+    # version and community are those of message, the response must have
+    # them too. Returns at once, callback runs on the dispatcher thread.
+    def submit(self, family, address, message, request_id, timeout, version, community, callback):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            # A new socket must join the select of the dispatcher too
+            earliest = family not in self.sockets
+            sock = self.socketFor(family)
+            self.pending[request_id] = ((address[:2], version, community), callback)
+            heapq.heappush(self.deadlines, (deadline, request_id))
+            earliest = earliest or self.deadlines[0][1] == request_id
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="snmp-engine")
+                self.thread.daemon = True
+                self.thread.start()
+        try:
+            sock.sendto(message, address)
+        except OSError:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise
+        if earliest:
+            self.wake()
+
+    # submit and wait for the reply, None on timeout
+    def call(self, family, address, message, request_id, timeout, version, community):
+        done = threading.Event()
+        replies = []
+        def callback(reply):
+            replies.append(reply)
+            done.set()
+        self.submit(family, address, message, request_id, timeout, version, community, callback)
+        done.wait()
+        return replies[0]
+
+    # Interrupt the select of the dispatcher, a new deadline may come first
+    def wake(self):
+        try:
+            self.wakeup.send(b"\x00")
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def run(self):
+        while True:
+            with self.lock:
+                sockets = list(self.sockets.values())
+                timeout = max(0.0, self.deadlines[0][0] - time.monotonic()) if self.deadlines else None
+            readable, writable, errors = select.select(sockets + [self.waker], [], [], timeout)
+            for sock in readable:
+                if sock is self.waker:
+                    try:
+                        while self.waker.recv(4096):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                else:
+                    self.receive(sock)
+            self.expire()
+
+    # Dispatch every datagram waiting on sock
+    def receive(self, sock):
+        while True:
+            try:
+                size, address = sock.recvfrom_into(self.buffer)
+            except OSError:
+                return
+            try:
+                reply = ber.decodeMessage(self.view[:size])
+            except (ber.DecodeError, IndexError):
+                continue
+            if reply[2] != ber.GET_RESPONSE:
+                continue
+            with self.lock:
+                entry = self.pending.get(reply[3])
+                if entry is None or entry[0] != (address[:2], reply[0], reply[1]):
+                    continue
+                del self.pending[reply[3]]
+            entry[1](reply)
+
+    def expire(self):
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                deadline, request_id = heapq.heappop(self.deadlines)
+                entry = self.pending.pop(request_id, None)
+                if entry is not None:
+                    expired.append(entry[1])
+        for callback in expired:
+            callback(None)
+
+# The Engine of the process, started with the first session
+engine = None
+engine_lock = threading.Lock()
+
+def defaultEngine():
+    global engine
+    with engine_lock:
+        if engine is None:
+            engine = Engine()
+        return engine
+
+# Resolved (family, address) of (host, port) with the time.monotonic() they
+# expire at: a long running watch or collector looks a name up again every
+# resolve_ttl seconds, so it follows a device that moved. Past
+# max_resolved the least recently used one is dropped.
+resolved = OrderedDict()
+resolved_lock = threading.Lock()
+resolve_ttl = 300.0
+max_resolved = 1024
+
+def resolve(host, port):
+    key = (host, port)
+    with resolved_lock:
+        entry = resolved.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            resolved.move_to_end(key)
+            return entry[1]
+    family, kind, protocol, name, address = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)[0]
+    with resolved_lock:
+        resolved[key] = (time.monotonic() + resolve_ttl, (family, address))
+        resolved.move_to_end(key)
+        while len(resolved) > max_resolved:
+            resolved.popitem(last=False)
+    return family, address
+
+# The encoded varbind of a request for oid, OIDs of the polled columns and
+# scalars repeat every poll
+@lru_cache(maxsize=4096)
+def requestVarbind(oid):
+    name = ber.encodeTlv(ber.OBJECT_IDENTIFIER, ber.encodeOidContents(ber.parseOid(oid)))
+    return ber.encodeTlv(ber.SEQUENCE, name + b"\x05\x00")
+
+def encodeRequest(version, community, pdu_type, request_id, field1, field2, oids):
+    pdu = ber.encodeTlv(pdu_type, ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(request_id)) +
+                                  ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(field1)) +
+                                  ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(field2)) +
+                                  ber.encodeTlv(ber.SEQUENCE, b"".join([requestVarbind(oid) for oid in oids])))
+    return ber.encodeTlv(ber.SEQUENCE, ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(version)) +
+                                       ber.encodeTlv(ber.OCTET_STRING, community) + pdu)
+
+def varbindOid(var):
+    if var.iid is None or var.iid == "":
+        return var.tag
+    return "%s.%s" % (var.tag, var.iid)
+
+# A value as netsnmp returns it: numbers as their decimal digits, OIDs and
+# IpAddresses as dotted text, strings as they are, all bytes
+def formatValue(tag, value):
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return str(value).encode("ascii")
+    if tag == ber.OBJECT_IDENTIFIER:
+        return ber.formatOid(value).encode("ascii")
+    if tag == ber.IP_ADDRESS:
+        return ".".join(str(octet) for octet in bytearray(value)).encode("ascii")
+    return value
+
+def fillVarbind(var, oid, tag, value):
+    var.tag  = ber.formatOid(oid[:-1]) if len(oid) > 1 else ber.formatOid(oid)
+    var.iid  = str(oid[-1]) if len(oid) > 1 else ""
+    var.type = type_names.get(tag, "OCTETSTR")
+    var.val  = formatValue(tag, value)
+
+# A netsnmp.Session look-alike on the Engine, for SNMPv1 and v2c. Timeout is
+# in microseconds like netsnmp's, errors are reported the same way in
+# ErrorStr, ErrorNum and ErrorInd.
+class EngineSession(object):
+    def __init__(self, DestHost="localhost", Version=2, Community="public", RemotePort=161,
+                 Timeout=1000000, Retries=3, UseNumeric=True, engine=None):
+        if int(Version) not in (1, 2):
+            raise ValueError("the python SNMP engine supports SNMP versions 1 and 2c, not %s" % Version)
+        self.DestHost   = DestHost
+        self.Version    = int(Version)
+        self.Community  = Community
+        self.RemotePort = int(RemotePort)
+        self.Timeout    = Timeout
+        self.Retries    = Retries
+        self.UseNumeric = UseNumeric
+        self.ErrorStr   = ''
+        self.ErrorNum   = 0
+        self.ErrorInd   = 0
+        self.community  = Community.encode("utf-8") if not isinstance(Community, bytes) else Community
+        self.family, self.address = resolve(DestHost, self.RemotePort)
+        self.engine = engine if engine is not None else defaultEngine()
+
+    # Send the request for the varbinds of varlist, Retries more times after
+    # a timeout. Returns the response varbinds, None after an error.
+    def request(self, pdu_type, field1, field2, varlist):
+        self.ErrorStr = ''
+        self.ErrorNum = 0
+        self.ErrorInd = 0
+        oids = [varbindOid(var) for var in varlist]
+        for attempt in range(max(0, self.Retries) + 1):
+            request_id = self.engine.requestId()
+            message = encodeRequest(self.Version - 1, self.community, pdu_type, request_id, field1, field2, oids)
+            reply = self.engine.call(self.family, self.address, message, request_id, self.Timeout / 1000000.0,
+                                     self.Version - 1, self.community)
+            if reply is not None:
+                break
+        else:
+            self.ErrorStr = "Timeout"
+            self.ErrorNum = SNMPERR_TIMEOUT
+            return None
+        version, community, pdu_type, request_id, error_status, error_index, varbinds = reply
+        if error_status != ber.NO_ERROR:
+            self.ErrorStr = error_messages.get(error_status, "(error %d) SNMP error status" % error_status)
+            self.ErrorNum = error_status
+            self.ErrorInd = error_index
+            return None
+        return varbinds
+
+    def get(self, varlist):
+        varbinds = self.request(ber.GET_REQUEST, 0, 0, varlist)
+        if varbinds is None:
+            return None
+        for var, (oid, tag, value) in zip(varlist, varbinds):
+            fillVarbind(var, oid, tag, value)
+        return tuple(var.val for var in varlist)
+
+    def getnext(self, varlist):
+        varbinds = self.request(ber.GET_NEXT_REQUEST, 0, 0, varlist)
+        if varbinds is None:
+            return None
+        for var, (oid, tag, value) in zip(varlist, varbinds):
+            fillVarbind(var, oid, tag, value)
+        return tuple(var.val for var in varlist)
+
+    # The response varbinds replace those of varlist, like netsnmp's getbulk
+    def getbulk(self, nonrepeaters, maxrepetitions, varlist):
+        from snmp_tools.varbind import Varbind
+        varbinds = self.request(ber.GET_BULK_REQUEST, nonrepeaters, maxrepetitions, varlist)
+        if varbinds is None:
+            return None
+        result = []
+        for oid, tag, value in varbinds:
+            var = Varbind()
+            fillVarbind(var, oid, tag, value)
+            result.append(var)
+        varlist.varbinds[:] = result
+        return tuple(var.val for var in result)
+
+    # The subtree of each varbind of varlist, with GETNEXT, replacing them
+    def walk(self, varlist):
+        from snmp_tools.varbind import Varbind
+        result = []
+        for root in list(varlist):
+            prefix = varbindOid(root)
+            var = Varbind(prefix)
+            while True:
+                if self.getnext([var]) is None:
+                    if self.ErrorNum == ber.NO_SUCH_NAME:
+                        self.ErrorStr = ''
+                        self.ErrorNum = 0
+                        self.ErrorInd = 0
+                        break
+                    return None
+                oid = varbindOid(var)
+                if not oid.startswith(prefix + ".") or var.type == "ENDOFMIBVIEW":
+                    break
+                result.append(var)
+                var = Varbind(var.tag, var.iid)
+        varlist.varbinds[:] = result
+        return tuple(var.val for var in result)
@@ -0,0 +1,118 @@
+import sys
+import types
+
+# Read the targets to poll, one per line as "host[:port] [community]".
+# Empty lines and lines starting with '#' are ignored, '-' reads stdin.
+# ValueError names the file, line and value of a malformed port.
+def readTargets(path, default_port=161, default_community="public"):
+    if path == "-":
+        name  = "<stdin>"
+        lines = sys.stdin.readlines()
+    else:
+        name  = path
+        with open(path) as targets_file:
+            lines = targets_file.readlines()
+    targets = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields    = line.split()
+        host      = fields[0]
+        port      = default_port
+        community = default_community
+        # host:port, but leave bare IPv6 addresses alone
+        if host.count(":") == 1:
+            host, port = host.split(":")
+            if not port.isdigit() or not 0 < int(port) <= 65535:
+                raise ValueError("%s:%d: invalid port '%s'" % (name, number, port))
+            port = int(port)
+        if len(fields) > 1:
+            community = fields[1]
+        targets.append({"host": host, "port": port, "community": community})
+    return targets
+
+# The targets of -f, ValueError when the file cannot be read or has a
+# malformed line
+def optionTargets(options):
+    try:
+        return readTargets(options.targets_file, int(options.snmp_port), options.snmp_community)
+    except EnvironmentError as read_error:
+        raise ValueError("cannot read targets file '%s': %s" % (options.targets_file, read_error.strerror or read_error))
+
+# Poll every target with poll(target) on a bounded pool of worker threads and
+# yield (target, result, error) as each host finishes, so one slow device does
+# not hold back the output of the others. netsnmp releases the GIL while it
+# waits for a response, and the per-host timeout is enforced by the session
+# Timeout/Retries each poll function is given.
+def pollFleet(targets, poll, workers=32):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(poll, target), target) for target in targets)
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                yield target, future.result(), None
+            except Exception as exception_error:
+                yield target, None, exception_error
+
+def addFleetOptions(parser):
+    parser.add_option("-f", "--targets-file",
+        action  = "store",
+        type    = "string",
+        dest    = "targets_file",
+        default = None,
+        help    = "poll every 'host[:port] [community]' listed in this file concurrently, '-' reads stdin")
+    parser.add_option("-w", "--workers",
+        action  = "store",
+        type    = "int",
+        dest    = "workers",
+        default = 32,
+        help    = "number of hosts polled at the same time with -f, defaults to '32'")
+    parser.add_option("--host-timeout",
+        action  = "store",
+        type    = "float",
+        dest    = "host_timeout",
+        default = 60.0,
+        help    = "seconds all the requests of the poll of one -f host may take together, table walks included, 0 for no limit, defaults to '60'")
+
+# The monotonic time by which all requests of a poll of one host started now
+# must be done, None without --host-timeout
+def hostDeadline(options):
+    host_timeout = getattr(options, "host_timeout", 0)
+    if not host_timeout:
+        return None
+    import time
+    return time.monotonic() + host_timeout
+
+# Poll one target of a fleet with poll(session), in a worker thread
+def pollTarget(options, metric, poll, target):
+    from snmp_tools import stats
+    from snmp_tools.session import createSession
+    started = stats.timer()
+    result = poll(createSession(options, target, hostDeadline(options)))
+    # Streamed tables are read here, in the worker thread
+    if isinstance(result, types.GeneratorType):
+        result = list(result)
+    if stats.registry is not None:
+        stats.observe("poll_seconds", stats.elapsed(started), host="%s:%s" % (target["host"], target["port"]), metric=metric)
+    return result
+
+# Poll the targets of -f with poll(session) and hand each host's result to
+# the writer as soon as it is ready, returns the exit code: 0 if every host
+# answered, 2 otherwise.
+def runFleet(options, metric, poll, writer, targets):
+    from snmp_tools import stats
+    from snmp_tools.session import describeError
+    exit_code = 0
+    for target, result, error in pollFleet(targets, lambda target: pollTarget(options, metric, poll, target), options.workers):
+        if error is not None:
+            stats.recordError(options, "%s:%s" % (target["host"], target["port"]), error)
+            writer.error(target, describeError(error))
+            exit_code = 2
+        else:
+            started = stats.timer()
+            writer.write(target, metric, result)
+            if stats.registry is not None:
+                stats.observe("render_seconds", stats.elapsed(started), metric=metric)
+    return exit_code
@@ -0,0 +1,118 @@
+import time
+import hashlib
+import marshal
+from collections import namedtuple
+from snmp_tools.pollers import (disk_static_columns, disk_table_columns, if_static_columns, if_table_columns,
+                                sys_uptime_oid, toInt, toStr)
+from snmp_tools.session import checkSession
+from snmp_tools.state import deviceKey
+from snmp_tools.table import commonOid, indexKey, walkTable
+
+# Inventory sync of the descriptive columns of a table, the interface names
+# and MACs or the disk mounts, against the copy kept in the StateStore. The
+# columns are only walked again when a cheap indicator says the rows may
+# have changed: sysUpTime went back (the agent restarted), a table scalar
+# like ifNumber or ifTableLastChange moved, or the row indexes differ. A
+# row that changes in place without moving any of those, like a remount in
+# the dskTable, is caught by a full walk every resync seconds. The walked
+# rows are hashed, and only the rows added, removed or changed since the
+# last sync are reported.
+
+# IF-MIB ifNumber, and ifTableLastChange, the sysUpTime of the last row
+# added to or removed from the ifTable
+if_number_oid            = '.1.3.6.1.2.1.2.1.0'
+if_table_last_change_oid = '.1.3.6.1.2.1.31.1.5.0'
+
+# The columns walked to compare the row indexes
+if_index_oid  = '.1.3.6.1.2.1.2.2.1.1'          # ifIndex
+dsk_index_oid = '.1.3.6.1.4.1.2021.9.1.1'       # dskIndex
+
+def decodeInterface(row):
+    return {"descr"        : toStr(row.get("descr")),
+            "type"         : toInt(row.get("type")),
+            "phys_address" : row.get("phys_address")}
+
+def decodeDisk(row):
+    return {"path"   : toStr(row.get("path")),
+            "device" : toStr(row.get("device"))}
+
+# The descriptive columns of a table, the scalars that change with its
+# rows, the column walked to compare the row indexes when the agent lacks
+# one of those, and the decoder of a row
+InventoryTable = namedtuple("InventoryTable", ["columns", "indicators", "index_column", "decode"])
+
+inventory_tables = {
+    "interface" : InventoryTable(dict((name, if_table_columns[name]) for name in if_static_columns),
+                                 (if_number_oid, if_table_last_change_oid), if_index_oid, decodeInterface),
+    "disk"      : InventoryTable(dict((name, disk_table_columns[name]) for name in disk_static_columns),
+                                 (), dsk_index_oid, decodeDisk),
+}
+
+# A row added, removed or changed since the last sync, row holds its
+# decoded values, the last ones seen for a removed row
+InventoryChange = namedtuple("InventoryChange", ["change", "index", "row"])
+
+# StateStore key prefix of the last sync of a table, kept apart from the
+# index map walkTableCached shares with the pollers
+inventory_state_prefix = "inventory:"
+
+# Seconds the last sync is kept, apart from the --state-ttl of the counter
+# samples and index maps: a sync that finds it expired reports every row as
+# added again, so it has to outlive any gap between two runs
+inventory_ttl = 86400.0 * 365
+
+# A digest of the rows that does not depend on dictionary order
+def contentDigest(rows):
+    content = sorted((index, sorted(row.items())) for index, row in rows.items())
+    return hashlib.sha1(marshal.dumps(content)).hexdigest()
+
+def diffRows(old, new, decode):
+    changes = []
+    for index in sorted(set(old) | set(new), key=indexKey):
+        if index not in old:
+            changes.append(InventoryChange("added", index, decode(new[index])))
+        elif index not in new:
+            changes.append(InventoryChange("removed", index, decode(old[index])))
+        elif old[index] != new[index]:
+            changes.append(InventoryChange("changed", index, decode(new[index])))
+    return changes
+
+# Sync the inventory of the table name (see inventory_tables) of the device
+# and return the InventoryChanges since the previous sync, every row as
+# added on the first one. state is required, it keeps the previous sync.
+# A sync that found changes also refreshes the index map the pollers cache,
+# so the counter polls pick up the new rows without a walk of their own.
+def syncInventory(session, name, max_repetitions=25, state=None, max_message_size=1472, resync=3600.0):
+    from snmp_tools.planner import fetchScalars
+    table      = inventory_tables[name]
+    device     = deviceKey(session)
+    key        = commonOid(list(table.columns.values()))
+    scalars    = fetchScalars(session, (sys_uptime_oid,) + table.indicators, max_message_size)
+    uptime     = toInt(scalars.get(sys_uptime_oid))
+    indicators = [scalars.get(oid) for oid in table.indicators]
+    previous   = state.get(device, inventory_state_prefix + key)
+    rows       = None
+    digest     = None
+    walked     = time.time()
+    if previous is not None and uptime >= previous[0] and indicators == list(previous[1]) and \
+       walked - previous[4] < resync:
+        if indicators and None not in indicators:
+            rows = previous[3]
+        else:
+            indexes = walkTable(session, {"index": table.index_column}, max_repetitions)
+            checkSession(session)
+            if set(indexes) == set(previous[3]):
+                rows = previous[3]
+        if rows is not None:
+            digest = previous[2]
+            walked = previous[4]
+    if rows is None:
+        rows = walkTable(session, table.columns, max_repetitions)
+        checkSession(session)
+        digest = contentDigest(rows)
+    changes = []
+    if previous is None or digest != previous[2]:
+        changes = diffRows(previous[3] if previous is not None else {}, rows, table.decode)
+        state.put(device, key, rows)
+    state.put(device, inventory_state_prefix + key, (uptime, indicators, digest, rows, walked), inventory_ttl)
+    return changes
@@ -0,0 +1,318 @@
+from optparse import OptionParser, OptionValueError
+from snmp_tools.fleet import addFleetOptions
+from snmp_tools.output import output_formats
+from snmp_tools.pollers import if_table_columns, oper_status_values, scalar_metrics
+
+# Check if port is in the range of 1-65535
+def IsPortValid(option, opt_str, value, parser):
+    if (value <= 0 or value >65535):
+        parser.values.snmp_port = 161
+        print("snmp port must be in range of 1-6535, defaulting to '161'")
+    else:
+        parser.values.snmp_port = value
+
+# Store a comma separated list, each item converted with convert, which
+# raises ValueError or KeyError for an invalid one
+def ListOption(option, opt_str, value, parser, convert=str):
+    values = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            values.append(convert(item))
+        except (KeyError, ValueError):
+            raise OptionValueError("option %s: invalid value '%s'" % (opt_str, item))
+    setattr(parser.values, option.dest, values)
+
+# Store a --stats-listen address once it parses as [host:]port
+def ListenAddress(option, opt_str, value, parser):
+    from snmp_tools.stats import listenAddress
+    try:
+        listenAddress(value)
+    except ValueError as address_error:
+        raise OptionValueError("option %s: %s" % (opt_str, address_error))
+    setattr(parser.values, option.dest, value)
+
+def interfaceColumn(name):
+    if name != "index" and name not in if_table_columns:
+        raise KeyError(name)
+    return name
+
+def operStatus(value):
+    return int(value) if value.isdigit() else oper_status_values[value]
+
+# The option parser with the connection options every get-snmp-* tool accepts
+def createParser(usage, version="%prog 1.0"):
+    parser = OptionParser(usage = usage,version = version)
+    parser.add_option("-d", "--destination",
+        action  = "store",
+        type    = "string",
+        dest    = "snmp_destination",
+        default = "127.0.0.1",
+        help    = "destination to query, defaults to 127.0.0.1")
+    parser.add_option("-p", "--port",
+        action  = "callback",
+        type    = "int",
+        dest    = "snmp_port",
+        callback = IsPortValid,
+        default = 161,
+        help    = "SNMP port, defaults to '161'")
+    parser.add_option("-c", "--community",
+        action  = "store",
+        type    = "string",
+        dest    = "snmp_community",
+        default = "public",
+        help    = "community string, default to 'public'")
+    parser.add_option("-s", "--snmp-version",
+        action  = "store",
+        type    = "choice",
+        choices = ("1","2","3"),
+        dest    = "snmp_version",
+        default = "1",
+        help    = "SNMP version, defaults to '1', possible values [1,2,3]")
+    parser.add_option("-t", "--timeout",
+        action  = "store",
+        type    = "float",
+        dest    = "snmp_timeout",
+        default = 1.0,
+        help    = "most seconds to wait for each SNMP response, the timeout adapts to the measured round trip time below it, defaults to '1.0'")
+    parser.add_option("--retries",
+        action  = "store",
+        type    = "int",
+        dest    = "snmp_retries",
+        default = 3,
+        help    = "retries per SNMP request before a host is given up, defaults to '3'")
+    parser.add_option("--snmp-engine",
+        action  = "store",
+        type    = "choice",
+        choices = ("auto","netsnmp","python"),
+        dest    = "snmp_engine",
+        default = "auto",
+        help    = "SNMP implementation, 'python' needs no net-snmp bindings but supports SNMP versions 1 and 2c only, 'auto' uses netsnmp when it is installed, defaults to 'auto', possible values [auto,netsnmp,python]")
+    parser.add_option("--window",
+        action  = "store",
+        type    = "int",
+        dest    = "window",
+        default = 1,
+        help    = "requests in flight per device, table columns are walked in that many parallel groups, defaults to '1'")
+    parser.add_option("-o", "--output",
+        action  = "store",
+        type    = "choice",
+        choices = output_formats,
+        dest    = "output",
+        default = "table",
+        help    = "output format, defaults to 'table', possible values [%s]" % ",".join(output_formats))
+    parser.add_option("--tsdb-dir",
+        action  = "store",
+        type    = "string",
+        dest    = "tsdb_dir",
+        default = None,
+        help    = "time-series store directory the results are appended to with '-o tsdb'")
+    parser.add_option("--warning",
+        action  = "append",
+        type    = "string",
+        dest    = "warning",
+        default = None,
+        help    = "warning threshold of '-o nagios' as field=range or field[label glob]=range in the monitoring plugins range syntax, e.g. 'load5=4' or 'percent[/var*]=80', can be repeated")
+    parser.add_option("--critical",
+        action  = "append",
+        type    = "string",
+        dest    = "critical",
+        default = None,
+        help    = "critical threshold of '-o nagios', as --warning, can be repeated")
+    parser.add_option("--thresholds",
+        action  = "store",
+        type    = "string",
+        dest    = "thresholds_file",
+        default = None,
+        help    = "file of '-o nagios' thresholds, one '<host glob> <field>[<label glob>] <warning> <critical>' per line, '-' for none")
+    parser.add_option("--max-message-size",
+        action  = "store",
+        type    = "int",
+        dest    = "max_message_size",
+        default = 1472,
+        help    = "largest SNMP message in bytes the agent answers, scalar GETs are planned to fit, defaults to '1472'")
+    parser.add_option("--stats",
+        action  = "store",
+        type    = "string",
+        dest    = "stats_file",
+        default = None,
+        help    = "write request, retry, timeout and timing statistics of the polls to this file when done, in the Prometheus text format, '-' for stderr")
+    parser.add_option("--stats-listen",
+        action  = "callback",
+        type    = "string",
+        dest    = "stats_listen",
+        callback = ListenAddress,
+        default = None,
+        help    = "serve the statistics of --stats on http://[host:]port/metrics while the tool runs, e.g. with --interval")
+    parser.add_option("--debug",
+        action  = "store_true",
+        dest    = "debug",
+        default = False,
+        help    = "print the traceback of a failed poll to stderr")
+    addUsmOptions(parser)
+    addFleetOptions(parser)
+    return parser
+
+# SNMPv3 user-based security options, used with '-s 3' instead of -c
+def addUsmOptions(parser):
+    from snmp_tools.usm import sec_levels, auth_protocols, priv_protocols
+    parser.add_option("-u", "--user",
+        action  = "store",
+        type    = "string",
+        dest    = "security_name",
+        default = "",
+        help    = "SNMPv3 security name")
+    parser.add_option("-l", "--sec-level",
+        action  = "store",
+        type    = "choice",
+        choices = sec_levels,
+        dest    = "security_level",
+        default = "authPriv",
+        help    = "SNMPv3 security level, defaults to 'authPriv', possible values [%s]" % ",".join(sec_levels))
+    parser.add_option("-a", "--auth-protocol",
+        action  = "store",
+        type    = "choice",
+        choices = auth_protocols,
+        dest    = "auth_protocol",
+        default = "SHA",
+        help    = "SNMPv3 authentication protocol, defaults to 'SHA', possible values [%s]" % ",".join(auth_protocols))
+    parser.add_option("-A", "--auth-password",
+        action  = "store",
+        type    = "string",
+        dest    = "auth_password",
+        default = None,
+        help    = "SNMPv3 authentication pass phrase")
+    parser.add_option("-x", "--priv-protocol",
+        action  = "store",
+        type    = "choice",
+        choices = priv_protocols,
+        dest    = "priv_protocol",
+        default = "AES",
+        help    = "SNMPv3 privacy protocol, defaults to 'AES', possible values [%s]" % ",".join(priv_protocols))
+    parser.add_option("-X", "--priv-password",
+        action  = "store",
+        type    = "string",
+        dest    = "priv_password",
+        default = None,
+        help    = "SNMPv3 privacy pass phrase")
+    parser.add_option("-e", "--engine-id",
+        action  = "store",
+        type    = "string",
+        dest    = "engine_id",
+        default = None,
+        help    = "SNMPv3 authoritative engine ID in hex, skips the engine discovery")
+    parser.add_option("--usm-cache",
+        action  = "store",
+        type    = "string",
+        dest    = "usm_cache",
+        default = None,
+        help    = "directory the discovered SNMPv3 engine IDs, boots and times are kept in between runs, for a day")
+
+# Options of the tools that walk a table
+def addTableOptions(parser):
+    parser.add_option("-r", "--max-repetitions",
+        action  = "store",
+        type    = "int",
+        dest    = "max_repetitions",
+        default = 25,
+        help    = "GETBULK max-repetitions for SNMPv2c, defaults to '25', 0 forces GETNEXT")
+    parser.add_option("--max-varbinds",
+        action  = "store",
+        type    = "int",
+        dest    = "max_varbinds",
+        default = 40,
+        help    = "varbinds per GET when only some rows of a table are fetched, defaults to '40'")
+
+# Interface filters and columns of get-snmp-net-stats
+def addInterfaceOptions(parser):
+    parser.add_option("--descr",
+        action  = "store",
+        type    = "string",
+        dest    = "descr",
+        default = None,
+        help    = "only the interfaces whose ifDescr matches this regular expression")
+    parser.add_option("--type",
+        action  = "callback",
+        type    = "string",
+        dest    = "if_types",
+        callback = ListOption,
+        callback_kwargs = {"convert": int},
+        default = None,
+        help    = "only the interfaces of these comma separated ifType numbers, e.g. '6' for ethernetCsmacd")
+    parser.add_option("--oper-status",
+        action  = "callback",
+        type    = "string",
+        dest    = "oper_status",
+        callback = ListOption,
+        callback_kwargs = {"convert": operStatus},
+        default = None,
+        help    = "only the interfaces in these comma separated operational states, names or numbers, e.g. 'up'")
+    parser.add_option("--index",
+        action  = "callback",
+        type    = "string",
+        dest    = "if_indexes",
+        callback = ListOption,
+        callback_kwargs = {"convert": int},
+        default = None,
+        help    = "only the interfaces with these comma separated ifIndex values")
+    parser.add_option("--columns",
+        action  = "callback",
+        type    = "string",
+        dest    = "columns",
+        callback = ListOption,
+        callback_kwargs = {"convert": interfaceColumn},
+        default = None,
+        help    = "comma separated columns to fetch and print, any of [index,%s]" % ",".join(if_table_columns))
+
+# Options of the tools that keep state between runs
+def addStateOptions(parser):
+    parser.add_option("--state-dir",
+        action  = "store",
+        type    = "string",
+        dest    = "state_dir",
+        default = None,
+        help    = "keep counter samples and table index maps between runs in this directory")
+    parser.add_option("--state-ttl",
+        action  = "store",
+        type    = "float",
+        dest    = "state_ttl",
+        default = 3600.0,
+        help    = "seconds the state of a device is trusted, defaults to '3600'")
+
+# The inventory sync mode of the table tools, see snmp_tools.inventory
+def addInventoryOptions(parser):
+    parser.add_option("--inventory",
+        action  = "store_true",
+        dest    = "inventory",
+        default = False,
+        help    = "print only the rows added, removed or changed since the last run, the descriptive columns are walked again only when the agent restarted or the table changed, needs --state-dir")
+    parser.add_option("--resync",
+        action  = "store",
+        type    = "float",
+        dest    = "resync",
+        default = 3600.0,
+        help    = "seconds after which --inventory walks the descriptive columns even when nothing signals a change, defaults to '3600'")
+
+# Options of the tools that can keep polling a host
+def addWatchOptions(parser, default_metric):
+    parser.add_option("-i", "--interval",
+        action  = "store",
+        type    = "float",
+        dest    = "interval",
+        default = None,
+        help    = "keep polling every this many seconds instead of once")
+    parser.add_option("-n", "--count",
+        action  = "store",
+        type    = "int",
+        dest    = "count",
+        default = 0,
+        help    = "number of polls with --interval, defaults to '0' which polls until interrupted")
+    parser.add_option("-m", "--metrics",
+        action  = "store",
+        type    = "string",
+        dest    = "metrics",
+        default = default_metric,
+        help    = "comma separated metrics fetched in the same GET with --interval, any of [%s], defaults to '%s'"
+                  % (",".join(sorted(scalar_metrics)), default_metric))
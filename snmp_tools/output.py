@@ -0,0 +1,286 @@
+import sys
+import time
+from snmp_tools.thresholds import OK, UNKNOWN, formatValue, loadRuleSet, perfdata, state_names, worstState
+
+output_formats = ("table", "jsonl", "csv", "prometheus", "tsdb", "nagios")
+
+# Fields that identify a row, labels in the Prometheus output
+label_fields = ("index", "descr", "path", "device", "phys_address", "change")
+
+# Fields that only ever increase, everything else is a gauge
+counter_fields = ("in_octets", "out_octets")
+
+def formatMac(address):
+    if not address:
+        return ""
+    if not isinstance(address, bytes):
+        address = address.encode("latin-1")
+    return ":".join("%02x" % octet for octet in bytearray(address))
+
+# A NaN rate has no value
+def rawValue(value):
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+# Flatten a poll result into records of raw values, one per row, lazily so
+# rows of a streamed table are written as they arrive
+def records(metric, result):
+    if metric == "load":
+        yield dict(result._asdict())
+    elif metric == "memory":
+        record = dict(result._asdict())
+        record["ram_free"] = result.ram_free
+        yield record
+    elif metric == "uptime":
+        yield {"ticks": result}
+    elif metric == "summary":
+        # The scalar metrics of a host summary, as one record
+        record = {}
+        for name in sorted(result):
+            for part in records(name, result[name]):
+                record.update(part)
+        yield record
+    elif metric == "interface_rate":
+        for rates in result:
+            for i in range(len(rates.indexes)):
+                yield {"index"    : int(rates.indexes[i]),
+                       "descr"    : rates.descr[i],
+                       "interval" : rates.interval,
+                       "in_bps"   : rawValue(float(rates.in_bps[i])),
+                       "out_bps"  : rawValue(float(rates.out_bps[i])),
+                       "in_pps"   : rawValue(float(rates.in_pps[i])),
+                       "out_pps"  : rawValue(float(rates.out_pps[i]))}
+    elif metric == "inventory":
+        for change in result:
+            record = {"change": change.change, "index": int(change.index)}
+            record.update(change.row)
+            if "phys_address" in record:
+                record["phys_address"] = formatMac(record["phys_address"])
+            yield record
+    else:
+        # Columns that were not fetched are None and left out
+        for row in result:
+            record = dict((field, value) for field, value in row._asdict().items() if value is not None)
+            if "phys_address" in record:
+                record["phys_address"] = formatMac(record["phys_address"])
+            yield record
+
+# The host a result is labelled with, host:port when the agent is not on
+# the standard port so two agents of one host stay apart. The time-series
+# store keys its host directories by it too.
+def targetLabel(target):
+    port = int(target.get("port", 161))
+    return target["host"] if port == 161 else "%s:%d" % (target["host"], port)
+
+# PrettyTable output, as the tools always printed it
+class TableWriter(object):
+    def __init__(self, renderers, fleet=False):
+        self.renderers = renderers
+        self.fleet = fleet
+
+    def write(self, target, metric, result):
+        if self.fleet:
+            print('%s:' % targetLabel(target))
+        print(self.renderers[metric](result))
+        sys.stdout.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    # The exit code of the tool, given the one of the polls
+    def exitCode(self, code):
+        return code
+
+    def error(self, target, message):
+        if self.fleet:
+            print('%s: %s' % (targetLabel(target), message))
+        else:
+            print(message)
+        sys.stdout.flush()
+
+# Machine readable writers send errors to stderr to keep stdout parseable.
+# They write the flat records of a result, writeRecords() takes records that
+# were already flattened, e.g. by a collector worker, with the time of the
+# poll.
+class RecordWriter(object):
+    def write(self, target, metric, result):
+        self.writeRecords(target, metric, records(metric, result))
+
+    def error(self, target, message):
+        sys.stderr.write('%s: %s\n' % (targetLabel(target), message))
+        sys.stderr.flush()
+
+    # Write what the writer holds back, the records of a batch are complete
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def exitCode(self, code):
+        return code
+
+# One JSON object per row
+class JsonLinesWriter(RecordWriter):
+    def __init__(self):
+        import json
+        self.dumps = json.dumps
+
+    def writeRecords(self, target, metric, rows, timestamp=None):
+        for record in rows:
+            record.update(timestamp=round(timestamp or time.time(), 3), host=targetLabel(target), metric=metric)
+            sys.stdout.write(self.dumps(record, sort_keys=True) + "\n")
+            sys.stdout.flush()
+
+# CSV rows, with a header line whenever the metric (and so the columns) changes
+class CsvWriter(RecordWriter):
+    def __init__(self):
+        import csv
+        self.writer = csv.writer(sys.stdout)
+        self.fields = None
+
+    def writeRecords(self, target, metric, rows, timestamp=None):
+        for record in rows:
+            fields = ["timestamp", "host", "metric"] + sorted(record)
+            if fields != self.fields:
+                self.writer.writerow(fields)
+                self.fields = fields
+            record.update(timestamp=round(timestamp or time.time(), 3), host=targetLabel(target), metric=metric)
+            self.writer.writerow(["" if record[field] is None else record[field] for field in fields])
+            sys.stdout.flush()
+
+def escapeLabel(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Prometheus text exposition format, e.g. for the node_exporter textfile
+# collector. The format wants all samples of a metric family together, so
+# unlike the other writers the samples of every result are held by family
+# and written at flush(), on close for a single run, and by watch mode and
+# the collector once per batch of results, each flush a whole exposition.
+class PrometheusWriter(RecordWriter):
+    def __init__(self):
+        self.families = {}
+
+    def writeRecords(self, target, metric, rows, timestamp=None):
+        families = self.families
+        for record in rows:
+            labels = [("host", targetLabel(target))] + [(field, record[field]) for field in label_fields if field in record]
+            label_text = ",".join('%s="%s"' % (name, escapeLabel(value)) for name, value in labels)
+            for field in sorted(record):
+                if field in label_fields or record[field] is None:
+                    continue
+                family = "snmp_%s_%s" % (metric, field)
+                if field in counter_fields:
+                    family += "_total"
+                families.setdefault(family, []).append("%s{%s} %s" % (family, label_text, record[field]))
+
+    def flush(self):
+        families, self.families = self.families, {}
+        for family in sorted(families):
+            kind = "counter" if family.endswith("_total") else "gauge"
+            sys.stdout.write("# TYPE %s %s\n" % (family, kind))
+            sys.stdout.write("\n".join(families[family]) + "\n")
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
+
+# Appends the rows to the time-series store of --tsdb-dir instead of printing
+class TsdbWriter(RecordWriter):
+    def __init__(self, store):
+        self.store = store
+
+    def writeRecords(self, target, metric, rows, timestamp=None):
+        self.store.append(targetLabel(target), metric, rows, timestamp)
+
+    def close(self):
+        self.store.close()
+
+# The interface description or mount point of a record, what a threshold
+# label glob is matched against
+def recordLabel(record):
+    return str(record.get("descr") or record.get("path") or "")
+
+# Monitoring plugin output: the records are held to the --warning,
+# --critical and --thresholds rules when the writer is closed, all hosts of
+# a fleet run at once. Prints the state with the values out of range and
+# the perfdata of every checked value, and the exit code is the plugin
+# state: a host that could not be polled is UNKNOWN.
+class CheckWriter(RecordWriter):
+    def __init__(self, rules, fleet=False):
+        self.rules = rules
+        self.fleet = fleet
+        self.rows = []
+        self.errors = []
+        self.state = None
+
+    def writeRecords(self, target, metric, rows, timestamp=None):
+        host = targetLabel(target)
+        for record in rows:
+            self.rows.append((host, metric, recordLabel(record), record))
+
+    def error(self, target, message):
+        self.errors.append((targetLabel(target), message))
+
+    def describe(self, check):
+        text = "%s=%s" % (check.field, formatValue(check.value))
+        if check.label:
+            text = "%s %s" % (check.label, text)
+        if self.fleet:
+            text = "%s %s" % (check.host, text)
+        return text
+
+    def close(self):
+        checks = self.rules.evaluate(self.rows)
+        self.state = worstState([check.state for check in checks] + [UNKNOWN] * len(self.errors))
+        alerts = sorted((check for check in checks if check.state != OK), key=lambda check: -check.state)
+        if alerts:
+            summary = ", ".join(self.describe(check) for check in alerts[:5])
+            if len(alerts) > 5:
+                summary += " and %d more" % (len(alerts) - 5)
+        elif self.errors:
+            summary = "%d of %d hosts could not be polled" % (len(self.errors), len(set(row[0] for row in self.rows)) + len(self.errors))
+        elif checks:
+            summary = "%d value%s within thresholds" % (len(checks), "" if len(checks) == 1 else "s")
+        else:
+            self.state = UNKNOWN
+            summary = "no polled value has a threshold"
+        line = "SNMP %s - %s" % (state_names[self.state], summary)
+        if checks:
+            line += " | " + " ".join(perfdata(check, self.fleet) for check in checks)
+        lines = [line]
+        for check in alerts:
+            lines.append("%s: %s" % (state_names[check.state], self.describe(check)))
+        for host, message in self.errors:
+            lines.append("UNKNOWN: %s: %s" % (host, message))
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    def exitCode(self, code):
+        return self.state if self.state is not None else UNKNOWN
+
+# The writer of -o/--output, renderers map each metric to its table renderer
+def createWriter(options, renderers, fleet=False):
+    output = getattr(options, "output", "table")
+    if output == "jsonl":
+        return JsonLinesWriter()
+    if output == "csv":
+        return CsvWriter()
+    if output == "prometheus":
+        return PrometheusWriter()
+    if output == "nagios":
+        rules = loadRuleSet(options)
+        if rules is None:
+            raise ValueError("-o nagios needs --warning, --critical or --thresholds")
+        return CheckWriter(rules, fleet)
+    if output == "tsdb":
+        from snmp_tools.tsdb import openTimeSeriesStore
+        store = openTimeSeriesStore(options)
+        if store is None:
+            raise ValueError("-o tsdb needs --tsdb-dir")
+        return TsdbWriter(store)
+    return TableWriter(renderers, fleet)
@@ -0,0 +1,101 @@
+import threading
+from snmp_tools import ber, stats
+from snmp_tools.session import checkSession
+from snmp_tools.state import deviceKey
+from snmp_tools.table import END_OF_COLUMN_TYPES, commonOid, countPdu
+
+# Query planner of the scalar GETs: the OIDs of any set of metrics are
+# merged into as few PDUs as the agent's message size allows. A tooBig
+# response splits the PDU in two and the smaller size is remembered for the
+# device, a noSuchName of SNMPv1 drops that one OID and the rest is asked
+# again, so one missing OID does not fail the whole batch.
+
+# netsnmp ErrorNum values of the SNMP error-status of a response
+TOO_BIG      = 1
+NO_SUCH_NAME = 2
+
+# Bytes of the message, PDU and varbind list headers besides the community,
+# and the room left for the value of each varbind in the response, enough
+# for the numbers and short strings of the scalar metrics
+message_overhead = 40
+value_reserve    = 24
+
+# The most varbinds per GET each device answered without tooBig, learnt for
+# the life of the process like the RTT estimators
+device_limits = {}
+device_limits_lock = threading.Lock()
+
+# The encoded size of the varbind of oid in a response
+def varbindSize(oid):
+    contents = len(ber.encodeOidContents(ber.parseOid(oid)))
+    return 2 + len(ber.encodeLength(contents)) + contents + 2 + value_reserve
+
+# Split oids, in order, into batches whose response fits max_message_size
+# bytes and that have at most max_varbinds varbinds
+def planRequests(oids, max_message_size=1472, max_varbinds=None, community=""):
+    batches = []
+    batch   = []
+    budget  = max_message_size - message_overhead - len(community)
+    size    = 0
+    for oid in oids:
+        cost = varbindSize(oid)
+        if batch and (size + cost > budget or (max_varbinds and len(batch) >= max_varbinds)):
+            batches.append(batch)
+            batch = []
+            size  = 0
+        batch.append(oid)
+        size += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def deviceLimit(device):
+    with device_limits_lock:
+        return device_limits.get(device)
+
+def learnLimit(device, varbinds):
+    with device_limits_lock:
+        if varbinds < device_limits.get(device, varbinds + 1):
+            device_limits[device] = varbinds
+
+def clearError(session):
+    session.ErrorStr = ''
+    session.ErrorNum = 0
+    session.ErrorInd = 0
+
+# GET the oids in the planned batches. Returns the values keyed by OID, the
+# OIDs the agent does not have are left out. Other errors raise QueryError.
+def fetchScalars(session, oids, max_message_size=1472, counters=None):
+    from snmp_tools.varbind import VarList, Varbind
+    device  = deviceKey(session)
+    unique  = list(dict.fromkeys(oids))
+    queue   = planRequests(unique, max_message_size, deviceLimit(device), getattr(session, "Community", "") or "")
+    values  = {}
+    while queue:
+        batch = queue.pop(0)
+        varlist = VarList(*[Varbind(oid) for oid in batch])
+        stats.setTable(commonOid(batch))
+        countPdu(counters, "get")
+        session.get(varlist)
+        if session.ErrorStr:
+            if session.ErrorNum == TOO_BIG and len(batch) > 1:
+                half = len(batch) // 2
+                learnLimit(device, half)
+                queue[0:0] = [batch[:half], batch[half:]]
+                clearError(session)
+                continue
+            if session.ErrorNum == NO_SUCH_NAME and 0 < session.ErrorInd <= len(batch):
+                rest = batch[:session.ErrorInd - 1] + batch[session.ErrorInd:]
+                if rest:
+                    queue.insert(0, rest)
+                clearError(session)
+                continue
+            checkSession(session)
+        started = stats.timer()
+        for oid, var in zip(batch, varlist):
+            if var is None or var.val is None or var.type in END_OF_COLUMN_TYPES:
+                continue
+            values[oid] = var.val
+        if stats.registry is not None:
+            stats.observe("assemble_seconds", stats.elapsed(started), host=device, table=commonOid(batch))
+    return values
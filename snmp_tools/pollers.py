@@ -0,0 +1,296 @@
+from collections import namedtuple
+from snmp_tools import stats
+from snmp_tools.session import QueryError, checkSession
+from snmp_tools.state import deviceKey
+from snmp_tools.table import commonOid, getRows, iterTableCached, walkTable
+
+# UCD-SNMP-MIB laLoad, the 1, 5 and 15 minutes load averages
+la_load_oids = ('.1.3.6.1.4.1.2021.10.1.3.1',
+                '.1.3.6.1.4.1.2021.10.1.3.2',
+                '.1.3.6.1.4.1.2021.10.1.3.3')
+
+# UCD-SNMP-MIB memory statistics, all values in kilobytes
+memory_oids = ('.1.3.6.1.4.1.2021.4.3.0',        # memTotalSwap
+               '.1.3.6.1.4.1.2021.4.4.0',        # memAvailSwap
+               '.1.3.6.1.4.1.2021.4.5.0',        # memTotalReal
+               '.1.3.6.1.4.1.2021.4.6.0',        # memAvailReal
+               '.1.3.6.1.4.1.2021.4.11.0',       # memTotalFree
+               '.1.3.6.1.4.1.2021.4.13.0',       # memShared
+               '.1.3.6.1.4.1.2021.4.14.0',       # memBuffer
+               '.1.3.6.1.4.1.2021.4.15.0')       # memCached
+
+# SNMPv2-MIB sysUpTime, in hundredths of a second
+sys_uptime_oid = '.1.3.6.1.2.1.1.3.0'
+
+# UCD-SNMP-MIB dskTable columns, sizes in kilobytes
+disk_table_columns = {
+    "path"           : ".1.3.6.1.4.1.2021.9.1.2",   # dskPath, the mount point
+    "device"         : ".1.3.6.1.4.1.2021.9.1.3",   # dskDevice, the partition
+    "total"          : ".1.3.6.1.4.1.2021.9.1.6",   # dskTotal
+    "avail"          : ".1.3.6.1.4.1.2021.9.1.7",   # dskAvail
+    "used"           : ".1.3.6.1.4.1.2021.9.1.8",   # dskUsed
+    "percent"        : ".1.3.6.1.4.1.2021.9.1.9",   # dskPercent
+    "percent_inodes" : ".1.3.6.1.4.1.2021.9.1.10",  # dskPercentNode
+}
+
+# IF-MIB ifTable columns
+if_table_columns = {
+    "descr"        : ".1.3.6.1.2.1.2.2.1.2",        # Description of the IP interface
+    "type"         : ".1.3.6.1.2.1.2.2.1.3",        # Type of the interface
+    "in_octets"    : ".1.3.6.1.2.1.2.2.1.10",       # The total number of octets received on the interface,including framing characters.
+    "out_octets"   : ".1.3.6.1.2.1.2.2.1.16",       # The total number of octets transmitted out of the interface, including framing characters.
+    "phys_address" : ".1.3.6.1.2.1.2.2.1.6",        # Get the MAC address
+    "admin_status" : ".1.3.6.1.2.1.2.2.1.7",        # The desired state of the interface 1: Up 2: Down 3: Test
+    "oper_status"  : ".1.3.6.1.2.1.2.2.1.8",        # The current operational state of the interface. 1: Up 2: Down 3: Test
+}
+
+CpuLoad = namedtuple("CpuLoad", ["load1", "load5", "load15"])
+
+class MemoryStats(namedtuple("MemoryStats", ["total_swap", "avail_swap", "total_real", "avail_real",
+                                             "total_free", "shared", "buffered", "cached"])):
+    __slots__ = ()
+
+    # Free RAM including buffers and cache, memTotalFree counts free swap too
+    @property
+    def ram_free(self):
+        return self.total_free + self.buffered + self.cached - self.total_swap
+
+# Columns that rarely change, cached by walkTableCached when a StateStore is given
+disk_static_columns = ("path", "device")
+if_static_columns   = ("descr", "type", "phys_address")
+
+Disk = namedtuple("Disk", ["index"] + list(disk_table_columns.keys()))
+
+Interface = namedtuple("Interface", ["index"] + list(if_table_columns.keys()))
+
+# netsnmp returns every value as bytes (str on python 2)
+def toStr(value):
+    if value is None:
+        return ""
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode("utf-8", "replace")
+    return value
+
+def toInt(value):
+    if value is None or value == b"" or value == "":
+        return 0
+    return int(value)
+
+def getValues(session, oids):
+    from snmp_tools.varbind import VarList, Varbind
+    stats.setTable(commonOid(oids))
+    varlist = VarList(*[Varbind(oid) for oid in oids])
+    session.get(varlist)
+    checkSession(session)
+    started = stats.timer()
+    res = tuple(var.val for var in varlist)
+    if stats.registry is not None:
+        stats.observe("assemble_seconds", stats.elapsed(started), host=deviceKey(session), table=commonOid(oids))
+    return res
+
+def decodeCpuLoad(res):
+    return CpuLoad(*[float(toStr(value)) for value in res])
+
+def decodeMemory(res):
+    return MemoryStats(*[toInt(value) for value in res])
+
+# sysUpTime in hundredths of a second
+def decodeUptime(res):
+    return toInt(res[0])
+
+# Scalar metrics whose OIDs can share one GET: name -> (oids, decode)
+scalar_metrics = {
+    "load"   : (la_load_oids, decodeCpuLoad),
+    "memory" : (memory_oids, decodeMemory),
+    "uptime" : ((sys_uptime_oid,), decodeUptime),
+}
+
+# Get the OIDs of several scalar metrics in as few GETs as the agent's
+# message size allows (see snmp_tools.planner), returns name -> result. A
+# metric the agent lacks an OID of is left out, or raises QueryError when it
+# is the only one asked for.
+def pollScalars(session, names, max_message_size=1472):
+    from snmp_tools.planner import fetchScalars
+    oids = []
+    for name in names:
+        oids.extend(scalar_metrics[name][0])
+    values = fetchScalars(session, oids, max_message_size)
+    results = {}
+    for name in names:
+        metric_oids, decode = scalar_metrics[name]
+        missing = [oid for oid in metric_oids if oid not in values]
+        if missing:
+            if len(names) == 1:
+                raise QueryError("the agent has no %s" % ", ".join(missing))
+            continue
+        results[name] = decode([values[oid] for oid in metric_oids])
+    return results
+
+def pollCpuLoad(session):
+    return pollScalars(session, ("load",))["load"]
+
+def pollMemory(session):
+    return pollScalars(session, ("memory",))["memory"]
+
+def pollUptime(session):
+    return pollScalars(session, ("uptime",))["uptime"]
+
+# Yield the dskTable rows as Disk as they are walked
+def iterDisks(session, max_repetitions=25, state=None):
+    for index, row in iterTableCached(session, disk_table_columns, disk_static_columns, max_repetitions, state=state):
+        yield diskFromRow(index, row)
+    checkSession(session)
+
+def diskFromRow(index, row):
+    return Disk(index          = int(index),
+                path           = toStr(row.get("path")),
+                device         = toStr(row.get("device")),
+                total          = toInt(row.get("total")),
+                avail          = toInt(row.get("avail")),
+                used           = toInt(row.get("used")),
+                percent        = toInt(row.get("percent")),
+                percent_inodes = toInt(row.get("percent_inodes")))
+
+# The dskTable index -> {path, device} map, from the StateStore when it has
+# a fresh one (the same entry walkTableCached keeps) or walked and stored
+def diskIndexMap(session, max_repetitions=25, state=None, refresh=False):
+    key = commonOid([disk_table_columns[name] for name in disk_static_columns])
+    if state is not None and not refresh:
+        cached = state.get(deviceKey(session), key)
+        if cached is not None:
+            return cached
+    static = dict((name, disk_table_columns[name]) for name in disk_static_columns)
+    index_map = walkTable(session, static, max_repetitions)
+    checkSession(session)
+    if state is not None:
+        state.put(deviceKey(session), key, index_map)
+    return index_map
+
+# Yield the disks whose mount path matches the compiled regular expression
+# pattern. Only the dskPath/dskDevice columns are walked to find them, or
+# not even those while the StateStore has the index map, then the rows are
+# fetched with GETs. dskPath is fetched again to notice remounts, a row that
+# moved or vanished triggers one rediscovery.
+def iterDisksMatching(session, pattern, max_repetitions=25, state=None, max_varbinds=40):
+    dynamic = dict((name, oid) for name, oid in disk_table_columns.items() if name != "device")
+    for attempt in range(2):
+        index_map = diskIndexMap(session, max_repetitions, state, refresh=attempt > 0)
+        matches = [index for index in sorted(index_map, key=int) if pattern.search(toStr(index_map[index].get("path")))]
+        rows = getRows(session, dynamic, matches, max_varbinds)
+        checkSession(session)
+        stale = [index for index in matches if index not in rows or rows[index].get("path") != index_map[index].get("path")]
+        if not stale:
+            break
+    for index in matches:
+        if index in rows:
+            row = dict(index_map[index], **rows[index])
+            yield diskFromRow(index, row)
+
+# ifOperStatus values by name, for the status filters of the tools
+oper_status_values = {"up": 1, "down": 2, "testing": 3, "unknown": 4, "dormant": 5,
+                      "notPresent": 6, "lowerLayerDown": 7}
+
+# An Interface from a row, columns not in columns (all by default) are None
+def interfaceFromRow(index, row, columns=None):
+    def wanted(name):
+        return columns is None or name in columns
+    return Interface(index        = int(index),
+                     descr        = toStr(row.get("descr")) if wanted("descr") else None,
+                     type         = toInt(row.get("type")) if wanted("type") else None,
+                     in_octets    = toInt(row.get("in_octets")) if wanted("in_octets") else None,
+                     out_octets   = toInt(row.get("out_octets")) if wanted("out_octets") else None,
+                     phys_address = row.get("phys_address") if wanted("phys_address") else None,
+                     admin_status = toInt(row.get("admin_status")) if wanted("admin_status") else None,
+                     oper_status  = toInt(row.get("oper_status")) if wanted("oper_status") else None)
+
+# Yield the ifTable rows as Interface as they are walked. With columns only
+# those are walked, the static ones come from the StateStore when it has them.
+def iterInterfaces(session, max_repetitions=25, state=None, columns=None):
+    walked = if_table_columns
+    if columns is not None:
+        names = set(columns) | (set(if_static_columns) if state is not None else set())
+        walked = dict((name, oid) for name, oid in if_table_columns.items() if name in names) or \
+                 {"descr": if_table_columns["descr"]}
+    for index, row in iterTableCached(session, walked, if_static_columns, max_repetitions, state=state):
+        yield interfaceFromRow(index, row, columns)
+    checkSession(session)
+
+# The ifTable index -> {descr, type, phys_address} map, from the StateStore
+# when it has a fresh one (the same entry walkTableCached keeps) or walked
+# and stored
+def interfaceIndexMap(session, max_repetitions=25, state=None, refresh=False):
+    key = commonOid([if_table_columns[name] for name in if_static_columns])
+    if state is not None and not refresh:
+        cached = state.get(deviceKey(session), key)
+        if cached is not None:
+            return cached
+    static = dict((name, if_table_columns[name]) for name in if_static_columns)
+    index_map = walkTable(session, static, max_repetitions)
+    checkSession(session)
+    if state is not None:
+        state.put(deviceKey(session), key, index_map)
+    return index_map
+
+# The indexes of index_map whose ifDescr matches the compiled regular
+# expression descr, whose ifType is in types and whose ifIndex is in
+# indexes, a filter that is None matches every interface
+def selectInterfaces(index_map, descr=None, types=None, indexes=None):
+    selected = []
+    for index in sorted(index_map, key=int):
+        row = index_map[index]
+        if indexes is not None and int(index) not in indexes:
+            continue
+        if types is not None and toInt(row.get("type")) not in types:
+            continue
+        if descr is not None and not descr.search(toStr(row.get("descr"))):
+            continue
+        selected.append(index)
+    return selected
+
+# The indexes of the interfaces matching the filters, oper_status is a set
+# of ifOperStatus values. Only ifOperStatus of the rows the other filters
+# selected is fetched, with GETs.
+def matchInterfaces(session, descr=None, types=None, oper_status=None, indexes=None,
+                    max_repetitions=25, state=None, max_varbinds=40):
+    index_map = interfaceIndexMap(session, max_repetitions, state)
+    matches = selectInterfaces(index_map, descr, types, indexes)
+    if oper_status is not None:
+        rows = getRows(session, {"oper_status": if_table_columns["oper_status"]}, matches, max_varbinds)
+        checkSession(session)
+        matches = [index for index in matches if toInt(rows.get(index, {}).get("oper_status")) in oper_status]
+    return matches
+
+# Yield the interfaces matching the filters (see selectInterfaces, and
+# oper_status a set of ifOperStatus values) with the columns given, all by
+# default. The static columns are walked to find them, or not even those
+# while the StateStore has the index map, then only the wanted columns of
+# the matching rows are fetched with GETs. ifDescr is fetched again to
+# notice renumbered interfaces, a row that moved or vanished triggers one
+# rediscovery.
+def iterInterfacesMatching(session, descr=None, types=None, oper_status=None, indexes=None, columns=None,
+                           max_repetitions=25, state=None, max_varbinds=40):
+    names = set(columns if columns is not None else if_table_columns) - set(if_static_columns)
+    names.add("descr")
+    if oper_status is not None:
+        names.add("oper_status")
+    fetched = dict((name, oid) for name, oid in if_table_columns.items() if name in names)
+    for attempt in range(2):
+        index_map = interfaceIndexMap(session, max_repetitions, state, refresh=attempt > 0)
+        matches = selectInterfaces(index_map, descr, types, indexes)
+        rows = getRows(session, fetched, matches, max_varbinds)
+        checkSession(session)
+        stale = [index for index in matches if index not in rows or rows[index].get("descr") != index_map[index].get("descr")]
+        if not stale:
+            break
+    for index in matches:
+        if index not in rows:
+            continue
+        if oper_status is not None and toInt(rows[index].get("oper_status")) not in oper_status:
+            continue
+        yield interfaceFromRow(index, dict(index_map[index], **rows[index]), columns)
+
+def pollDisks(session, max_repetitions=25, state=None):
+    return list(iterDisks(session, max_repetitions, state))
+
+def pollInterfaces(session, max_repetitions=25, state=None):
+    return list(iterInterfaces(session, max_repetitions, state))
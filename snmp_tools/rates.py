@@ -0,0 +1,155 @@
+import time
+import numpy
+from collections import namedtuple
+from snmp_tools.pollers import getValues, sys_uptime_oid, toInt, toStr
+from snmp_tools.session import checkSession
+from snmp_tools.state import deviceKey
+from snmp_tools.table import getRows, walkTableCached
+
+# 32-bit IF-MIB ifTable counters, these wrap every 3.4s on a 10G link
+if_counter32_columns = {
+    "in_octets"  : ".1.3.6.1.2.1.2.2.1.10",         # ifInOctets
+    "out_octets" : ".1.3.6.1.2.1.2.2.1.16",         # ifOutOctets
+    "in_pkts"    : ".1.3.6.1.2.1.2.2.1.11",         # ifInUcastPkts
+    "out_pkts"   : ".1.3.6.1.2.1.2.2.1.17",         # ifOutUcastPkts
+}
+
+# 64-bit IF-MIB ifXTable counters, only available with SNMPv2c
+if_counter64_columns = {
+    "in_octets"  : ".1.3.6.1.2.1.31.1.1.1.6",       # ifHCInOctets
+    "out_octets" : ".1.3.6.1.2.1.31.1.1.1.10",      # ifHCOutOctets
+    "in_pkts"    : ".1.3.6.1.2.1.31.1.1.1.7",       # ifHCInUcastPkts
+    "out_pkts"   : ".1.3.6.1.2.1.31.1.1.1.11",      # ifHCOutUcastPkts
+}
+
+if_descr_column = ".1.3.6.1.2.1.2.2.1.2"
+
+counter_names = ("in_octets", "out_octets", "in_pkts", "out_pkts")
+
+# StateStore key of the last sample of a device
+sample_state_key = "ifCounters"
+
+# One poll of the interface counters: indexes is a sorted int64 array of
+# ifIndex, counters maps each of counter_names to an uint64 array aligned
+# with it, bits is the counter width (32 or 64) and uptime the sysUpTime of
+# the agent in hundredths of a second.
+CounterSample = namedtuple("CounterSample", ["uptime", "timestamp", "bits", "indexes", "descr", "counters"])
+
+# Per-interface rates between two samples, bits and packets per second as
+# float64 arrays aligned with indexes, NaN where no rate can be computed
+InterfaceRates = namedtuple("InterfaceRates", ["interval", "indexes", "descr",
+                                               "in_bps", "out_bps", "in_pps", "out_pps"])
+
+# Raised when the agent restarted between two samples, the counters were
+# reset so the deltas mean nothing
+class AgentRestarted(Exception):
+    pass
+
+# Poll the interface counters of a session. With bits=None the 64-bit ifXTable
+# counters are tried first and the 32-bit ones are used when the agent has
+# none, pass the bits of the previous sample to skip that discovery. With
+# indexes only those rows are fetched, with GETs of max_varbinds each.
+def sampleCounters(session, max_repetitions=25, bits=None, state=None, indexes=None, max_varbinds=40):
+    def fetch(counter_columns):
+        columns = dict(counter_columns, descr=if_descr_column)
+        if indexes is not None:
+            rows = getRows(session, columns, indexes, max_varbinds)
+        else:
+            rows = walkTableCached(session, columns, ("descr",), max_repetitions, state=state)
+        checkSession(session)
+        return rows
+    uptime = toInt(getValues(session, (sys_uptime_oid,))[0])
+    timestamp = time.time()
+    rows = {}
+    if bits != 32 and session.Version != 1:
+        rows = fetch(if_counter64_columns)
+        rows = dict((index, row) for index, row in rows.items() if "in_octets" in row)
+        bits = 64
+    if not rows:
+        rows = fetch(if_counter32_columns)
+        bits = 32
+    order   = sorted(rows.keys(), key=int)
+    indexes = numpy.array([int(index) for index in order], dtype=numpy.int64)
+    counters = {}
+    for name in counter_names:
+        counters[name] = numpy.array([toInt(rows[index].get(name)) for index in order], dtype=numpy.uint64)
+    descr = [toStr(rows[index].get("descr")) for index in order]
+    return CounterSample(uptime, timestamp, bits, indexes, descr, counters)
+
+# The increase of a counter between two arrays of samples. uint64 arithmetic
+# wraps modulo 2^64, masking it to the counter width handles a single wrap
+# of the Counter32 values as well.
+def counterDeltas(previous, current, bits):
+    delta = current - previous
+    if bits < 64:
+        delta &= numpy.uint64((1 << bits) - 1)
+    return delta
+
+# Compute the rates of every interface present in both samples at once
+def computeRates(previous, current):
+    if current.uptime < previous.uptime:
+        raise AgentRestarted("sysUpTime went back from %d to %d" % (previous.uptime, current.uptime))
+    # sysUpTime is the agent's own clock, prefer it over our wall clock
+    interval = (current.uptime - previous.uptime) / 100.0
+    if interval <= 0:
+        interval = current.timestamp - previous.timestamp
+    indexes, prev_pos, cur_pos = numpy.intersect1d(previous.indexes, current.indexes,
+                                                   assume_unique=True, return_indices=True)
+    bits = min(previous.bits, current.bits)
+    rates = {}
+    for name in counter_names:
+        delta = counterDeltas(previous.counters[name][prev_pos], current.counters[name][cur_pos], bits)
+        rates[name] = delta.astype(numpy.float64) / interval if interval > 0 else numpy.full(len(indexes), numpy.nan)
+    # A 64-bit sample compared with a 32-bit one cannot be trusted
+    if previous.bits != current.bits:
+        for name in counter_names:
+            rates[name][:] = numpy.nan
+    descr = [current.descr[pos] for pos in cur_pos]
+    return InterfaceRates(interval, indexes, descr,
+                          rates["in_octets"] * 8, rates["out_octets"] * 8,
+                          rates["in_pkts"], rates["out_pkts"])
+
+# A sample as the plain values a StateStore can hold, and back
+def encodeSample(sample):
+    return {"uptime"    : sample.uptime,
+            "timestamp" : sample.timestamp,
+            "bits"      : sample.bits,
+            "indexes"   : sample.indexes.tobytes(),
+            "descr"     : list(sample.descr),
+            "counters"  : dict((name, sample.counters[name].tobytes()) for name in counter_names)}
+
+def decodeSample(value):
+    return CounterSample(value["uptime"], value["timestamp"], value["bits"],
+                         numpy.frombuffer(value["indexes"], dtype=numpy.int64),
+                         value["descr"],
+                         dict((name, numpy.frombuffer(value["counters"][name], dtype=numpy.uint64))
+                              for name in counter_names))
+
+# Take samples polls interval seconds apart and return the rates of each
+# interval, the first poll discovers the counter width for the others. With
+# a StateStore the sample of the previous run counts as the first one, so
+# each run needs a single poll, and the last sample is stored for the next.
+# With indexes only those interfaces are sampled.
+def sampleRates(session, samples=2, interval=10.0, max_repetitions=25, state=None, indexes=None, max_varbinds=40):
+    results  = []
+    previous = None
+    if state is not None:
+        stored = state.get(deviceKey(session), sample_state_key)
+        if stored is not None:
+            previous = decodeSample(stored)
+            next_poll = time.time()
+    if previous is None:
+        previous = sampleCounters(session, max_repetitions, state=state, indexes=indexes, max_varbinds=max_varbinds)
+        next_poll = time.time() + interval
+    for i in range(samples - 1):
+        time.sleep(max(0.0, next_poll - time.time()))
+        next_poll += interval
+        current = sampleCounters(session, max_repetitions, previous.bits, state, indexes, max_varbinds)
+        try:
+            results.append(computeRates(previous, current))
+        except AgentRestarted:
+            pass
+        previous = current
+    if state is not None:
+        state.put(deviceKey(session), sample_state_key, encodeSample(previous))
+    return results
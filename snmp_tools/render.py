@@ -0,0 +1,115 @@
+import datetime
+from snmp_tools.convert import PortStatus, convertRate, convertSize
+from snmp_tools.output import formatMac
+
+# A borderless PrettyTable. prettytable is imported on the first table, so
+# the machine readable outputs never load it.
+def createTable(fields):
+    from prettytable import PrettyTable
+    x = PrettyTable(fields)
+    x.border = False
+    return x
+
+def renderCpuLoad(cpu_load):
+    x = createTable(["1 Min", "5 Min", "15 Min"])
+    x.align["1 Min Avg CPU Load"] = "l"
+    x.add_row([str(cpu_load.load1),str(cpu_load.load5),str(cpu_load.load15)])
+    return x
+
+def renderMemory(memory):
+    x = createTable(["RAM Total", "RAM Free", "Swap Total", "Swap Free"])
+    x.align["Mount Point"] = "l"
+    x.add_row([convertSize(memory.total_real, "KB"),
+               convertSize(memory.ram_free, "KB"),
+               convertSize(memory.total_swap, "KB"),
+               convertSize(memory.avail_swap, "KB")])
+    return x
+
+def renderUptime(uptime):
+    return "Uptime: "+str(datetime.timedelta(seconds=uptime//100))
+
+def renderDisks(disks):
+    x = createTable(["Mount Point", "Partition", "Total Size", "Used Size", "Available Size", "Used %"])
+    x.align["Mount Point"] = "l"
+    for disk in disks:
+        if "/" in disk.device:
+            x.add_row([disk.path,disk.device,convertSize(disk.total, "KB"),convertSize(disk.used, "KB"),convertSize(disk.avail, "KB"),"%d%%" % disk.percent])
+    return x
+
+# Headers and cell formats of the Interface columns
+interface_columns = {
+    "index"        : ("Index", str),
+    "descr"        : ("Interface Description", str),
+    "type"         : ("Type", str),
+    "in_octets"    : ("Total-In", convertSize),
+    "out_octets"   : ("Total-Out", convertSize),
+    "phys_address" : ("MAC Address", formatMac),
+    "admin_status" : ("Admin Status", PortStatus),
+    "oper_status"  : ("Operational Status", PortStatus),
+}
+
+# The columns the interfaces are printed with by default
+default_interface_columns = ["descr", "in_octets", "out_octets", "admin_status", "oper_status"]
+
+# The interfaces with traffic, as the tool always printed them, or every
+# interface with the columns given
+def renderInterfaces(interfaces, columns=None):
+    if columns is not None:
+        x = createTable([interface_columns[name][0] for name in columns])
+        if "descr" in columns:
+            x.align["Interface Description"] = "l"
+        for interface in interfaces:
+            x.add_row([interface_columns[name][1](getattr(interface, name)) for name in columns])
+        return x
+    x = createTable(["Interface Description","Total-In","Total-Out","Admin Status","Operational Status"])
+    x.align["Interface Description"] = "l"
+    for interface in interfaces:
+        if (interface.in_octets != 0 and interface.out_octets != 0):
+            x.add_row([interface.descr,convertSize(interface.in_octets),convertSize(interface.out_octets),PortStatus(interface.admin_status),PortStatus(interface.oper_status)])
+    return x
+
+def renderRates(intervals):
+    tables = []
+    for rates in intervals:
+        x = createTable(["Interface Description","In","Out","In Packets","Out Packets"])
+        x.align["Interface Description"] = "l"
+        for i in range(len(rates.indexes)):
+            x.add_row([rates.descr[i],convertRate(rates.in_bps[i]),convertRate(rates.out_bps[i]),
+                       convertRate(rates.in_pps[i], "pps"),convertRate(rates.out_pps[i], "pps")])
+        tables.append(str(x))
+    if not tables:
+        return "No rates, the agent restarted while sampling"
+    return "\n\n".join(tables)
+
+# Headers and cell formats of the inventory columns
+inventory_columns = {
+    "descr"        : ("Interface Description", str),
+    "type"         : ("Type", str),
+    "phys_address" : ("MAC Address", formatMac),
+    "path"         : ("Mount Point", str),
+    "device"       : ("Partition", str),
+}
+
+# The rows added, removed or changed since the last inventory sync
+def renderInventory(changes):
+    changes = list(changes)
+    if not changes:
+        return "No inventory changes"
+    columns = [name for name in inventory_columns if name in changes[0].row]
+    x = createTable(["Change", "Index"] + [inventory_columns[name][0] for name in columns])
+    x.align["Change"] = "l"
+    for change in changes:
+        x.add_row([change.change, change.index] + [inventory_columns[name][1](change.row[name]) for name in columns])
+    return x
+
+# Renderers of the scalar metrics of snmp_tools.pollers.scalar_metrics
+scalar_renderers = {
+    "load"   : renderCpuLoad,
+    "memory" : renderMemory,
+    "uptime" : renderUptime,
+}
+
+# The scalar metrics of a host summary one after the other, in the order of
+# scalar_renderers
+def renderSummary(results):
+    return "\n\n".join(str(scalar_renderers[name](results[name])) for name in scalar_renderers if name in results)
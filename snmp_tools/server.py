@@ -0,0 +1,164 @@
+import os
+import sys
+import glob
+import errno
+import signal
+import socket
+import struct
+import traceback
+from snmp_tools.client import socket_variable
+
+# Modules every tool needs, imported once by the server so the forked
+# children start warm
+preload_modules = ("netsnmp", "prettytable", "numpy", "snmp_tools.cli", "snmp_tools.engine", "snmp_tools.options",
+                   "snmp_tools.output", "snmp_tools.pollers", "snmp_tools.rates", "snmp_tools.render",
+                   "snmp_tools.session", "snmp_tools.state", "snmp_tools.table", "snmp_tools.watch")
+
+def preload():
+    import importlib
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+# The compiled get-snmp-* scripts in directory by tool name
+def loadTools(directory):
+    tools = {}
+    for path in sorted(glob.glob(os.path.join(directory, "get-snmp-*.py"))):
+        with open(path) as script:
+            tools[os.path.splitext(os.path.basename(path))[0]] = (path, compile(script.read(), path, "exec"))
+    return tools
+
+def exitCode(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write("%s\n" % code)
+    return 1
+
+# Run a tool in the forked child of a request, on the stdin/stdout/stderr the
+# client sent, and send the exit code back over the connection
+def runRequest(connection, fds, tool, cwd, argv):
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.environ.pop(socket_variable, None)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        os.chdir(cwd)
+        path, code = tool
+        sys.argv = [path] + argv
+        exec(code, {"__name__": "__main__", "__file__": path})
+        result = 0
+    except SystemExit as exit_request:
+        result = exitCode(exit_request.code)
+    except BaseException:
+        traceback.print_exc()
+        result = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except (IOError, OSError):
+        pass
+    connection.sendall(struct.pack("!i", result))
+
+# Resident server for the get-snmp-* tools: listens on the Unix socket path
+# and runs every request in a child forked from this process, which has the
+# tools compiled and their modules imported already, so a call costs a fork
+# instead of an interpreter start and the imports. The socket is only
+# accessible to the user running the server.
+class ToolServer(object):
+    def __init__(self, path, directory, max_children=64):
+        self.path = path
+        self.tools = loadTools(directory)
+        self.max_children = max_children
+        self.children = set()
+        self.listener = None
+
+    def listen(self):
+        try:
+            os.unlink(self.path)
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen(128)
+        listener.settimeout(1.0)
+        self.listener = listener
+
+    def reap(self, block=False):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            self.children.discard(pid)
+            if block:
+                return
+
+    def serveForever(self):
+        if self.listener is None:
+            self.listen()
+        preload()
+        while True:
+            self.reap()
+            try:
+                connection, address = self.listener.accept()
+            except socket.timeout:
+                continue
+            try:
+                self.handle(connection)
+            finally:
+                connection.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            os.unlink(self.path)
+        self.reap()
+
+    def handle(self, connection):
+        connection.settimeout(5.0)
+        try:
+            message, fds, flags, address = socket.recv_fds(connection, 1 << 16, 3)
+        except (OSError, socket.timeout):
+            return
+        if len(fds) != 3:
+            for fd in fds:
+                os.close(fd)
+            return
+        fields = message.decode("utf-8").split("\0")
+        tool, cwd, argv = fields[0], fields[1], fields[2:]
+        if tool not in self.tools:
+            os.write(fds[2], ("Error occurred during executing script: the server has no tool '%s'\n" % tool).encode("utf-8"))
+            connection.sendall(struct.pack("!i", 2))
+            for fd in fds:
+                os.close(fd)
+            return
+        while len(self.children) >= self.max_children:
+            self.reap(block=True)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.listener.close()
+                connection.settimeout(None)
+                runRequest(connection, fds, self.tools[tool], cwd, argv)
+            finally:
+                os._exit(0)
+        self.children.add(pid)
+        for fd in fds:
+            os.close(fd)
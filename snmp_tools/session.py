@@ -0,0 +1,94 @@
+# Raised by the pollers when the agent answers with an SNMP error
+class QueryError(Exception):
+    pass
+
+# The line a failed poll is reported with. The type of an unexpected error
+# is named, its message alone often does not tell what went wrong.
+def describeError(error):
+    if isinstance(error, QueryError):
+        return 'Error occurred during SNMP query: %s' % error
+    return 'Error occurred during executing script: %s: %s' % (type(error).__name__, error)
+
+# The single host given with -d/-p/-c as a target
+def optionsTarget(options):
+    return {"host"      : options.snmp_destination,
+            "port"      : int(options.snmp_port),
+            "community" : options.snmp_community}
+
+# Create the session object for a target, by default the -d/-p/-c host.
+# Sessions always use numeric OIDs so table rows can be matched by index.
+# The timeout of each request adapts to the RTT measured for the device,
+# -t/--timeout is where it starts and the most it waits for one response.
+# netsnmp and the transport are imported here, not at the top, so the tools
+# answer --help and --version without loading them.
+# SNMPv3 sessions get the engine of the device from snmp_tools.usm, which
+# discovers it once per device instead of net-snmp probing on every session.
+# The transport of a device is cached for the process (see
+# snmp_tools.transport.deviceTransport), repeated and concurrent polls
+# share its sessions.
+# With --snmp-engine python the sessions are those of snmp_tools.engine,
+# which needs no net-snmp but speaks SNMPv1 and v2c only.
+# With a deadline, a time.monotonic() value, no request of the session
+# waits past it and none is sent after it.
+def createSession(options, target=None, deadline=None):
+    from snmp_tools.transport import Transport, deviceEstimator, deviceTransport
+    if target is None:
+        target = optionsTarget(options)
+    if sessionEngine(options) == "python":
+        if options.snmp_version == "3":
+            raise QueryError("SNMPv3 needs the netsnmp engine, not --snmp-engine python")
+        from snmp_tools.engine import EngineSession as Session
+    else:
+        from netsnmp import Session
+    def create(timeout):
+        if options.snmp_version == "3":
+            from snmp_tools.usm import sessionArguments
+            arguments = sessionArguments(options, target)
+        else:
+            arguments = {"Community": target["community"]}
+        return Session(DestHost   = target["host"],
+                       Version    = int(options.snmp_version),
+                       UseNumeric = True,
+                       RemotePort = target["port"],
+                       Timeout    = int(timeout*1000000),
+                       Retries    = 0,
+                       **arguments)
+    device = "%s:%s" % (target["host"], target["port"])
+    def build():
+        estimator = deviceEstimator(device, options.snmp_timeout, min(0.05, options.snmp_timeout), options.snmp_timeout)
+        return Transport(create, options.snmp_retries, getattr(options, "window", 1), estimator, device)
+    return deviceTransport(transportKey(options, target, Session), build).session(deadline)
+
+# What the sessions of a cached transport were created with besides the
+# device, a different community, user or engine gets its own transport
+def transportKey(options, target, Session):
+    key = ("%s:%s" % (target["host"], target["port"]), options.snmp_version, Session,
+           options.snmp_retries, getattr(options, "window", 1))
+    if options.snmp_version == "3":
+        return key + (options.security_name, options.security_level, options.auth_protocol,
+                      options.auth_password, options.priv_protocol, options.priv_password, options.engine_id)
+    return key + (target["community"],)
+
+# The --snmp-engine of the sessions, 'auto' being netsnmp when it is installed
+def sessionEngine(options):
+    engine = getattr(options, "snmp_engine", "auto")
+    if engine == "auto":
+        try:
+            import netsnmp
+        except ImportError:
+            return "python"
+        return "netsnmp"
+    return engine
+
+# SNMPv3 errors after which the cached engine of the device is not trusted
+usm_errors = ("engine", "time window", "authentication", "decryption")
+
+def checkSession(session):
+    if (session.ErrorStr):
+        if int(session.Version) == 3 and any(error in session.ErrorStr.lower() for error in usm_errors):
+            from snmp_tools.transport import forgetTransports
+            from snmp_tools.usm import forgetEngine
+            device = "%s:%s" % (session.DestHost, session.RemotePort)
+            forgetEngine(device)
+            forgetTransports(device)
+        raise QueryError(session.ErrorStr)
@@ -0,0 +1,276 @@
+import time
+import heapq
+import random
+import select
+import socket
+import bisect
+from snmp_tools import ber, usm
+
+# Indexes of the statistics a SimulatedAgent keeps, stats can be a list or a
+# multiprocessing.Array shared with a benchmark in another process
+STAT_PDUS_IN   = 0
+STAT_PDUS_OUT  = 1
+STAT_BYTES_IN  = 2
+STAT_BYTES_OUT = 3
+STAT_DROPPED   = 4
+STAT_COUNT     = 5
+
+sys_descr_oid          = ber.parseOid(".1.3.6.1.2.1.1.1.0")
+sys_uptime_oid         = ber.parseOid(".1.3.6.1.2.1.1.3.0")
+if_number_oid          = ber.parseOid(".1.3.6.1.2.1.2.1.0")
+if_entry_oid           = ber.parseOid(".1.3.6.1.2.1.2.2.1")
+if_x_entry_oid         = ber.parseOid(".1.3.6.1.2.1.31.1.1.1")
+if_table_last_change   = ber.parseOid(".1.3.6.1.2.1.31.1.5.0")
+memory_oid             = ber.parseOid(".1.3.6.1.4.1.2021.4")
+dsk_entry_oid          = ber.parseOid(".1.3.6.1.4.1.2021.9.1")
+la_entry_oid           = ber.parseOid(".1.3.6.1.4.1.2021.10.1")
+
+# A UDP SNMPv1/v2c agent serving the OIDs the get-snmp-* tools poll: the UCD
+# laTable, memory and dskTable, IF-MIB ifTable/ifXTable and sysUpTime. The
+# table sizes are configurable, responses can be delayed by latency seconds
+# and dropped with probability loss. Interface counters grow at a steady
+# per-interface rate; with wrap the Counter32 ones start a few seconds
+# before their wrap point. SNMPv3 requests get the report of an engine
+# discovery and nothing else.
+class SimulatedAgent(object):
+    def __init__(self, interfaces=4, disks=4, community="public", latency=0.0, jitter=0.0,
+                 loss=0.0, wrap=False, max_message_size=1472, stats=None, seed=None):
+        self.community = community.encode("utf-8")
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.max_message_size = max_message_size
+        self.stats = stats if stats is not None else [0] * STAT_COUNT
+        self.random = random.Random(seed)
+        self.started = time.time()
+        self.engine_id = b"\x80\x00\x1f\x88\x80" + bytes(bytearray(self.random.getrandbits(8) for i in range(8)))
+        self.values = {}
+        self.buildMib(interfaces, disks, wrap)
+        self.oids = sorted(self.values)
+
+    def uptime(self):
+        return int((time.time() - self.started) * 100)
+
+    # A counter growing at rate per second from start, modulo its width
+    def counter(self, start, rate, modulus):
+        return lambda: int(start + rate * (time.time() - self.started)) % modulus
+
+    def buildMib(self, interfaces, disks, wrap):
+        values = self.values
+        values[sys_descr_oid]  = (ber.OCTET_STRING, b"snmp-tools simulated agent")
+        values[sys_uptime_oid] = (ber.TIMETICKS, self.uptime)
+        values[if_number_oid]  = (ber.INTEGER, interfaces)
+        values[if_table_last_change] = (ber.TIMETICKS, 0)
+        for i, load in enumerate(("0.15", "0.25", "0.35")):
+            index = i + 1
+            values[la_entry_oid + (1, index)] = (ber.INTEGER, index)
+            values[la_entry_oid + (2, index)] = (ber.OCTET_STRING, ("Load-%d" % (1, 5, 15)[i]).encode())
+            values[la_entry_oid + (3, index)] = (ber.OCTET_STRING, load.encode())
+        # memTotalSwap, memAvailSwap, memTotalReal, memAvailReal, memTotalFree,
+        # memShared, memBuffer, memCached, in kilobytes
+        for column, value in ((3, 2097148), (4, 2000000), (5, 16318412), (6, 4123456),
+                              (11, 6123456), (13, 123456), (14, 512000), (15, 6000000)):
+            values[memory_oid + (column, 0)] = (ber.INTEGER, value)
+        for index in range(1, disks + 1):
+            total = 10485760 * (1 + index % 8)
+            used  = total * (20 + index % 70) // 100
+            values[dsk_entry_oid + (1, index)]  = (ber.INTEGER, index)
+            values[dsk_entry_oid + (2, index)]  = (ber.OCTET_STRING, ("/" if index == 1 else "/mnt/vol%d" % index).encode())
+            values[dsk_entry_oid + (3, index)]  = (ber.OCTET_STRING, ("/dev/sd%d" % index if index % 10 else "nfs%d:/export" % index).encode())
+            values[dsk_entry_oid + (6, index)]  = (ber.INTEGER, total)
+            values[dsk_entry_oid + (7, index)]  = (ber.INTEGER, total - used)
+            values[dsk_entry_oid + (8, index)]  = (ber.INTEGER, used)
+            values[dsk_entry_oid + (9, index)]  = (ber.INTEGER, used * 100 // total)
+            values[dsk_entry_oid + (10, index)] = (ber.INTEGER, index % 100)
+        for index in range(1, interfaces + 1):
+            rate = 125000 * (1 + index % 100)         # octets per second
+            start32 = (1 << 32) - rate * 5 if wrap else rate * 1000
+            mac = bytes(bytearray([0x02, 0x00, (index >> 24) & 255, (index >> 16) & 255, (index >> 8) & 255, index & 255]))
+            values[if_entry_oid + (1, index)]  = (ber.INTEGER, index)
+            values[if_entry_oid + (2, index)]  = (ber.OCTET_STRING, ("eth%d" % (index - 1)).encode())
+            values[if_entry_oid + (3, index)]  = (ber.INTEGER, 6)
+            values[if_entry_oid + (5, index)]  = (ber.GAUGE32, 1000000000)
+            values[if_entry_oid + (6, index)]  = (ber.OCTET_STRING, mac)
+            values[if_entry_oid + (7, index)]  = (ber.INTEGER, 1)
+            values[if_entry_oid + (8, index)]  = (ber.INTEGER, 1 if index % 4 else 2)
+            values[if_entry_oid + (9, index)]  = (ber.TIMETICKS, 0)
+            values[if_entry_oid + (10, index)] = (ber.COUNTER32, self.counter(start32, rate, 1 << 32))
+            values[if_entry_oid + (11, index)] = (ber.COUNTER32, self.counter(start32 // 1000, rate // 1000, 1 << 32))
+            values[if_entry_oid + (16, index)] = (ber.COUNTER32, self.counter(start32 // 2, rate // 2, 1 << 32))
+            values[if_entry_oid + (17, index)] = (ber.COUNTER32, self.counter(start32 // 2000, rate // 2000, 1 << 32))
+            values[if_x_entry_oid + (1, index)]  = (ber.OCTET_STRING, ("eth%d" % (index - 1)).encode())
+            values[if_x_entry_oid + (6, index)]  = (ber.COUNTER64, self.counter(rate * 1000, rate, 1 << 64))
+            values[if_x_entry_oid + (7, index)]  = (ber.COUNTER64, self.counter(rate, rate // 1000, 1 << 64))
+            values[if_x_entry_oid + (10, index)] = (ber.COUNTER64, self.counter(rate * 500, rate // 2, 1 << 64))
+            values[if_x_entry_oid + (11, index)] = (ber.COUNTER64, self.counter(rate // 2, rate // 2000, 1 << 64))
+
+    def value(self, oid):
+        tag, value = self.values[oid]
+        if callable(value):
+            value = value()
+        return tag, value
+
+    # The first OID after oid, None past the end of the MIB. SNMPv1 has no
+    # Counter64, v1 walks skip those like real agents do.
+    def nextOid(self, oid, version=1):
+        position = bisect.bisect_right(self.oids, oid)
+        while position < len(self.oids):
+            next_oid = self.oids[position]
+            if version != 0 or self.values[next_oid][0] != ber.COUNTER64:
+                return next_oid
+            position += 1
+        return None
+
+    # The report answering an SNMPv3 engine discovery (RFC 3414 section 4)
+    def handleV3(self, data):
+        try:
+            message_id, flags, engine_id, boots, engine_time, user, pdu_type, request_id, varbinds = usm.decodeV3Message(data)
+        except ber.DecodeError:
+            return None
+        if engine_id or not flags & usm.FLAG_REPORTABLE:
+            return None
+        return usm.encodeV3Message(message_id, 0, self.engine_id, 1, int(time.time() - self.started), b"",
+                                   ber.REPORT, request_id, [(usm.usm_stats_unknown_engine_ids_oid, ber.COUNTER32, 1)])
+
+    # Answer one request, returns the encoded response or None to ignore it
+    def handle(self, data):
+        try:
+            if usm.messageVersion(data) == 3:
+                return self.handleV3(data)
+        except ber.DecodeError:
+            return None
+        try:
+            version, community, pdu_type, request_id, field1, field2, varbinds = ber.decodeMessage(data)
+        except ber.DecodeError:
+            return None
+        if community != self.community or version not in (0, 1):
+            return None
+        error_status = ber.NO_ERROR
+        error_index  = 0
+        response     = []
+        if pdu_type == ber.GET_REQUEST:
+            for position, (oid, tag, value) in enumerate(varbinds):
+                if oid in self.values:
+                    response.append((oid,) + self.value(oid))
+                elif version == 0:
+                    error_status, error_index = ber.NO_SUCH_NAME, position + 1
+                    break
+                else:
+                    response.append((oid, ber.NO_SUCH_INSTANCE, None))
+        elif pdu_type == ber.GET_NEXT_REQUEST:
+            for position, (oid, tag, value) in enumerate(varbinds):
+                next_oid = self.nextOid(oid, version)
+                if next_oid is not None:
+                    response.append((next_oid,) + self.value(next_oid))
+                elif version == 0:
+                    error_status, error_index = ber.NO_SUCH_NAME, position + 1
+                    break
+                else:
+                    response.append((oid, ber.END_OF_MIB_VIEW, None))
+        elif pdu_type == ber.GET_BULK_REQUEST and version == 1:
+            return self.handleBulk(request_id, field1, field2, varbinds)
+        else:
+            return None
+        if error_status != ber.NO_ERROR:
+            response = varbinds
+        message = ber.encodeMessage(version, self.community, ber.GET_RESPONSE, request_id,
+                                    error_status, error_index, response)
+        if len(message) > self.max_message_size:
+            message = ber.encodeMessage(version, self.community, ber.GET_RESPONSE, request_id,
+                                        ber.TOO_BIG, 0, [])
+        return message
+
+    # GETBULK answers with as many whole repetitions as fit the message size
+    def handleBulk(self, request_id, non_repeaters, max_repetitions, varbinds):
+        non_repeaters = max(0, min(non_repeaters, len(varbinds)))
+        encoded = []
+        for oid, tag, value in varbinds[:non_repeaters]:
+            next_oid = self.nextOid(oid)
+            if next_oid is None:
+                encoded.append(ber.encodeVarbind(oid, ber.END_OF_MIB_VIEW, None))
+            else:
+                encoded.append(ber.encodeVarbind(next_oid, *self.value(next_oid)))
+        current = [oid for oid, tag, value in varbinds[non_repeaters:]]
+        # Message overhead besides the varbinds, generously rounded up
+        budget = self.max_message_size - 64 - len(self.community) - sum(len(varbind) for varbind in encoded)
+        for repetition in range(max(0, max_repetitions)):
+            row = []
+            ended = True
+            for position, oid in enumerate(current):
+                next_oid = self.nextOid(oid) if oid is not None else None
+                if next_oid is None:
+                    row.append(ber.encodeVarbind(oid or varbinds[non_repeaters + position][0], ber.END_OF_MIB_VIEW, None))
+                    current[position] = None
+                else:
+                    ended = False
+                    row.append(ber.encodeVarbind(next_oid, *self.value(next_oid)))
+                    current[position] = next_oid
+            size = sum(len(varbind) for varbind in row)
+            if size > budget:
+                break
+            budget -= size
+            encoded.extend(row)
+            if ended:
+                break
+        pdu = ber.encodeTlv(ber.GET_RESPONSE, ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(request_id)) +
+                                              ber.encodeTlv(ber.INTEGER, b"\x00") +
+                                              ber.encodeTlv(ber.INTEGER, b"\x00") +
+                                              ber.encodeTlv(ber.SEQUENCE, b"".join(encoded)))
+        return ber.encodeTlv(ber.SEQUENCE, ber.encodeTlv(ber.INTEGER, b"\x01") +
+                                           ber.encodeTlv(ber.OCTET_STRING, self.community) + pdu)
+
+    # Serve requests on host:port, and the count-1 ports above it as more
+    # devices, until duration seconds passed (forever with None). Delayed
+    # responses wait in a heap so one slow answer does not hold back the
+    # others.
+    def serve(self, host="127.0.0.1", port=1161, duration=None, ready=None, count=1):
+        sockets = []
+        for number in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+            sock.bind((host, port + number))
+            sockets.append(sock)
+        if ready is not None:
+            ready.set()
+        deadline = None if duration is None else time.time() + duration
+        delayed = []
+        self.sequence = 0
+        try:
+            while deadline is None or time.time() < deadline:
+                now = time.time()
+                while delayed and delayed[0][0] <= now:
+                    send_at, number, response, sock, address = heapq.heappop(delayed)
+                    self.send(sock, response, address)
+                timeout = 0.5
+                if delayed:
+                    timeout = min(timeout, max(0.0, delayed[0][0] - now))
+                readable, writable, errors = select.select(sockets, [], [], timeout)
+                for sock in readable:
+                    self.receive(sock, delayed)
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    # Answer one request waiting on sock, now or, with a latency, from the heap
+    def receive(self, sock, delayed):
+        data, address = sock.recvfrom(65535)
+        self.stats[STAT_PDUS_IN] += 1
+        self.stats[STAT_BYTES_IN] += len(data)
+        if self.loss and self.random.random() < self.loss:
+            self.stats[STAT_DROPPED] += 1
+            return
+        response = self.handle(data)
+        if response is None:
+            return
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            self.sequence += 1
+            heapq.heappush(delayed, (time.time() + delay, self.sequence, response, sock, address))
+        else:
+            self.send(sock, response, address)
+
+    def send(self, sock, response, address):
+        sock.sendto(response, address)
+        self.stats[STAT_PDUS_OUT] += 1
+        self.stats[STAT_BYTES_OUT] += len(response)
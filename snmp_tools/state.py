@@ -0,0 +1,122 @@
+import os
+import time
+import errno
+import struct
+import marshal
+
+# Entry header: magic, format version, expiry time (unix seconds)
+header = struct.Struct("<4sBd")
+magic  = b"SNST"
+format_version = 1
+
+# The device a session talks to, used to key its state
+def deviceKey(session):
+    return "%s:%s" % (session.DestHost, session.RemotePort)
+
+# On-disk store of per-device state between runs of the tools: the last
+# counter samples and the discovered index maps of tables, keyed by device
+# and OID. Each entry is a small marshal encoded file. Writers replace the
+# file atomically with a rename, so any number of concurrent poller processes
+# can share a directory and readers never see a half written entry. Entries
+# older than ttl seconds are ignored, and removed by the sweeps of
+# evictExpired() only, never by a reader.
+class StateStore(object):
+    def __init__(self, directory, ttl=3600.0, evict_probability=0.01):
+        self.directory = directory
+        self.ttl = ttl
+        self.evict_probability = evict_probability
+
+    # hashlib, tempfile and random are imported on first use, the pollers
+    # import this module for deviceKey() even when no state is kept
+    def path(self, device, key):
+        import hashlib
+        digest = hashlib.sha1((device + "\0" + key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    # The value stored for device and key, None if missing or expired
+    def get(self, device, key):
+        path = self.path(device, key)
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+        except (IOError, OSError):
+            return None
+        if len(data) < header.size:
+            return None
+        entry_magic, entry_version, expires = header.unpack_from(data)
+        if entry_magic != magic or entry_version != format_version:
+            return None
+        if expires < time.time():
+            return None
+        try:
+            return marshal.loads(data[header.size:])
+        except (ValueError, EOFError, TypeError):
+            return None
+
+    # Store value (built from dicts, lists, tuples, str, bytes, int and float)
+    # for ttl seconds, the ttl of the store by default
+    def put(self, device, key, value, ttl=None):
+        import random
+        import tempfile
+        path = self.path(device, key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        data = header.pack(magic, format_version, time.time() + (self.ttl if ttl is None else ttl)) + marshal.dumps(value)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as entry:
+                entry.write(data)
+            os.rename(temp_path, path)
+        except Exception:
+            self.remove(temp_path)
+            raise
+        # Sweep now and then instead of on every write
+        if random.random() < self.evict_probability:
+            self.evictExpired()
+
+    def remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    # The expiry time of the file at path, ttl seconds after the last write
+    # of a temporary file, and the inode and mtime of the file it was read from
+    def expiry(self, path):
+        with open(path, "rb") as entry:
+            stat = os.fstat(entry.fileno())
+            if os.path.basename(path).startswith(".tmp"):
+                expires = stat.st_mtime + self.ttl
+            else:
+                entry_magic, entry_version, expires = header.unpack(entry.read(header.size))
+        return expires, (stat.st_ino, stat.st_mtime_ns)
+
+    # Remove the expired entries and stale temporary files, returns how many.
+    # A writer may rename a fresh entry over an expired one during the sweep,
+    # so the file is read again right before it is unlinked and left alone
+    # unless it is still the same expired file.
+    def evictExpired(self):
+        removed = 0
+        now = time.time()
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    expires, identity = self.expiry(path)
+                    if expires >= now or self.expiry(path) != (expires, identity):
+                        continue
+                except (IOError, OSError, struct.error):
+                    continue
+                self.remove(path)
+                removed += 1
+        return removed
+
+# The StateStore of --state-dir, None when the tool runs stateless
+def openStateStore(options):
+    if not getattr(options, "state_dir", None):
+        return None
+    return StateStore(os.path.expanduser(options.state_dir), options.state_ttl)
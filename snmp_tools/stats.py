@@ -0,0 +1,193 @@
+import sys
+import time
+import bisect
+import threading
+
+# Instrumentation of the polls: counters of the requests, retries, timeouts
+# and errors per host and table, and histograms of the round trip, assembly,
+# poll and render times, kept while --stats or --stats-listen is given and
+# exposed in the Prometheus text format. The hooks cost a global lookup when
+# it is not.
+
+# Histogram bucket upper bounds, in seconds
+time_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Help texts of the metrics, by name
+metric_help = {
+    "requests"       : "SNMP requests sent, retransmissions included",
+    "retries"        : "SNMP requests retransmitted after a timeout",
+    "timeouts"       : "SNMP requests that got no response in time",
+    "errors"         : "SNMP responses with an error status",
+    "poll_errors"    : "polls that failed, by exception type",
+    "rtt_seconds"    : "round trip time of the answered SNMP requests",
+    "assemble_seconds" : "time spent turning the varbinds of the responses into rows and values, after the SNMP library decoded them",
+    "poll_seconds"   : "time of a whole poll of a host",
+    "render_seconds" : "time spent rendering and writing a result",
+}
+
+class Histogram(object):
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(time_buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(time_buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+# Counters and histograms by metric name and labels, labels being a tuple
+# of (name, value) pairs. Safe to update from the polling threads.
+class PollStats(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def count(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # The Prometheus text exposition of everything recorded so far
+    def exposition(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(histogram.counts), histogram.total, histogram.count))
+                                for key, histogram in self.histograms.items())
+        family = None
+        for (name, labels), value in counters:
+            if name != family:
+                family = name
+                lines.append("# HELP snmp_tools_%s_total %s" % (name, metric_help.get(name, name)))
+                lines.append("# TYPE snmp_tools_%s_total counter" % name)
+            lines.append("snmp_tools_%s_total%s %d" % (name, formatLabels(labels), value))
+        family = None
+        for (name, labels), (counts, total, count) in histograms:
+            if name != family:
+                family = name
+                lines.append("# HELP snmp_tools_%s %s" % (name, metric_help.get(name, name)))
+                lines.append("# TYPE snmp_tools_%s histogram" % name)
+            cumulative = 0
+            for bound, bucket in zip(time_buckets + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append("snmp_tools_%s_bucket%s %d" % (name, formatLabels(labels + (("le", str(bound)),)), cumulative))
+            lines.append("snmp_tools_%s_sum%s %.6f" % (name, formatLabels(labels), total))
+            lines.append("snmp_tools_%s_count%s %d" % (name, formatLabels(labels), count))
+        return "\n".join(lines) + "\n" if lines else ""
+
+def formatLabels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                             for name, value in labels)
+
+# The PollStats of --stats/--stats-listen, None when the polls are not
+# instrumented
+registry = None
+
+# The table (the OID its columns share) a thread is fetching, the label of
+# the requests the transport sends for it
+context = threading.local()
+
+def setTable(table):
+    context.table = table
+
+def currentTable():
+    return getattr(context, "table", "")
+
+def count(name, amount=1, **labels):
+    if registry is not None:
+        registry.count(name, tuple(sorted(labels.items())), amount)
+
+def observe(name, value, **labels):
+    if registry is not None:
+        registry.observe(name, tuple(sorted(labels.items())), value)
+
+# The (host, port) of a --stats-listen address, 'port' or 'host:port',
+# ValueError for an invalid one
+def listenAddress(address):
+    host, port = address.rsplit(":", 1) if ":" in address else ("", address)
+    if not port.isdigit() or int(port) > 65535:
+        raise ValueError("invalid address '%s', expected [host:]port" % address)
+    return host, int(port)
+
+# Serve the exposition on http://address/metrics from a daemon thread,
+# address being 'port' or 'host:port'
+def serveStats(address):
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    host, port = listenAddress(address)
+    class StatsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = (registry.exposition() if registry is not None else "").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    server = HTTPServer((host, port), StatsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="stats")
+    thread.daemon = True
+    thread.start()
+    return server
+
+# Turn the instrumentation on when the options ask for it, ValueError when
+# the --stats-listen address cannot be listened on
+def startStats(options):
+    global registry
+    if not getattr(options, "stats_file", None) and not getattr(options, "stats_listen", None):
+        return
+    if getattr(options, "stats_listen", None):
+        try:
+            serveStats(options.stats_listen)
+        except OSError as listen_error:
+            raise ValueError("option --stats-listen: cannot listen on '%s': %s"
+                             % (options.stats_listen, listen_error.strerror or listen_error))
+    if registry is None:
+        registry = PollStats()
+
+# Write the exposition to the --stats file, '-' for stderr
+def dumpStats(options):
+    path = getattr(options, "stats_file", None)
+    if registry is None or not path:
+        return
+    if path == "-":
+        sys.stderr.write(registry.exposition())
+        sys.stderr.flush()
+        return
+    with open(path, "w") as stats_file:
+        stats_file.write(registry.exposition())
+
+# Count a failed poll of host by exception type, and with --debug print its
+# traceback to stderr
+def recordError(options, host, error):
+    count("poll_errors", host=host, type=type(error).__name__)
+    if getattr(options, "debug", False):
+        import traceback
+        traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+        sys.stderr.flush()
+
+# A timer for the hooks, 0.0 when the polls are not instrumented so the
+# clock is only read when it is needed
+def timer():
+    return time.perf_counter() if registry is not None else 0.0
+
+def elapsed(started):
+    return time.perf_counter() - started
@@ -0,0 +1,221 @@
+from snmp_tools import stats
+from snmp_tools.state import deviceKey
+
+# Varbind types that mark the end of a column instead of carrying a value
+END_OF_COLUMN_TYPES = ("ENDOFMIBVIEW", "NOSUCHOBJECT", "NOSUCHINSTANCE")
+
+def countPdu(counters, name):
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + 1
+
+# Return the index part of oid if it is a row of the column, None otherwise
+def columnIndex(column_oid, oid):
+    prefix = column_oid + "."
+    if oid.startswith(prefix):
+        return oid[len(prefix):]
+    return None
+
+# Sort key of a row index, "10.1" comes after "9.2"
+def indexKey(index):
+    return tuple(int(subid) for subid in index.split("."))
+
+# Walk several columns of a conceptual table together and yield the rows as
+# (index, {column: value}) in index order, each one as soon as every column
+# has moved past it, so callers can stream huge tables row by row.
+# On SNMPv2c the columns are fetched with GETBULK, max_repetitions rows per
+# column per PDU. On SNMPv1 (or max_repetitions <= 0) one multi-varbind
+# GETNEXT is sent per row. A GETBULK answered with no varbinds, when even
+# one row of the columns does not fit the agent's message size, falls back
+# to GETNEXT, which then fails with tooBig like SNMPv1 does. An agent that
+# returns a column OID that is not past the previous one fails the walk with
+# "OID not increasing", as net-snmp does. The session must be created with
+# UseNumeric.
+# Sessions of a Transport with a window above one walk the columns in
+# parallel groups instead, see walkTablePipelined.
+def iterTable(session, columns, max_repetitions=25, counters=None, window=None):
+    if window is None:
+        window = getattr(session, "window", 1)
+    if window > 1 and len(columns) > 1:
+        rows = walkTablePipelined(session, columns, max_repetitions, counters, window)
+        for index in sorted(rows, key=indexKey):
+            yield index, rows[index]
+        return
+    from snmp_tools.varbind import VarList, Varbind
+    table    = commonOid(list(columns.values()))
+    names    = list(columns.keys())
+    current  = dict((name, columns[name]) for name in names)
+    position = dict((name, ()) for name in names)
+    active   = list(names)
+    pending  = {}
+    use_bulk = session.Version != 1 and max_repetitions > 0
+    while active:
+        varlist = VarList(*[Varbind(current[name]) for name in active])
+        stats.setTable(table)
+        if use_bulk:
+            countPdu(counters, "getbulk")
+            session.getbulk(0, max_repetitions, varlist)
+        else:
+            countPdu(counters, "getnext")
+            session.getnext(varlist)
+        if session.ErrorStr:
+            # SNMPv1 agents answer noSuchName for the whole PDU when one
+            # column runs off the end of the MIB, drop that column and retry
+            if not use_bulk and session.ErrorInd > 0 and session.ErrorInd <= len(active):
+                del active[session.ErrorInd - 1]
+                session.ErrorStr = ''
+                session.ErrorNum = 0
+                session.ErrorInd = 0
+                continue
+            break
+        if len(varlist) == 0:
+            if use_bulk:
+                use_bulk = False
+                continue
+            session.ErrorStr = "Empty response"
+            break
+        started  = stats.timer()
+        finished = set()
+        for varbind_position, var in enumerate(varlist):
+            if var is None:
+                break
+            name = active[varbind_position % len(active)]
+            if name in finished:
+                continue
+            oid   = var.tag + "." + var.iid if var.iid else var.tag
+            index = columnIndex(columns[name], oid)
+            if index is None or var.type in END_OF_COLUMN_TYPES:
+                finished.add(name)
+                continue
+            key = indexKey(index)
+            if key <= position[name]:
+                session.ErrorStr = "OID not increasing: %s >= %s" % (current[name], oid)
+                break
+            pending.setdefault(index, {})[name] = var.val
+            current[name]  = oid
+            position[name] = key
+        if session.ErrorStr:
+            break
+        # A short bulk response means the agent hit its size limit, the
+        # remaining columns simply continue from where they stopped
+        active = [name for name in active if name not in finished]
+        if stats.registry is not None:
+            stats.observe("assemble_seconds", stats.elapsed(started), host=deviceKey(session), table=table)
+        if active:
+            # Rows up to the slowest column are complete
+            frontier = min(position[name] for name in active)
+            ready = sorted((index for index in pending if indexKey(index) <= frontier), key=indexKey)
+            for index in ready:
+                yield index, pending.pop(index)
+    for index in sorted(pending, key=indexKey):
+        yield index, pending[index]
+
+# Walk the columns and return all the rows keyed by their index, e.g.
+# {"1": {"ifDescr": b"lo", "ifType": b"24"}, ...}
+def walkTable(session, columns, max_repetitions=25, counters=None):
+    return dict(iterTable(session, columns, max_repetitions, counters))
+
+# Split the columns in window groups and walk the groups at the same time,
+# each on its own session of the same transport, so window requests are in
+# flight instead of one. Returns the rows merged by index.
+def walkTablePipelined(session, columns, max_repetitions=25, counters=None, window=2):
+    names    = list(columns.keys())
+    window   = min(window, len(names))
+    groups   = [names[i::window] for i in range(window)]
+    sessions = [session] + [session.fork() for i in range(window - 1)]
+    from concurrent.futures import ThreadPoolExecutor
+    def walkGroup(group_session, group):
+        group_columns = dict((name, columns[name]) for name in group)
+        return dict(iterTable(group_session, group_columns, max_repetitions, counters, window=1))
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        futures = [executor.submit(walkGroup, group_session, group) for group_session, group in zip(sessions, groups)]
+        results = [future.result() for future in futures]
+    rows = {}
+    for group_session, group_rows in zip(sessions, results):
+        if group_session.ErrorStr and not session.ErrorStr:
+            session.ErrorStr = group_session.ErrorStr
+            session.ErrorNum = group_session.ErrorNum
+            session.ErrorInd = group_session.ErrorInd
+        for index, row in group_rows.items():
+            rows.setdefault(index, {}).update(row)
+    return rows
+
+# GET the columns of the rows with the given indexes, max_varbinds per PDU,
+# instead of walking the whole table. Returns the rows keyed by index, rows
+# or columns the agent does not have are left out.
+def getRows(session, columns, indexes, max_varbinds=40, counters=None):
+    from snmp_tools.varbind import VarList, Varbind
+    table    = commonOid(list(columns.values()))
+    names    = list(columns.keys())
+    requests = [(index, name) for index in indexes for name in names]
+    rows     = {}
+    for start in range(0, len(requests), max(1, max_varbinds)):
+        batch = requests[start:start + max(1, max_varbinds)]
+        while batch:
+            varlist = VarList(*[Varbind(columns[name] + "." + index) for index, name in batch])
+            stats.setTable(table)
+            countPdu(counters, "get")
+            session.get(varlist)
+            if session.ErrorStr:
+                # SNMPv1 fails the whole PDU with noSuchName for one missing
+                # instance, leave that one out and ask again
+                if session.Version == 1 and session.ErrorInd > 0 and session.ErrorInd <= len(batch):
+                    del batch[session.ErrorInd - 1]
+                    session.ErrorStr = ''
+                    session.ErrorNum = 0
+                    session.ErrorInd = 0
+                    continue
+                return rows
+            started = stats.timer()
+            for (index, name), var in zip(batch, varlist):
+                if var is None or var.val is None or var.type in END_OF_COLUMN_TYPES:
+                    continue
+                rows.setdefault(index, {})[name] = var.val
+            if stats.registry is not None:
+                stats.observe("assemble_seconds", stats.elapsed(started), host=deviceKey(session), table=table)
+            break
+    return rows
+
+# The OID shared by all the columns, the table entry for columns of one table
+def commonOid(oids):
+    parts = [oid.split(".") for oid in oids]
+    common = []
+    for subids in zip(*parts):
+        if len(set(subids)) != 1:
+            break
+        common.append(subids[0])
+    return ".".join(common)
+
+# walkTable that remembers the slowly changing static_columns of each row in a
+# StateStore. While the cached index map is fresh and the agent still has the
+# same rows, only the other columns are walked and the static values are
+# filled in from the cache.
+def walkTableCached(session, columns, static_columns, max_repetitions=25, counters=None, state=None):
+    return dict(iterTableCached(session, columns, static_columns, max_repetitions, counters, state))
+
+# iterTable with the static_columns cache of walkTableCached. Rows are only
+# streamed without a cache, with one they are yielded once the walk proved
+# the cached index map is still valid.
+def iterTableCached(session, columns, static_columns, max_repetitions=25, counters=None, state=None):
+    if state is None:
+        for index, row in iterTable(session, columns, max_repetitions, counters):
+            yield index, row
+        return
+    device  = deviceKey(session)
+    key     = commonOid([columns[name] for name in static_columns])
+    cached  = state.get(device, key)
+    dynamic = dict((name, oid) for name, oid in columns.items() if name not in static_columns)
+    if cached is not None and dynamic:
+        rows = walkTable(session, dynamic, max_repetitions, counters)
+        if not session.ErrorStr and set(rows.keys()) == set(cached.keys()):
+            for index, row in rows.items():
+                row.update(cached[index])
+                yield index, row
+            return
+    rows = walkTable(session, columns, max_repetitions, counters)
+    if not session.ErrorStr:
+        index_map = {}
+        for index, row in rows.items():
+            index_map[index] = dict((name, row[name]) for name in static_columns if name in row)
+        state.put(device, key, index_map)
+    for index, row in rows.items():
+        yield index, row
@@ -0,0 +1,229 @@
+import fnmatch
+from collections import namedtuple
+
+# Warning and critical thresholds on the fields of the poll records, e.g.
+# load1, ram_free, percent (disk used %), percent_inodes (dskPercentNode) or
+# in_bps, evaluated the way monitoring plugins do: every matching row is
+# checked, the worst state is the exit code and the checked values are the
+# perfdata.
+
+# Plugin states, in exit code order
+OK       = 0
+WARNING  = 1
+CRITICAL = 2
+UNKNOWN  = 3
+
+state_names = ("OK", "WARNING", "CRITICAL", "UNKNOWN")
+
+# The overall state of several: any critical, else any warning, else any unknown
+def worstState(states):
+    states = set(states)
+    for state in (CRITICAL, WARNING, UNKNOWN):
+        if state in states:
+            return state
+    return OK
+
+class ThresholdError(ValueError):
+    pass
+
+# A plugin threshold range (start, end), alerting when the value is outside
+# it, or inside it when inside is set. text is the range as it was given.
+Range = namedtuple("Range", ["start", "end", "inside", "text"])
+
+# Parse a range in the monitoring plugins syntax: '10' is 0..10, '10:' is
+# 10..infinity, '~:10' is -infinity..10, '10:20' and '@10:20' alerts inside
+def parseRange(text):
+    value = text.strip()
+    inside = value.startswith("@")
+    if inside:
+        value = value[1:]
+    try:
+        if ":" in value:
+            start, end = value.split(":", 1)
+            start = float("-inf") if start == "~" else float(start or 0)
+            end = float(end) if end else float("inf")
+        else:
+            start, end = 0.0, float(value)
+    except ValueError:
+        raise ThresholdError("invalid threshold range '%s'" % text)
+    if start > end:
+        raise ThresholdError("invalid threshold range '%s', start is above end" % text)
+    return Range(start, end, inside, text.strip())
+
+# One threshold: the field it checks, of the rows whose host and label (the
+# interface description or mount point, '' for scalars) match the globs
+Rule = namedtuple("Rule", ["host", "field", "label", "warning", "critical"])
+
+# 'field=range' or 'field[label glob]=range' as given with --warning or
+# --critical, applied to every host
+def parseRuleOption(text, level):
+    if "=" not in text:
+        raise ThresholdError("invalid threshold '%s', expected field=range" % text)
+    field, value = text.split("=", 1)
+    field, label = splitLabel(field.strip(), text)
+    limit = parseRange(value)
+    return Rule("*", field, label, limit if level == WARNING else None, limit if level == CRITICAL else None)
+
+def splitLabel(field, text):
+    if field.endswith("]") and "[" in field:
+        field, label = field[:-1].split("[", 1)
+        return field, label
+    if not field or "[" in field or "]" in field:
+        raise ThresholdError("invalid threshold field in '%s'" % text)
+    return field, "*"
+
+# The rules of a thresholds file, one per line as
+#   <host glob> <field>[<label glob>] <warning range> <critical range>
+# with '-' for a range that is not checked and # starting a comment
+def readRules(path):
+    rules = []
+    with open(path) as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) != 4:
+                raise ThresholdError("%s:%d: expected '<host> <field> <warning> <critical>'" % (path, number))
+            try:
+                field, label = splitLabel(fields[1], line)
+                warning  = None if fields[2] == "-" else parseRange(fields[2])
+                critical = None if fields[3] == "-" else parseRange(fields[3])
+            except ThresholdError as error:
+                raise ThresholdError("%s:%d: %s" % (path, number, error))
+            rules.append(Rule(fields[0], field, label, warning, critical))
+    return rules
+
+def isGlob(pattern):
+    return any(character in pattern for character in "*?[")
+
+# A value of a record that was checked, with the thresholds it was held to
+Check = namedtuple("Check", ["host", "metric", "label", "field", "value", "state", "warning", "critical"])
+
+# Rules compiled for evaluation in bulk. The rules of a field are merged by
+# host and label: a later rule for the same ones replaces the ranges it
+# sets. Each (field, host, label) seen in the records is resolved once to
+# its rule, exact host and label first, then the globs in rule order, and
+# remembered, so a cycle over the same hosts costs a dictionary lookup per
+# value and the comparisons run as numpy arrays over all values at once.
+class RuleSet(object):
+    def __init__(self, rules):
+        merged = {}
+        for rule in rules:
+            key = (rule.field, rule.host, rule.label)
+            previous = merged.get(key)
+            if previous is not None:
+                rule = rule._replace(warning  = rule.warning or previous.warning,
+                                     critical = rule.critical or previous.critical)
+            merged[key] = rule
+        self.rules = list(merged.values())
+        self.exact = {}
+        self.globs = []
+        for number, rule in enumerate(self.rules):
+            if isGlob(rule.host) or isGlob(rule.label):
+                self.globs.append(number)
+            else:
+                self.exact[(rule.field, rule.host, rule.label)] = number
+        self.fields = sorted(set(rule.field for rule in self.rules))
+        self.resolved = {}
+        self.limits = None
+
+    def __len__(self):
+        return len(self.rules)
+
+    # The number of the rule checking field of host and label, -1 for none
+    def resolve(self, field, host, label):
+        key = (field, host, label)
+        number = self.resolved.get(key)
+        if number is not None:
+            return number
+        number = self.exact.get(key, -1)
+        if number < 0:
+            for candidate in self.globs:
+                rule = self.rules[candidate]
+                if rule.field == field and fnmatch.fnmatchcase(host, rule.host) and \
+                   fnmatch.fnmatchcase(label, rule.label):
+                    number = candidate
+                    break
+        self.resolved[key] = number
+        return number
+
+    # The ranges of all rules as an array of (warning start, end, inside,
+    # critical start, end, inside) rows, a range that is not set never alerts
+    def limitTable(self):
+        import numpy
+        if self.limits is None:
+            rows = []
+            for rule in self.rules:
+                row = []
+                for limit in (rule.warning, rule.critical):
+                    if limit is None:
+                        row.extend((float("-inf"), float("inf"), 0.0))
+                    else:
+                        row.extend((limit.start, limit.end, 1.0 if limit.inside else 0.0))
+                rows.append(row)
+            self.limits = numpy.array(rows, dtype=numpy.float64).reshape(len(rows), 6)
+        return self.limits
+
+    # Check the records of a batch of results, given as (host, metric, label,
+    # record) tuples. Returns the Check of every value a rule applies to.
+    def evaluate(self, rows):
+        import numpy
+        resolved = self.resolved
+        fields = self.fields
+        checked = []
+        for host, metric, label, record in rows:
+            for field in fields:
+                value = record.get(field)
+                if value is None or isinstance(value, str):
+                    continue
+                number = resolved.get((field, host, label))
+                if number is None:
+                    number = self.resolve(field, host, label)
+                if number >= 0:
+                    checked.append((host, metric, label, field, value, number))
+        if not checked:
+            return []
+        values  = numpy.fromiter((item[4] for item in checked), dtype=numpy.float64, count=len(checked))
+        numbers = numpy.fromiter((item[5] for item in checked), dtype=numpy.intp, count=len(checked))
+        limits  = self.limitTable()[numbers]
+        states  = numpy.zeros(len(checked), dtype=numpy.int8)
+        for level, column in ((WARNING, 0), (CRITICAL, 3)):
+            outside = (values < limits[:, column]) | (values > limits[:, column + 1])
+            states[outside != (limits[:, column + 2] != 0)] = level
+        rules = self.rules
+        return [Check(host, metric, label, field, value, state, rules[number].warning, rules[number].critical)
+                for (host, metric, label, field, value, number), state in zip(checked, states.tolist())]
+
+# The rules of --warning, --critical and --thresholds, None when none are given
+def loadRuleSet(options):
+    rules = []
+    for text in getattr(options, "warning", None) or []:
+        rules.append(parseRuleOption(text, WARNING))
+    for text in getattr(options, "critical", None) or []:
+        rules.append(parseRuleOption(text, CRITICAL))
+    if getattr(options, "thresholds_file", None):
+        try:
+            rules.extend(readRules(options.thresholds_file))
+        except (IOError, OSError) as error:
+            raise ThresholdError("cannot read %s: %s" % (options.thresholds_file, error))
+    if not rules:
+        return None
+    return RuleSet(rules)
+
+# A perfdata label and value, 'label'=value;warn;crit
+def perfdata(check, fleet=False):
+    name = check.field
+    if check.label:
+        name = "%s_%s" % (check.label, name)
+    if fleet:
+        name = "%s_%s" % (check.host, name)
+    name = name.replace("'", "_").replace("=", "_")
+    return "'%s'=%s;%s;%s" % (name, formatValue(check.value),
+                              check.warning.text if check.warning else "",
+                              check.critical.text if check.critical else "")
+
+def formatValue(value):
+    if isinstance(value, float):
+        return ("%.6f" % value).rstrip("0").rstrip(".")
+    return str(value)
@@ -0,0 +1,240 @@
+import time
+import threading
+from collections import OrderedDict
+from snmp_tools import stats
+
+# net-snmp's SNMPERR_TIMEOUT
+SNMPERR_TIMEOUT = -24
+
+# The session errors of a request that was not sent, the deadline of the
+# poll being past
+deadline_errors = ("Host deadline exceeded", SNMPERR_TIMEOUT, 0)
+
+# Round trip time estimator of RFC 6298: the retransmission timeout follows
+# SRTT + 4*RTTVAR of the measured responses, doubles on every timeout and is
+# kept between min_timeout and max_timeout seconds.
+class RttEstimator(object):
+    def __init__(self, initial_timeout=1.0, min_timeout=0.05, max_timeout=10.0):
+        self.srtt = None
+        self.rttvar = None
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.rto = min(max(initial_timeout, min_timeout), max_timeout)
+        self.lock = threading.Lock()
+
+    def sample(self, rtt):
+        with self.lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2.0
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            self.rto = min(max(self.srtt + 4.0 * self.rttvar, self.min_timeout), self.max_timeout)
+
+    def backoff(self):
+        with self.lock:
+            self.rto = min(self.rto * 2.0, self.max_timeout)
+
+# Requests in flight to one device. The window opens by one request per
+# answered request up to max_window and halves on every timeout, so a
+# congested agent sees less traffic instead of a burst of retries.
+class CongestionWindow(object):
+    def __init__(self, max_window=1):
+        self.max_window = max(1, max_window)
+        self.window = float(self.max_window)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.window):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, timed_out=False):
+        with self.condition:
+            self.in_flight -= 1
+            if timed_out:
+                self.window = max(1.0, self.window / 2.0)
+            else:
+                self.window = min(float(self.max_window), self.window + 1.0 / self.window)
+            self.condition.notify_all()
+
+# The transport to one device: netsnmp sessions created by create(timeout)
+# with their own retries disabled, so the timeout of every attempt comes from
+# the measured RTT and retries back off exponentially. Up to window requests
+# can be in flight at once, each on its own netsnmp session. The estimator
+# can outlive the transport, to keep what was learnt about a device. device
+# labels the requests in the poll statistics.
+class Transport(object):
+    def __init__(self, create, retries=3, window=1, estimator=None, device=""):
+        self.create = create
+        self.device = device
+        self.retries = retries
+        self.estimator = estimator if estimator is not None else RttEstimator()
+        self.congestion = CongestionWindow(window)
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @property
+    def window(self):
+        return self.congestion.max_window
+
+    # An idle session, or a new one, with its timeout set to the current
+    # RTO, or to limit seconds when that is less. Sessions are kept whatever
+    # the RTO was when they were created, an SNMPv3 one holds the keys
+    # net-snmp derived from the pass phrases.
+    def checkout(self, limit=None):
+        rto = self.estimator.rto if limit is None else min(self.estimator.rto, limit)
+        with self.lock:
+            session = self.idle.pop() if self.idle else None
+        if session is None:
+            return self.create(rto), rto
+        session.Timeout = int(rto * 1000000)
+        return session, rto
+
+    def checkin(self, session):
+        with self.lock:
+            self.idle.append(session)
+
+    # Call method of a netsnmp session with the adaptive timeout and retries,
+    # returns (result, session errors as (ErrorStr, ErrorNum, ErrorInd)).
+    # No attempt waits past deadline, a time.monotonic() value, and none is
+    # made after it.
+    def request(self, method, *args, deadline=None):
+        self.congestion.acquire()
+        timed_out = False
+        try:
+            for attempt in range(self.retries + 1):
+                limit = None
+                if deadline is not None:
+                    limit = deadline - time.monotonic()
+                    if limit <= 0:
+                        return None, deadline_errors
+                session, timeout = self.checkout(limit)
+                reuse = True
+                try:
+                    started = time.time()
+                    result = getattr(session, method)(*args)
+                    errors = (session.ErrorStr, session.ErrorNum, session.ErrorInd)
+                    if stats.registry is not None:
+                        self.record(method, attempt, time.time() - started, errors)
+                    if session.ErrorNum == SNMPERR_TIMEOUT:
+                        # A session that timed out may still get the late
+                        # answer to this request, do not reuse it
+                        reuse = False
+                        timed_out = True
+                        self.estimator.backoff()
+                        continue
+                    # Karn's algorithm: retransmitted requests give no RTT sample
+                    if attempt == 0:
+                        self.estimator.sample(time.time() - started)
+                    return result, errors
+                finally:
+                    # Also when the session method raised
+                    if reuse:
+                        self.checkin(session)
+            return None, errors
+        finally:
+            self.congestion.release(timed_out)
+
+    # Count a request in the poll statistics, by device and table
+    def record(self, method, attempt, rtt, errors):
+        table = stats.currentTable()
+        stats.count("requests", host=self.device, table=table, method=method)
+        if attempt > 0:
+            stats.count("retries", host=self.device, table=table)
+        if errors[1] == SNMPERR_TIMEOUT:
+            stats.count("timeouts", host=self.device, table=table)
+            return
+        stats.observe("rtt_seconds", rtt, host=self.device)
+        if errors[0]:
+            stats.count("errors", host=self.device, table=table)
+
+    def session(self, deadline=None):
+        return TransportSession(self, deadline)
+
+# A netsnmp.Session look-alike on top of a Transport, so walkTable and the
+# pollers use it unchanged. Each thread must use its own TransportSession.
+# The deadline, if any, holds for all requests of the session and its forks.
+class TransportSession(object):
+    def __init__(self, transport, deadline=None):
+        self.transport = transport
+        self.deadline = deadline
+        prototype, timeout = transport.checkout()
+        transport.checkin(prototype)
+        self.Version    = prototype.Version
+        self.DestHost   = prototype.DestHost
+        self.RemotePort = prototype.RemotePort
+        self.ErrorStr   = ''
+        self.ErrorNum   = 0
+        self.ErrorInd   = 0
+
+    @property
+    def window(self):
+        return self.transport.window
+
+    def call(self, method, *args):
+        result, errors = self.transport.request(method, *args, deadline=self.deadline)
+        self.ErrorStr, self.ErrorNum, self.ErrorInd = errors
+        return result
+
+    def get(self, varlist):
+        return self.call("get", varlist)
+
+    def getnext(self, varlist):
+        return self.call("getnext", varlist)
+
+    def getbulk(self, nonrepeaters, maxrepetitions, varlist):
+        return self.call("getbulk", nonrepeaters, maxrepetitions, varlist)
+
+    def walk(self, varlist):
+        return self.call("walk", varlist)
+
+    # Another session on the same transport, for a parallel request
+    def fork(self):
+        return TransportSession(self.transport, self.deadline)
+
+# RTT estimators by device, kept for the life of the process so watch mode,
+# fleet polls and collectors start every poll from what they measured before
+estimators = {}
+estimators_lock = threading.Lock()
+
+def deviceEstimator(device, initial_timeout=1.0, min_timeout=0.05, max_timeout=10.0):
+    with estimators_lock:
+        estimator = estimators.get(device)
+        if estimator is None:
+            estimator = estimators[device] = RttEstimator(initial_timeout, min_timeout, max_timeout)
+        return estimator
+
+# Transports by device and session settings, kept for the life of the
+# process like the estimators, so later polls of a device reuse its idle
+# sessions instead of creating new ones, and net-snmp derives the SNMPv3
+# keys of a user once. Past max_transports the least recently used one is
+# dropped, every netsnmp session holds a socket.
+transports = OrderedDict()
+transports_lock = threading.Lock()
+max_transports = 512
+
+# The transport cached under key, whose first item is the device, or the one
+# build() returns
+def deviceTransport(key, build):
+    with transports_lock:
+        transport = transports.get(key)
+        if transport is not None:
+            transports.move_to_end(key)
+            return transport
+    transport = build()
+    with transports_lock:
+        transport = transports.setdefault(key, transport)
+        transports.move_to_end(key)
+        while len(transports) > max_transports:
+            transports.popitem(last=False)
+    return transport
+
+# Drop the transports of device, their sessions are not trusted any more
+def forgetTransports(device):
+    with transports_lock:
+        for key in [key for key in transports if key[0] == device]:
+            del transports[key]
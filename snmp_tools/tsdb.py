@@ -0,0 +1,583 @@
+import os
+import re
+import time
+import zlib
+import errno
+import array
+import fcntl
+import heapq
+import itertools
+import random
+import struct
+import numpy
+from urllib.parse import quote, unquote
+
+# Chunk header: magic, format version, number of fields, flags, milliseconds
+# per timestamp unit, timestamp of the first and of the last row, number of
+# rows, end offset of the last block. The field names follow, NUL
+# separated, and the header is padded to header_size so the blocks start at
+# a fixed offset.
+header = struct.Struct("<4sBBBxIqqIQ")
+magic  = b"SNTS"
+format_version = 2
+header_size = 512
+
+# The fixed width rows of version 1 chunks, read and converted to blocks on
+# the next append: the header had the delta of the last row instead of the
+# end offset
+header_v1 = struct.Struct("<4sBBBxIqqqI")
+
+# Block header: number of rows, size of the compressed columns, timestamp of
+# the first and of the last row, so a range query skips the blocks outside
+# it without inflating them
+block_header = struct.Struct("<IIqq")
+
+nan = float("nan")
+
+# Set once a raw chunk has been folded into the rollups
+ROLLED_UP = 1
+
+# Resolutions: name -> (bucket seconds, chunk span seconds, timestamp unit ms).
+# Raw chunks keep millisecond timestamps and span a day, so a delta always
+# fits the int32 delta-of-delta. Rollups count seconds.
+resolutions = {"raw": (0,    86400,     1),
+               "5m":  (300,  86400*30,  1000),
+               "1h":  (3600, 86400*365, 1000)}
+
+# Seconds each resolution is kept, raw chunks only once rolled up
+default_retention = {"raw": 86400*7, "5m": 86400*90, "1h": 86400*365*5}
+
+# Fields of rollup rows, per field of the raw rows
+rollup_suffixes = ("avg", "min", "max")
+
+def encodeHeader(fields, flags, unit, first, last, count, end):
+    names = "\0".join(fields).encode("utf-8")
+    if header.size + len(names) > header_size:
+        raise ValueError("too many fields for a chunk: %s" % ",".join(fields))
+    data = header.pack(magic, format_version, len(fields), flags, unit,
+                       0 if first is None else first, 0 if last is None else last, count, end) + names
+    return data + b"\0" * (header_size - len(data))
+
+def decodeHeader(data):
+    if len(data) < header_size:
+        return None
+    chunk_magic, version = struct.unpack_from("<4sB", data)
+    if chunk_magic != magic or version not in (1, format_version):
+        return None
+    if version == 1:
+        chunk_magic, version, nfields, flags, unit, first, last, delta, count = header_v1.unpack_from(data)
+        end = None
+    else:
+        chunk_magic, version, nfields, flags, unit, first, last, count, end = header.unpack_from(data)
+    names = bytes(data[header.size if version != 1 else header_v1.size:header_size]).rstrip(b"\0").decode("utf-8")
+    fields = names.split("\0")[:nfields] if nfields else []
+    return {"version": version, "fields": fields, "flags": flags, "unit": unit,
+            "first": first if count else None, "last": last if count else None, "count": count,
+            "end": end if end is not None else header_size}
+
+# A block holds the rows of one write, ordered by table row index and time so
+# that consecutive values are the samples of one series: the timestamps as
+# the int32 delta-of-delta from the first, the row indexes, then the values
+# field after field, each as the XOR of its float64 bits with those of the
+# value before it, which leaves mostly zero bits for slowly changing values.
+# Those bytes are split into planes, the first byte of every value, then the
+# second and so on, and deflated. rows are (timestamp in units, index,
+# values) sorted by time, values shorter than width lack the last fields.
+# Blocks are a few rows each, plain struct packing encodes them faster than
+# numpy would.
+def encodeBlock(rows, width):
+    count   = len(rows)
+    first   = rows[0][0]
+    ordered = sorted(rows, key=lambda row: (row[1], row[0]))
+    dod     = []
+    previous, delta = first, 0
+    for stamp, index, values in ordered:
+        row_delta = stamp - previous
+        dod.append(row_delta - delta)
+        previous, delta = stamp, row_delta
+    columns = []
+    for position in range(width):
+        columns.extend([values[position] if position < len(values) else nan for stamp, index, values in ordered])
+    words = "<%dQ" % len(columns)
+    bits  = struct.unpack(words, struct.pack("<%dd" % len(columns), *columns))
+    xored = struct.pack(words, bits[0], *[value ^ previous for value, previous in zip(bits[1:], bits)])
+    payload = struct.pack("<%di" % count, *dod) + struct.pack("<%di" % count, *[row[1] for row in ordered]) + \
+              b"".join([xored[octet::8] for octet in range(8)])
+    data    = zlib.compress(payload, 6)
+    return block_header.pack(count, len(data), first, rows[-1][0]) + data
+
+def decodeBlock(data, rows, nfields):
+    payload = numpy.frombuffer(zlib.decompress(data), dtype=numpy.uint8)
+    dod     = payload[:rows * 4].view("<i4")
+    indexes = payload[rows * 4:rows * 8].view("<i4")
+    xored   = numpy.ascontiguousarray(payload[rows * 8:].reshape(8, nfields * rows).T).view("<u8").ravel()
+    values  = numpy.bitwise_xor.accumulate(xored).view("<f8").reshape(nfields, rows).T
+    stamps  = numpy.cumsum(numpy.cumsum(dod, dtype=numpy.int64))
+    return stamps, indexes, values
+
+# The rows of a version 1 chunk: fixed width rows of the delta-of-delta of
+# the timestamp, the row index and a float64 per field
+def decodeRowsV1(data, info):
+    row_type = numpy.dtype([("dod", "<i4"), ("index", "<i4")] + [(field, "<f8") for field in info["fields"]])
+    count = min(info["count"], (len(data) - header_size) // row_type.itemsize)
+    rows = numpy.frombuffer(data, dtype=row_type, count=count, offset=header_size)
+    stamps = info["first"] + numpy.cumsum(numpy.cumsum(rows["dod"], dtype=numpy.int64)) if count else numpy.zeros(0, dtype=numpy.int64)
+    values = numpy.column_stack([rows[field] for field in info["fields"]]) if info["fields"] else numpy.zeros((count, 0))
+    return stamps, rows["index"].astype("<i4"), values
+
+# The rows of the chunk data, in timestamp units, sorted by time and index,
+# of the blocks that overlap low and high (units, None for no bound)
+def decodeRows(data, info, low=None, high=None):
+    if info["version"] == 1:
+        return decodeRowsV1(data, info)
+    nfields = len(info["fields"])
+    blocks = []
+    offset = header_size
+    while offset + block_header.size <= info["end"]:
+        rows, size, first, last = block_header.unpack_from(data, offset)
+        offset += block_header.size
+        if (low is None or last >= low) and (high is None or first <= high):
+            stamps, indexes, values = decodeBlock(data[offset:offset + size], rows, nfields)
+            blocks.append((stamps + first, indexes, values))
+        offset += size
+    if not blocks:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype="<i4"), numpy.zeros((0, nfields))
+    stamps  = numpy.concatenate([block[0] for block in blocks])
+    indexes = numpy.concatenate([block[1] for block in blocks])
+    values  = numpy.concatenate([block[2] for block in blocks])
+    order   = numpy.lexsort((indexes, stamps))
+    return stamps[order], indexes[order], values[order]
+
+# The rows of a chunk as (timestamps in seconds, dict of field -> values,
+# with the row indexes under "index"), those between start and end (unix
+# seconds) and of the table row index if given. Only the blocks that overlap
+# the range are inflated.
+def readChunk(path, start=None, end=None, index=None):
+    with open(path, "rb") as chunk:
+        fcntl.flock(chunk.fileno(), fcntl.LOCK_SH)
+        data = chunk.read()
+    info = decodeHeader(data)
+    if info is None:
+        return None, None
+    scale = info["unit"] / 1000.0
+    low  = None if start is None else int(numpy.floor(start / scale))
+    high = None if end is None else int(numpy.ceil(end / scale))
+    stamps, indexes, values = decodeRows(data, info, low, high)
+    stamps = stamps * scale
+    selected = numpy.ones(len(stamps), dtype=bool)
+    if start is not None:
+        selected &= stamps >= start
+    if end is not None:
+        selected &= stamps <= end
+    if index is not None:
+        selected &= indexes == index
+    columns = {"index": indexes[selected].copy()}
+    for position, field in enumerate(info["fields"]):
+        columns[field] = values[selected, position].copy()
+    return stamps[selected], columns
+
+# Append rows, (timestamp in units, table row index, values in the order of
+# fields), to the chunk at path as one block, creating the chunk. Rows older
+# than the last row of the chunk are dropped and missing values are NaN. Fields the chunk has no column for yet
+# are added to it: the chunk is rewritten once with the union of the fields,
+# the earlier rows NaN in the new columns. Returns the number of rows
+# written. The chunk is locked while it is read and written, so the workers
+# of the collector and other tools writing the same store do not overwrite
+# each other's rows.
+def appendBlock(path, fields, rows, unit=1):
+    handle = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        head = os.pread(handle, header_size, 0)
+        if head:
+            info = decodeHeader(head)
+            if info is None:
+                raise ValueError("%s is not a chunk file" % path)
+        else:
+            info = {"version": format_version, "fields": list(fields), "flags": 0, "unit": unit,
+                    "first": None, "last": None, "count": 0, "end": header_size}
+        rows = sorted(rows, key=lambda row: (row[0], row[1]))
+        if info["last"] is not None:
+            rows = [row for row in rows if row[0] >= info["last"]]
+        if not rows:
+            return 0
+        chunk_fields = info["fields"] + [field for field in fields if field not in info["fields"]]
+        if info["version"] != format_version or len(chunk_fields) != len(info["fields"]):
+            # The new fields come last, the values of the old rows lack them
+            data = os.pread(handle, os.fstat(handle).st_size, 0)
+            stamps, indexes, values = decodeRows(data, info)
+            blocks = b""
+            if len(stamps):
+                blocks = encodeBlock(list(zip(stamps.tolist(), indexes.tolist(), values.tolist())), len(chunk_fields))
+            info = dict(info, version=format_version, fields=chunk_fields, end=header_size + len(blocks))
+            os.pwrite(handle, blocks, header_size)
+            os.ftruncate(handle, info["end"])
+        if chunk_fields[:len(fields)] != list(fields):
+            positions = [chunk_fields.index(field) for field in fields]
+            aligned = []
+            for stamp, index, values in rows:
+                row = [nan] * len(chunk_fields)
+                for position, value in zip(positions, values):
+                    row[position] = value
+                aligned.append((stamp, index, row))
+            rows = aligned
+        block = encodeBlock(rows, len(chunk_fields))
+        os.pwrite(handle, block, info["end"])
+        first = info["first"] if info["first"] is not None else rows[0][0]
+        os.pwrite(handle, encodeHeader(chunk_fields, info["flags"], info["unit"], first, rows[-1][0],
+                                       info["count"] + len(rows), info["end"] + len(block)), 0)
+        return len(rows)
+    finally:
+        os.close(handle)
+
+# appendBlock of rows, (timestamp in seconds, dict of field -> value)
+def appendChunk(path, fields, rows, unit=1):
+    return appendBlock(path, fields, [(int(round(timestamp * 1000.0 / unit)), record.get("index", 0),
+                                       [nan if record.get(field) is None else record[field] for field in fields])
+                                      for timestamp, record in rows], unit)
+
+# Rewrite the chunk at path as a single block and set its flags. The small
+# blocks of the appends compress poorly, once a chunk is complete one block
+# of all its rows takes a fraction of the space.
+def compactChunk(path, flags):
+    with open(path, "r+b") as chunk:
+        fcntl.flock(chunk.fileno(), fcntl.LOCK_EX)
+        data = chunk.read()
+        info = decodeHeader(data)
+        if info is None:
+            return
+        stamps, indexes, values = decodeRows(data, info)
+        block = b""
+        if len(stamps):
+            block = encodeBlock(list(zip(stamps.tolist(), indexes.tolist(), values.tolist())), len(info["fields"]))
+        chunk.seek(0)
+        chunk.write(encodeHeader(info["fields"], flags, info["unit"], info["first"], info["last"],
+                                 len(stamps), header_size + len(block)) + block)
+        chunk.truncate()
+
+# Fold the rows of each table row index into buckets of size seconds: the
+# count of samples and the average, minimum and maximum of each field, NaN
+# values left out. Returns the rows sorted by time.
+def rollupRows(stamps, values, size):
+    rolled = []
+    indexes = values["index"]
+    for index in numpy.unique(indexes):
+        selected = indexes == index
+        columns = dict((field, column[selected]) for field, column in values.items() if field != "index")
+        for timestamp, record in rollupIndex(stamps[selected], columns, size):
+            record["index"] = int(index)
+            rolled.append((timestamp, record))
+    rolled.sort(key=lambda row: (row[0], row[1]["index"]))
+    return rolled
+
+def rollupIndex(stamps, values, size):
+    if len(stamps) == 0:
+        return []
+    buckets = (stamps // size) * size
+    starts = numpy.flatnonzero(numpy.r_[True, buckets[1:] != buckets[:-1]])
+    counts = numpy.diff(numpy.r_[starts, len(stamps)])
+    aggregates = {"count": counts.astype(numpy.float64)}
+    for field, column in values.items():
+        present = ~numpy.isnan(column)
+        samples = numpy.add.reduceat(present.astype(numpy.float64), starts)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            aggregates[field + "_avg"] = numpy.add.reduceat(numpy.where(present, column, 0.0), starts) / samples
+        aggregates[field + "_min"] = numpy.fmin.reduceat(column, starts)
+        aggregates[field + "_max"] = numpy.fmax.reduceat(column, starts)
+    return [(float(buckets[start]), dict((name, float(column[i])) for name, column in aggregates.items()))
+            for i, start in enumerate(starts)]
+
+def rollupFields(fields):
+    return ["count"] + ["%s_%s" % (field, suffix) for field in fields for suffix in rollup_suffixes]
+
+# Fields of a record that go into a chunk, the numeric ones
+def seriesFields(record):
+    return sorted(field for field, value in record.items()
+                  if field != "index" and not isinstance(value, bool) and isinstance(value, (int, float)))
+
+chunk_name = re.compile(r"^(.+)\.(\d+)\.chunk$")
+legacy_chunk_name = re.compile(r"^(\d+)\.chunk$")
+
+# The rows buffered for one chunk, packed in an array of doubles to keep a
+# large fleet's worth of them small: per row the timestamp, the table row
+# index and the values of fields, the union of the fields of the records.
+# A record with a new field widens the rows buffered before it. The field
+# lists and their positions are shared by all buffers with the same fields.
+buffer_layouts = {}
+
+def bufferLayout(fields):
+    layout = buffer_layouts.get(fields)
+    if layout is None:
+        layout = buffer_layouts[fields] = (list(fields), dict((field, position + 2) for position, field in enumerate(fields)))
+    return layout
+
+class ChunkBuffer(object):
+    __slots__ = ("fields", "positions", "values", "count")
+
+    def __init__(self):
+        self.fields, self.positions = bufferLayout(())
+        self.values = array.array("d")
+        self.count = 0
+
+    def add(self, timestamp, record, fields):
+        positions = self.positions
+        added = [field for field in fields if field not in positions]
+        if added:
+            self.widen(added)
+            positions = self.positions
+        row = [nan] * (len(self.fields) + 2)
+        row[0] = timestamp
+        row[1] = record.get("index", 0)
+        for field in fields:
+            row[positions[field]] = record[field]
+        self.values.extend(row)
+        self.count += 1
+
+    def widen(self, added):
+        stride = len(self.fields) + 2
+        self.fields, self.positions = bufferLayout(tuple(self.fields + added))
+        if self.count:
+            values = self.values.tolist()
+            self.values = array.array("d")
+            for start in range(0, len(values), stride):
+                self.values.extend(values[start:start + stride] + [nan] * len(added))
+
+    # The rows as appendBlock takes them, timestamps in unit milliseconds
+    def rows(self, unit):
+        stride = len(self.fields) + 2
+        scale = 1000.0 / unit
+        values = self.values.tolist()
+        return [(int(round(values[start] * scale)), int(values[start + 1]), values[start + 2:start + stride])
+                for start in range(0, len(values), stride)]
+
+# Local time-series store of poll results. Each host has a directory per
+# resolution of chunk files, one per metric and span of time, holding
+# blocks of compressed rows with delta-of-delta encoded timestamps, all rows
+# of a table metric in the same chunk:
+#
+#   <directory>/<host>/<resolution>/<metric>.<span start>.chunk
+#
+# A directory per metric, as in the earlier <host>/<metric>/<resolution>/
+# layout, is a million directories for a large fleet, more than the page
+# cache keeps, and each write read them back from disk. Chunks of that
+# layout are still queried and rolled up, new rows go to the current one.
+# append() buffers the rows of each chunk and writes them as one block once
+# block_rows of them are buffered or the first of them is half to all of
+# flush_interval seconds old. The deadline is picked at random in that range
+# so the hosts are not all written in the same poll, and the chunks of a
+# host started before it share it, so their writes come together and touch
+# the same directory and inode blocks. A fleet polled every minute so costs
+# one write per host and metric every few minutes rather than every poll.
+# Past batch_size buffered rows the buffers with the earliest deadlines are
+# written early, flush() and close() write everything.
+# rollup() folds raw chunks of past days into 5 minute and 1 hour aggregates,
+# compacts the folded chunks, and removes the data older than the retention
+# of each resolution.
+class TimeSeriesStore(object):
+    def __init__(self, directory, batch_size=8000000, flush_interval=900.0, block_rows=64, retention=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_rows = block_rows
+        self.retention = dict(default_retention, **(retention or {}))
+        self.pending = {}
+        self.pending_rows = 0
+        self.deadlines = []
+        self.directories = set()
+        self.paths = {}
+        self.host_deadlines = {}
+        self.sequence = itertools.count()
+        self.random = random.Random()
+
+    def hostPath(self, host, resolution=None):
+        path = os.path.join(self.directory, quote(host, safe=""))
+        if resolution is not None:
+            path = os.path.join(path, resolution)
+        return path
+
+    # The path of the chunk of timestamp, the last one of each series is
+    # kept for the next poll
+    def chunkPath(self, host, metric, resolution, timestamp):
+        span = resolutions[resolution][1]
+        start = int(timestamp) // span * span
+        key = (host, metric, resolution)
+        cached = self.paths.get(key)
+        if cached is not None and cached[0] == start:
+            return cached[1]
+        path = os.path.join(self.hostPath(host, resolution), "%s.%d.chunk" % (quote(metric, safe=""), start))
+        self.paths[key] = (start, path)
+        return path
+
+    def makeDirectory(self, path):
+        if path in self.directories:
+            return
+        try:
+            os.makedirs(path)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        self.directories.add(path)
+
+    # Buffer the records of one poll of host, taken at timestamp
+    def append(self, host, metric, records, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        path = self.chunkPath(host, metric, "raw", timestamp)
+        for record in records:
+            fields = seriesFields(record)
+            if not fields:
+                continue
+            buffer = self.pending.get(path)
+            if buffer is None:
+                buffer = self.pending[path] = ChunkBuffer()
+                heapq.heappush(self.deadlines, (self.deadline(host, timestamp), next(self.sequence), path, buffer))
+            buffer.add(timestamp, record, fields)
+            self.pending_rows += 1
+        buffer = self.pending.get(path)
+        if buffer is not None and buffer.count >= self.block_rows:
+            self.writeBuffer(path)
+        # Write the buffers past their deadline, and those with the earliest
+        # deadlines while more than batch_size rows are buffered, skipping
+        # the entries of the buffers written already
+        while self.deadlines and (self.deadlines[0][0] <= timestamp or self.pending_rows > self.batch_size):
+            deadline, sequence, path, buffer = heapq.heappop(self.deadlines)
+            if self.pending.get(path) is buffer:
+                self.writeBuffer(path)
+
+    # The deadline of a buffer of host started at timestamp, that of the other
+    # buffers of the host unless it is due within a quarter of flush_interval
+    def deadline(self, host, timestamp):
+        deadline = self.host_deadlines.get(host)
+        if deadline is None or deadline - timestamp < self.flush_interval / 4:
+            deadline = timestamp + self.flush_interval * (0.5 + self.random.random() / 2)
+            self.host_deadlines[host] = deadline
+        return deadline
+
+    def writeBuffer(self, path):
+        buffer = self.pending.pop(path)
+        self.pending_rows -= buffer.count
+        self.makeDirectory(os.path.dirname(path))
+        unit = resolutions["raw"][2]
+        return appendBlock(path, buffer.fields, buffer.rows(unit), unit)
+
+    # Write the buffered rows, returns how many were written
+    def flush(self):
+        written = 0
+        for path in sorted(self.pending):
+            written += self.writeBuffer(path)
+        self.deadlines = []
+        return written
+
+    def close(self):
+        self.flush()
+
+    # The hosts, or the metrics of host
+    def hosts(self):
+        return sorted(unquote(name) for name in self.listDirectory(self.directory))
+
+    def metrics(self, host):
+        found = set()
+        for name in self.listDirectory(self.hostPath(host)):
+            if name not in resolutions:
+                found.add(name)
+                continue
+            for chunk in self.listDirectory(self.hostPath(host, name)):
+                match = chunk_name.match(chunk)
+                if match:
+                    found.add(match.group(1))
+        return sorted(unquote(name) for name in found)
+
+    def listDirectory(self, path):
+        try:
+            return [name for name in os.listdir(path) if not name.startswith(".")]
+        except OSError:
+            return []
+
+    # The chunks of metric at resolution as (span start, path) sorted by
+    # time, those of the earlier layout before the current ones of a span
+    def chunks(self, host, metric, resolution):
+        quoted = quote(metric, safe="")
+        found = []
+        path = os.path.join(self.hostPath(host), quoted, resolution)
+        for name in self.listDirectory(path):
+            match = legacy_chunk_name.match(name)
+            if match:
+                found.append((int(match.group(1)), 0, os.path.join(path, name)))
+        path = self.hostPath(host, resolution)
+        for name in self.listDirectory(path):
+            match = chunk_name.match(name)
+            if match and match.group(1) == quoted:
+                found.append((int(match.group(2)), 1, os.path.join(path, name)))
+        return [(chunk_start, chunk_path) for chunk_start, layout, chunk_path in sorted(found)]
+
+    # The rows of a metric of host between start and end (unix seconds, None
+    # for no bound) at resolution, only those of the table row index if given,
+    # as (timestamps, dict of field -> values). Only the chunks whose span
+    # overlaps the range are opened. A field missing from some chunks is NaN
+    # in their rows.
+    def query(self, host, metric, start=None, end=None, resolution="raw", index=None):
+        span = resolutions[resolution][1]
+        stamps, values = [], []
+        for chunk_start, path in self.chunks(host, metric, resolution):
+            if (start is not None and chunk_start + span <= start) or (end is not None and chunk_start > end):
+                continue
+            chunk_stamps, chunk_values = readChunk(path, start, end, index)
+            if chunk_stamps is None or len(chunk_stamps) == 0:
+                continue
+            stamps.append(chunk_stamps)
+            values.append(chunk_values)
+        if not stamps:
+            return numpy.zeros(0), {}
+        fields = set(field for chunk_values in values for field in chunk_values)
+        return numpy.concatenate(stamps), dict((field, numpy.concatenate([
+            chunk_values.get(field, numpy.full(len(chunk_stamps), numpy.nan))
+            for chunk_stamps, chunk_values in zip(stamps, values)])) for field in fields)
+
+    # Fold every raw chunk whose span ended before now into the 5m and 1h
+    # rollups, then remove what is older than the retention. Returns the
+    # number of raw chunks rolled up.
+    def rollup(self, now=None):
+        if now is None:
+            now = time.time()
+        self.flush()
+        raw_span = resolutions["raw"][1]
+        rolled = 0
+        for host in self.hosts():
+            for metric in self.metrics(host):
+                for chunk_start, path in self.chunks(host, metric, "raw"):
+                    if chunk_start + raw_span > now:
+                        continue
+                    with open(path, "rb") as chunk:
+                        info = decodeHeader(chunk.read(header_size))
+                    if info is None:
+                        continue
+                    if not info["flags"] & ROLLED_UP:
+                        stamps, values = readChunk(path)
+                        for resolution in ("5m", "1h"):
+                            self.appendRollup(host, metric, resolution, rollupRows(stamps, values, resolutions[resolution][0]),
+                                              rollupFields(info["fields"]))
+                        compactChunk(path, info["flags"] | ROLLED_UP)
+                        rolled += 1
+                    if chunk_start + raw_span <= now - self.retention["raw"]:
+                        os.unlink(path)
+                for resolution in ("5m", "1h"):
+                    span = resolutions[resolution][1]
+                    for chunk_start, path in self.chunks(host, metric, resolution):
+                        if chunk_start + span <= now - self.retention[resolution]:
+                            os.unlink(path)
+        return rolled
+
+    def appendRollup(self, host, metric, resolution, rows, fields):
+        chunks = {}
+        for row in rows:
+            chunks.setdefault(self.chunkPath(host, metric, resolution, row[0]), []).append(row)
+        for path, chunk_rows in chunks.items():
+            self.makeDirectory(os.path.dirname(path))
+            appendChunk(path, fields, chunk_rows, resolutions[resolution][2])
+
+# The store of --tsdb-dir
+def openTimeSeriesStore(options):
+    directory = getattr(options, "tsdb_dir", None)
+    if not directory:
+        return None
+    return TimeSeriesStore(directory)
@@ -0,0 +1,206 @@
+import time
+import threading
+from snmp_tools import ber
+
+# SNMPv3 user-based security (RFC 3414) for the netsnmp sessions: the
+# engineID, boots and time of each device are discovered once and then handed
+# to every new session, so net-snmp skips its discovery probe.
+
+usm_security_model = 3
+
+# msgFlags
+FLAG_AUTH       = 0x01
+FLAG_PRIV       = 0x02
+FLAG_REPORTABLE = 0x04
+
+usm_stats_unknown_engine_ids_oid = ber.parseOid(".1.3.6.1.6.3.15.1.1.4.0")
+
+sec_levels     = ("noAuthNoPriv", "authNoPriv", "authPriv")
+auth_protocols = ("MD5", "SHA")
+priv_protocols = ("DES", "AES")
+
+# StateStore key of the engine of a device, and how long it is trusted on
+# disk; a device that rebooted or was replaced is rediscovered on error
+engine_state_key = "usmEngine"
+engine_ttl       = 86400.0
+
+def encodeInteger(value):
+    return ber.encodeTlv(ber.INTEGER, ber.encodeIntegerContents(value))
+
+def encodeOctets(value):
+    return ber.encodeTlv(ber.OCTET_STRING, value)
+
+# An SNMPv3 message with a plaintext scoped PDU, as sent for discovery and
+# answered with a report, so without authentication or privacy
+def encodeV3Message(message_id, flags, engine_id, boots, engine_time, user, pdu_type, request_id, varbinds,
+                    max_size=65507):
+    security = ber.encodeTlv(ber.SEQUENCE, encodeOctets(engine_id) + encodeInteger(boots) + encodeInteger(engine_time) +
+                                           encodeOctets(user) + encodeOctets(b"") + encodeOctets(b""))
+    header = ber.encodeTlv(ber.SEQUENCE, encodeInteger(message_id) + encodeInteger(max_size) +
+                                         encodeOctets(bytes(bytearray([flags]))) + encodeInteger(usm_security_model))
+    pdu = ber.encodeTlv(pdu_type, encodeInteger(request_id) + encodeInteger(0) + encodeInteger(0) +
+                                  ber.encodeVarbinds(varbinds))
+    scoped = ber.encodeTlv(ber.SEQUENCE, encodeOctets(engine_id) + encodeOctets(b"") + pdu)
+    return ber.encodeTlv(ber.SEQUENCE, encodeInteger(3) + header + encodeOctets(security) + scoped)
+
+# The version of a message, without decoding the rest
+def messageVersion(data):
+    if not isinstance(data, memoryview):
+        data = memoryview(data)
+    tag, start, end = ber.decodeHeader(data, 0, len(data))
+    tag, start, offset = ber.decodeHeader(data, start, end)
+    return ber.decodeInteger(data, start, offset)
+
+# Decode an SNMPv3 message with a plaintext scoped PDU. Returns (message_id,
+# flags, engine_id, boots, engine_time, user, pdu_type, request_id,
+# [(oid, tag, value), ...]).
+def decodeV3Message(data):
+    if not isinstance(data, memoryview):
+        data = memoryview(data)
+    tag, start, end = ber.decodeHeader(data, 0, len(data))
+    tag, start, offset = ber.decodeHeader(data, start, end)
+    if ber.decodeInteger(data, start, offset) != 3:
+        raise ber.DecodeError("not an SNMPv3 message")
+    tag, header_start, header_end = ber.decodeHeader(data, offset, end)
+    fields = []
+    position = header_start
+    while position < header_end:
+        tag, start, position = ber.decodeHeader(data, position, header_end)
+        fields.append(bytes(data[start:position]) if tag == ber.OCTET_STRING else ber.decodeInteger(data, start, position))
+    if len(fields) != 4 or fields[3] != usm_security_model:
+        raise ber.DecodeError("not a USM message")
+    message_id, flags = fields[0], bytearray(fields[2] or b"\x00")[0]
+    tag, start, security_end = ber.decodeHeader(data, header_end, end)
+    tag, position, usm_end = ber.decodeHeader(data, start, security_end)
+    usm = []
+    while position < usm_end:
+        tag, start, position = ber.decodeHeader(data, position, usm_end)
+        usm.append(bytes(data[start:position]) if tag == ber.OCTET_STRING else ber.decodeInteger(data, start, position))
+    if len(usm) != 6:
+        raise ber.DecodeError("bad USM security parameters")
+    engine_id, boots, engine_time, user = usm[0], usm[1], usm[2], usm[3]
+    if flags & FLAG_PRIV:
+        raise ber.DecodeError("encrypted scoped PDU")
+    tag, start, scoped_end = ber.decodeHeader(data, security_end, end)
+    tag, start, position = ber.decodeHeader(data, start, scoped_end)
+    tag, start, position = ber.decodeHeader(data, position, scoped_end)
+    pdu_type, start, pdu_end = ber.decodeHeader(data, position, scoped_end)
+    tag, start, position = ber.decodeHeader(data, start, pdu_end)
+    request_id = ber.decodeInteger(data, start, position)
+    for i in range(2):
+        tag, start, position = ber.decodeHeader(data, position, pdu_end)
+    tag, start, list_end = ber.decodeHeader(data, position, pdu_end)
+    varbinds = []
+    while start < list_end:
+        tag, start, varbind_end = ber.decodeHeader(data, start, list_end)
+        tag, oid_start, oid_end = ber.decodeHeader(data, start, varbind_end)
+        tag, value_start, value_end = ber.decodeHeader(data, oid_end, varbind_end)
+        varbinds.append((ber.decodeOid(data, oid_start, oid_end), tag, ber.decodeValue(data, tag, value_start, value_end)))
+        start = varbind_end
+    return message_id, flags, engine_id, boots, engine_time, user, pdu_type, request_id, varbinds
+
+# Ask the agent at host:port for its engineID, boots and time with an empty
+# reportable request (RFC 3414 section 4), retries times after timeout seconds.
+# socket and random are imported here, the options import this module.
+def discoverEngine(host, port, timeout=1.0, retries=3):
+    import socket
+    import random
+    family, kind, protocol, name, address = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)[0]
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.connect(address)
+        for attempt in range(retries + 1):
+            message_id = random.randint(1, 0x7fffffff)
+            sock.send(encodeV3Message(message_id, FLAG_REPORTABLE, b"", 0, 0, b"", ber.GET_REQUEST, message_id, []))
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                sock.settimeout(max(0.001, deadline - time.time()))
+                try:
+                    data = sock.recv(65535)
+                except socket.timeout:
+                    break
+                try:
+                    reply = decodeV3Message(data)
+                except ber.DecodeError:
+                    continue
+                if reply[0] == message_id and reply[2]:
+                    return reply[2], reply[3], reply[4]
+        raise socket.timeout("no SNMPv3 engine discovery response from %s:%s" % (host, port))
+    finally:
+        sock.close()
+
+# Engines by device as (engineID, boots, time, when the time was read), kept
+# for the life of the process like the RTT estimators, with a lock per device
+# so concurrent polls of a device discover it once
+engines = {}
+engines_lock = threading.Lock()
+device_locks = {}
+
+# The StateStore of --usm-cache by directory
+stores = {}
+
+def openEngineStore(directory):
+    with engines_lock:
+        store = stores.get(directory)
+        if store is None:
+            from snmp_tools.state import StateStore
+            store = stores[directory] = StateStore(directory, engine_ttl)
+        return store
+
+def deviceLock(device):
+    with engines_lock:
+        lock = device_locks.get(device)
+        if lock is None:
+            lock = device_locks[device] = threading.Lock()
+        return lock
+
+# The engine of a device: from memory, from the --usm-cache directory, or
+# discovered and stored in both
+def deviceEngine(options, target):
+    device = "%s:%s" % (target["host"], target["port"])
+    directory = getattr(options, "usm_cache", None)
+    store = openEngineStore(directory) if directory else None
+    with deviceLock(device):
+        engine = engines.get(device)
+        if engine is None and store is not None:
+            cached = store.get(device, engine_state_key)
+            if isinstance(cached, tuple) and len(cached) == 4:
+                engine = cached
+        if engine is None:
+            engine_id, boots, engine_time = discoverEngine(target["host"], target["port"],
+                                                           options.snmp_timeout, options.snmp_retries)
+            engine = (engine_id, boots, engine_time, time.time())
+            if store is not None:
+                store.put(device, engine_state_key, engine)
+        engines[device] = engine
+        return engine
+
+# Drop the engine of a device after an error that may mean it rebooted or
+# was replaced, the next session discovers it again
+def forgetEngine(device):
+    with engines_lock:
+        engines.pop(device, None)
+        for store in stores.values():
+            store.remove(store.path(device, engine_state_key))
+
+# The netsnmp.Session arguments of an SNMPv3 session to target. The engine
+# time is the one discovered plus the time passed since, -e/--engine-id
+# skips discovery and leaves time synchronization to net-snmp.
+def sessionArguments(options, target):
+    arguments = {"SecName"   : options.security_name,
+                 "SecLevel"  : options.security_level,
+                 "AuthProto" : options.auth_protocol,
+                 "AuthPass"  : options.auth_password or "",
+                 "PrivProto" : options.priv_protocol,
+                 "PrivPass"  : options.priv_password or ""}
+    if options.engine_id:
+        engine_id, boots, engine_time = options.engine_id, 0, 0
+    else:
+        engine_id, boots, engine_time, learned = deviceEngine(options, target)
+        engine_id = "".join("%02x" % octet for octet in bytearray(engine_id))
+        engine_time = int(engine_time + time.time() - learned)
+    arguments.update(SecEngineId     = engine_id,
+                     ContextEngineId = engine_id,
+                     Engineboots     = boots,
+                     Enginetime      = engine_time)
+    return arguments
@@ -0,0 +1,36 @@
+# The VarList and Varbind the pollers build their requests with: those of
+# netsnmp when it is installed, else look-alikes of them for the sessions of
+# snmp_tools.engine, so the tools run with --snmp-engine python without the
+# net-snmp bindings.
+
+try:
+    from netsnmp import VarList, Varbind
+except ImportError:
+    class Varbind(object):
+        def __init__(self, tag=None, iid=None, val=None, type=None):
+            self.tag  = tag
+            self.iid  = iid
+            self.val  = val
+            self.type = type
+
+        def __repr__(self):
+            return "Varbind(%r, %r, %r, %r)" % (self.tag, self.iid, self.val, self.type)
+
+    class VarList(object):
+        def __init__(self, *varbinds):
+            self.varbinds = list(varbinds)
+
+        def __len__(self):
+            return len(self.varbinds)
+
+        def __getitem__(self, index):
+            return self.varbinds[index]
+
+        def __setitem__(self, index, varbind):
+            self.varbinds[index] = varbind
+
+        def __iter__(self):
+            return iter(self.varbinds)
+
+        def append(self, varbind):
+            self.varbinds.append(varbind)
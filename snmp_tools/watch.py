@@ -0,0 +1,92 @@
+import time
+import datetime
+from snmp_tools.pollers import pollScalars, scalar_metrics
+from snmp_tools.output import TableWriter, createWriter
+from snmp_tools import stats
+from snmp_tools.cli import usageError
+from snmp_tools.session import createSession, describeError, optionsTarget
+
+# Yield the tick numbers of a fixed cadence: tick n is due interval*n seconds
+# after the first one on the monotonic clock, so a slow poll delays only its
+# own tick and never pushes the later ones out. Ticks that are already past
+# when the previous one finishes are skipped. count=0 runs forever.
+def schedule(interval, count=0):
+    start = time.monotonic()
+    tick = 0
+    while count == 0 or tick < count:
+        delay = start + tick*interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield tick
+        tick += 1
+        behind = int((time.monotonic() - start) / interval)
+        if behind > tick:
+            tick = behind
+
+# Poll the scalar metrics names of one host on the schedule, all of them in
+# as few GETs as fit max_message_size per tick, and yield (timestamp,
+# results, error) per tick. The session is made by connect() on the first
+# tick and again on the next ones until that succeeds, so a name that does
+# not resolve yet or an SNMPv3 engine that cannot be discovered is an error
+# of the tick, not of the watch.
+def watchScalars(connect, names, interval, count=0, max_message_size=1472):
+    session = None
+    for tick in schedule(interval, count):
+        timestamp = time.time()
+        started = stats.timer()
+        try:
+            if session is None:
+                session = connect()
+            results = pollScalars(session, names, max_message_size)
+        except Exception as exception_error:
+            yield timestamp, None, exception_error
+            continue
+        if stats.registry is not None:
+            stats.observe("poll_seconds", stats.elapsed(started), host="%s:%s" % (session.DestHost, session.RemotePort), metric=",".join(names))
+        yield timestamp, results, None
+
+# Watch the -d host and write every sample as it arrives, returns the exit
+# code: 0 when the last poll succeeded, 2 when it failed or on an invalid
+# metric
+def runWatch(options, renderers):
+    names = [name.strip() for name in options.metrics.split(",") if name.strip()]
+    for name in names:
+        if name not in scalar_metrics:
+            print("Unknown metric '%s', possible values [%s]" % (name, ",".join(sorted(scalar_metrics))))
+            return 2
+    try:
+        stats.startStats(options)
+    except ValueError as listen_error:
+        return usageError(listen_error)
+    try:
+        writer = createWriter(options, renderers)
+    except ValueError as option_error:
+        print(str(option_error))
+        return 2
+    target    = optionsTarget(options)
+    exit_code = 0
+    try:
+        for timestamp, results, error in watchScalars(lambda: createSession(options), names, options.interval,
+                                                      options.count, options.max_message_size):
+            when = datetime.datetime.fromtimestamp(timestamp).isoformat()
+            if error is not None:
+                exit_code = 2
+                stats.recordError(options, "%s:%s" % (target["host"], target["port"]), error)
+                writer.error(target, '%s %s' % (when, describeError(error)))
+            else:
+                exit_code = 0
+                if isinstance(writer, TableWriter):
+                    print(when)
+                started = stats.timer()
+                for name in names:
+                    if name in results:
+                        writer.write(target, name, results[name])
+                writer.flush()
+                if stats.registry is not None:
+                    stats.observe("render_seconds", stats.elapsed(started), metric=",".join(names))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        stats.dumpStats(options)
+    return writer.exitCode(exit_code)
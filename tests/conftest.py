@@ -0,0 +1,36 @@
+import itertools
+import pytest
+from snmp_tools import ber
+from snmp_tools.engine import EngineSession
+from snmp_tools.simulator import SimulatedAgent
+
+# Hands the requests of EngineSessions straight to a SimulatedAgent, no
+# sockets. rewrite(reply) can alter the decoded responses to play a broken
+# agent, a None reply is a timeout.
+class LocalEngine(object):
+    def __init__(self, agent, rewrite=None):
+        self.agent = agent
+        self.rewrite = rewrite
+        self.requests = []
+        self.ids = itertools.count(1)
+
+    def requestId(self):
+        return next(self.ids)
+
+    def call(self, family, address, message, request_id, timeout, version, community):
+        self.requests.append(ber.decodeMessage(message))
+        response = self.agent.handle(message)
+        if response is None:
+            return None
+        reply = ber.decodeMessage(response)
+        return self.rewrite(reply) if self.rewrite is not None else reply
+
+# A factory of sessions of the given SNMP version on their own simulated
+# agent, keyword arguments go to the SimulatedAgent
+@pytest.fixture
+def agentSession():
+    def create(version=2, rewrite=None, **agent_options):
+        agent = SimulatedAgent(seed=1, **agent_options)
+        return EngineSession(DestHost="127.0.0.1", Version=version, RemotePort=1161, Timeout=100000, Retries=0,
+                             engine=LocalEngine(agent, rewrite))
+    return create
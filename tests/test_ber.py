@@ -0,0 +1,50 @@
+import pytest
+from snmp_tools import ber
+
+varbinds = [
+    ((1, 3, 6, 1, 2, 1, 1, 3, 0), ber.TIMETICKS, 4294967295),
+    ((1, 3, 6, 1, 2, 1, 1, 5, 0), ber.OCTET_STRING, b"router\x00\xff"),
+    ((1, 3, 6, 1, 2, 1, 1, 2, 0), ber.OBJECT_IDENTIFIER, (1, 3, 6, 1, 4, 1, 8072, 3, 2, 10)),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 8, 1), ber.INTEGER, -129),
+    ((1, 3, 6, 1, 2, 1, 4, 20, 1, 1, 10, 0, 0, 1), ber.IP_ADDRESS, b"\x0a\x00\x00\x01"),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6, 2), ber.COUNTER64, 18446744073709551615),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 5, 3), ber.GAUGE32, 0),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 10, 4), ber.COUNTER32, 2147483648),
+    ((1, 3, 6, 1, 2, 1, 99, 0), ber.NO_SUCH_OBJECT, None),
+    ((1, 3, 6, 1, 2, 1, 99, 1), ber.END_OF_MIB_VIEW, None),
+]
+
+def testMessageRoundTrip():
+    message = ber.encodeMessage(1, "public", ber.GET_RESPONSE, 123456, ber.NO_ERROR, 0, varbinds)
+    assert ber.decodeMessage(message) == (1, b"public", ber.GET_RESPONSE, 123456, ber.NO_ERROR, 0, varbinds)
+
+def testMessageRoundTripFromMemoryview():
+    message = ber.encodeMessage(0, b"private", ber.GET_BULK_REQUEST, 7, 0, 25, varbinds[:1])
+    buffer = bytearray(message) + bytearray(16)
+    assert ber.decodeMessage(memoryview(buffer)[:len(message)]) == (0, b"private", ber.GET_BULK_REQUEST, 7, 0, 25, varbinds[:1])
+
+def testLongLengthRoundTrip():
+    value = b"x" * 70000
+    message = ber.encodeMessage(1, "public", ber.GET_RESPONSE, 1, 0, 0, [((1, 3, 6, 1), ber.OCTET_STRING, value)])
+    assert ber.decodeMessage(message)[6] == [((1, 3, 6, 1), ber.OCTET_STRING, value)]
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 255, 256, -1, -128, -129, 2147483647, -2147483648])
+def testIntegerRoundTrip(value):
+    contents = ber.encodeIntegerContents(value)
+    assert ber.decodeInteger(contents, 0, len(contents)) == value
+
+@pytest.mark.parametrize("value", [0, 127, 128, 255, 4294967295, 18446744073709551615])
+def testUnsignedRoundTrip(value):
+    contents = ber.encodeIntegerContents(value, True)
+    assert not contents[0] & 0x80
+    assert ber.decodeInteger(contents, 0, len(contents), True) == value
+
+@pytest.mark.parametrize("text", [".1.3.6.1.2.1.1.3.0", ".1.3.6.1.4.1.2021.9.1.100.1", ".1.3.6.1.4.1.4294967295"])
+def testOidRoundTrip(text):
+    contents = ber.encodeOidContents(ber.parseOid(text))
+    assert ber.formatOid(ber.decodeOid(contents, 0, len(contents))) == text
+
+def testTruncatedMessage():
+    message = ber.encodeMessage(1, "public", ber.GET_RESPONSE, 1, 0, 0, varbinds)
+    with pytest.raises(ber.DecodeError):
+        ber.decodeMessage(message[:-3])
@@ -0,0 +1,94 @@
+import time
+import pytest
+from optparse import Values
+from snmp_tools import collector
+from snmp_tools.collector import Collector, HashRing, RingBuffer, targetKey
+
+@pytest.fixture
+def ring():
+    ring = RingBuffer.create(64)
+    yield ring
+    ring.close()
+
+def testRingBufferWrapsAround(ring):
+    received = []
+    for number in range(50):
+        data = b"%d" % number * (number % 7 + 1)
+        assert ring.put(data)
+        received.append(ring.get())
+        assert received[-1] == data
+    assert ring.get() is None
+
+def testRingBufferFull(ring):
+    assert ring.put(b"x" * 30)
+    assert ring.put(b"y" * 20)
+    # 34 + 24 bytes taken, 6 left
+    assert not ring.put(b"z" * 3)
+    assert ring.get() == b"x" * 30
+    assert ring.put(b"z" * 3)
+    assert ring.get() == b"y" * 20
+    assert ring.get() == b"z" * 3
+
+def testRingBufferRecordTooLarge(ring):
+    assert ring.put(b"x" * 60)
+    assert ring.get() == b"x" * 60
+    with pytest.raises(ValueError):
+        ring.put(b"x" * 61)
+
+targets = [{"host": "10.0.%d.%d" % (number >> 8, number & 255), "port": 161, "community": "public"}
+           for number in range(2000)]
+
+def owners(ring):
+    return dict((targetKey(target), ring.node(targetKey(target))) for target in targets)
+
+def testHashRingSpread():
+    shards = HashRing(range(4)).assign(targets)
+    assert sorted(shards) == [0, 1, 2, 3]
+    for shard in shards.values():
+        assert 300 < len(shard) < 700
+
+def testHashRingRemoveMovesOnlyItsKeys():
+    ring = HashRing(range(4))
+    before = owners(ring)
+    ring.remove(2)
+    after = owners(ring)
+    assert len(ring) == 3
+    for key in before:
+        if before[key] == 2:
+            assert after[key] != 2
+        else:
+            assert after[key] == before[key]
+
+def testHashRingAddTakesAShare():
+    ring = HashRing(range(4))
+    before = owners(ring)
+    ring.add(4)
+    after = owners(ring)
+    moved = [key for key in before if after[key] != before[key]]
+    assert all(after[key] == 4 for key in moved)
+    assert 200 < len(moved) < 600
+
+# A result that does not fit the ring is reported as that host's error and
+# the worker goes on with the rest of its shard
+def testResultLargerThanRing(monkeypatch):
+    def pollTarget(options, target, metrics, state):
+        size = 100000 if target["host"] == "big" else 10
+        return {"load": [{"descr": "x" * size}]}
+    monkeypatch.setattr(collector, "pollTarget", pollTarget)
+    received = {}
+    def sink(target, timestamp, results, error):
+        received[target["host"]] = (results, error)
+    hosts = [{"host": host, "port": 161, "community": "public"} for host in ("big", "small")]
+    daemon = Collector(Values({"workers": 2}), hosts, ["load"], sink, 1, 60.0, ring_size=4096)
+    daemon.start()
+    try:
+        deadline = time.monotonic() + 10.0
+        while len(received) < 2 and time.monotonic() < deadline:
+            daemon.run(0.1)
+        assert all(worker.process.is_alive() for worker in daemon.workers.values())
+    finally:
+        daemon.stop()
+    assert received["small"] == ({"load": [{"descr": "x" * 10}]}, None)
+    results, error = received["big"]
+    assert results is None
+    assert "does not fit" in error and "--ring-size" in error
@@ -0,0 +1,123 @@
+import time
+import socket
+import threading
+from collections import OrderedDict
+import pytest
+from snmp_tools import ber, engine
+from snmp_tools.engine import SNMPERR_TIMEOUT, Engine, EngineSession
+from snmp_tools.varbind import Varbind
+
+sys_descr = (1, 3, 6, 1, 2, 1, 1, 1, 0)
+
+def reply(request, value, version=None, community=None, pdu_type=ber.GET_RESPONSE, request_id=None):
+    return ber.encodeMessage(request[0] if version is None else version, request[1] if community is None else community,
+                             pdu_type, request[3] if request_id is None else request_id, ber.NO_ERROR, 0,
+                             [(sys_descr, ber.OCTET_STRING, value)])
+
+# A UDP agent on localhost that answers each request it gets with the
+# datagrams answer(number, request) returns, number counting from 0
+class ScriptedAgent(object):
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.1)
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.sock.getsockname()[1]
+
+    def run(self):
+        while self.running:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            request = ber.decodeMessage(data)
+            self.requests.append(request)
+            for datagram in self.answer(len(self.requests) - 1, request):
+                if isinstance(datagram, float):
+                    time.sleep(datagram)
+                else:
+                    self.sock.sendto(datagram, address)
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+@pytest.fixture
+def scripted():
+    agents = []
+    def create(answer, version=2, timeout=0.5, retries=0):
+        agent = ScriptedAgent(answer)
+        agents.append(agent)
+        session = EngineSession(DestHost="127.0.0.1", Version=version, RemotePort=agent.port,
+                                Timeout=int(timeout * 1000000), Retries=retries, engine=Engine())
+        return agent, session
+    yield create
+    for agent in agents:
+        agent.close()
+
+def get(session):
+    return session.get([Varbind("." + ".".join(map(str, sys_descr)))])
+
+def testReplyMatchedByRequestId(scripted):
+    agent, session = scripted(lambda number, request: [reply(request, b"other", request_id=request[3] + 1),
+                                                       reply(request, b"linux")])
+    assert get(session) == (b"linux",)
+    assert session.ErrorNum == 0
+
+@pytest.mark.parametrize("forged", [
+    {"community": b"private"},
+    {"version": 0},
+    {"pdu_type": ber.GET_REQUEST},
+    {"pdu_type": ber.REPORT},
+])
+def testForgedRepliesDropped(scripted, forged):
+    agent, session = scripted(lambda number, request: [reply(request, b"forged", **forged), reply(request, b"linux")])
+    assert get(session) == (b"linux",)
+
+def testForgedReplyOnlyTimesOut(scripted):
+    agent, session = scripted(lambda number, request: [reply(request, b"forged", community=b"private")], timeout=0.1)
+    assert get(session) is None
+    assert session.ErrorNum == SNMPERR_TIMEOUT
+
+def testTimeoutAndRetries(scripted):
+    agent, session = scripted(lambda number, request: [], timeout=0.05, retries=2)
+    started = time.monotonic()
+    assert get(session) is None
+    assert time.monotonic() - started >= 0.15
+    assert (session.ErrorStr, session.ErrorNum) == ("Timeout", SNMPERR_TIMEOUT)
+    assert len(agent.requests) == 3
+    assert len(set(request[3] for request in agent.requests)) == 3
+
+# The answer to the first attempt comes after its timeout, while the retry
+# waits for its own
+def testLateReplyDropped(scripted):
+    def answer(number, request):
+        if number == 0:
+            return [0.15, reply(request, b"late")]
+        return [reply(request, b"fresh")]
+    agent, session = scripted(answer, timeout=0.1, retries=1)
+    assert get(session) == (b"fresh",)
+    assert len(agent.requests) == 2
+
+def testResolveTtl(monkeypatch):
+    lookups = []
+    def getaddrinfo(host, port, family, kind):
+        lookups.append(host)
+        return [(socket.AF_INET, kind, 17, "", ("192.0.2.%d" % len(lookups), port))]
+    monkeypatch.setattr(engine, "resolved", OrderedDict())
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    assert engine.resolve("router", 161) == (socket.AF_INET, ("192.0.2.1", 161))
+    assert engine.resolve("router", 161) == (socket.AF_INET, ("192.0.2.1", 161))
+    assert lookups == ["router"]
+    monkeypatch.setattr(engine, "resolve_ttl", 0.0)
+    engine.resolved.clear()
+    assert engine.resolve("router", 161) == (socket.AF_INET, ("192.0.2.2", 161))
+    assert engine.resolve("router", 161) == (socket.AF_INET, ("192.0.2.3", 161))
@@ -0,0 +1,80 @@
+import time
+import pytest
+from snmp_tools.cli import run
+from snmp_tools.fleet import readTargets
+from snmp_tools.options import createParser
+from snmp_tools.transport import SNMPERR_TIMEOUT, Transport
+
+def testReadTargets(tmp_path):
+    path = tmp_path / "hosts.txt"
+    path.write_text("# routers\n10.0.0.1\n\n10.0.0.2:1161 private\nfe80::1 public\n")
+    assert readTargets(str(path), 161, "public") == [
+        {"host": "10.0.0.1", "port": 161, "community": "public"},
+        {"host": "10.0.0.2", "port": 1161, "community": "private"},
+        {"host": "fe80::1", "port": 161, "community": "public"},
+    ]
+
+@pytest.mark.parametrize("port", ["", "snmp", "0", "70000", "-1"])
+def testReadTargetsInvalidPort(tmp_path, port):
+    path = tmp_path / "hosts.txt"
+    path.write_text("10.0.0.1\n10.0.0.2:%s\n" % port)
+    with pytest.raises(ValueError) as error:
+        readTargets(str(path))
+    assert str(error.value) == "%s:2: invalid port '%s'" % (path, port)
+
+def testRunReportsTargetsFile(tmp_path, capsys):
+    path = tmp_path / "hosts.txt"
+    path.write_text("10.0.0.1:16x1\n")
+    polled = []
+    for targets_file, message in ((str(path), "hosts.txt:1: invalid port '16x1'"),
+                                  (str(tmp_path / "missing.txt"), "cannot read targets file")):
+        options, args = createParser("%prog").parse_args(["-f", targets_file])
+        assert run(options, "load", polled.append, None) == 2
+        assert message in capsys.readouterr().err
+    assert polled == []
+
+# A netsnmp session that takes delay seconds to answer every request
+class SlowSession(object):
+    def __init__(self, delay, timeouts, timeout):
+        self.delay = delay
+        self.timeouts = timeouts
+        self.Version = 2
+        self.DestHost = "127.0.0.1"
+        self.RemotePort = 161
+        self.ErrorStr = ""
+        self.ErrorNum = 0
+        self.ErrorInd = 0
+        self.Timeout = int(timeout * 1000000)
+
+    def get(self, varlist):
+        self.timeouts.append(self.Timeout / 1000000.0)
+        if self.delay * 1000000 > self.Timeout:
+            time.sleep(self.Timeout / 1000000.0)
+            self.ErrorStr, self.ErrorNum = "Timeout", SNMPERR_TIMEOUT
+            return None
+        time.sleep(self.delay)
+        self.ErrorStr, self.ErrorNum = "", 0
+        return ("1",)
+
+def testHostDeadlineStopsRequests():
+    timeouts = []
+    transport = Transport(lambda timeout: SlowSession(0.05, timeouts, timeout), retries=0)
+    session = transport.session(time.monotonic() + 0.12)
+    results = [session.get(["1.3.6.1.2.1.1.3.0"]) for attempt in range(5)]
+    assert results == [("1",), ("1",), None, None, None]
+    assert session.ErrorStr == "Host deadline exceeded"
+    # The third request waits only for what is left of the deadline, the
+    # last ones are not sent
+    assert len(timeouts) == 3 and timeouts[2] < 0.05
+    assert session.fork().deadline == session.deadline
+
+def testHostDeadlineEndsRetries():
+    timeouts = []
+    transport = Transport(lambda timeout: SlowSession(1.0, timeouts, timeout), retries=10)
+    transport.estimator.rto = 0.04
+    started = time.monotonic()
+    session = transport.session(started + 0.2)
+    assert session.get(["1.3.6.1.2.1.1.3.0"]) is None
+    assert time.monotonic() - started < 0.4
+    assert session.ErrorNum == SNMPERR_TIMEOUT
+    assert len(timeouts) < 6
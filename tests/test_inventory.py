@@ -0,0 +1,66 @@
+import pytest
+from snmp_tools import ber, simulator
+from snmp_tools.inventory import syncInventory
+from snmp_tools.state import StateStore
+
+def setValue(agent, oid, tag, value):
+    agent.values[oid] = (tag, value)
+    agent.oids = sorted(agent.values)
+
+def removeInterface(agent, index):
+    for oid in [oid for oid in agent.values if oid[:-2] in (simulator.if_entry_oid, simulator.if_x_entry_oid) and oid[-1] == index]:
+        del agent.values[oid]
+    agent.oids = sorted(agent.values)
+
+@pytest.fixture
+def state(tmp_path):
+    return StateStore(str(tmp_path), ttl=3600.0)
+
+def testFirstSyncAddsEverything(agentSession, state):
+    session = agentSession(2, interfaces=3)
+    changes = syncInventory(session, "interface", state=state)
+    assert [(change.change, change.index) for change in changes] == [("added", "1"), ("added", "2"), ("added", "3")]
+    assert changes[1].row == {"descr": "eth1", "type": 6, "phys_address": b"\x02\x00\x00\x00\x00\x02"}
+
+def testUnchangedSkipsTheWalk(agentSession, state):
+    session = agentSession(2, interfaces=3)
+    syncInventory(session, "interface", state=state)
+    requests = len(session.engine.requests)
+    assert syncInventory(session, "interface", state=state) == []
+    # One GET of sysUpTime, ifNumber and ifTableLastChange
+    assert len(session.engine.requests) == requests + 1
+
+def testRenameIsReportedAsChanged(agentSession, state):
+    session = agentSession(2, interfaces=3)
+    syncInventory(session, "interface", state=state)
+    agent = session.engine.agent
+    setValue(agent, simulator.if_entry_oid + (2, 2), ber.OCTET_STRING, b"uplink")
+    # Nothing signals a rename in place, it shows at the next resync
+    assert syncInventory(session, "interface", state=state) == []
+    changes = syncInventory(session, "interface", state=state, resync=0.0)
+    assert [(change.change, change.index, change.row["descr"]) for change in changes] == [("changed", "2", "uplink")]
+
+def testRemovedInterface(agentSession, state):
+    session = agentSession(2, interfaces=3)
+    syncInventory(session, "interface", state=state)
+    agent = session.engine.agent
+    removeInterface(agent, 3)
+    setValue(agent, simulator.if_number_oid, ber.INTEGER, 2)
+    changes = syncInventory(session, "interface", state=state)
+    assert [(change.change, change.index, change.row["descr"]) for change in changes] == [("removed", "3", "eth2")]
+
+def testDiskIndexesCompared(agentSession, state):
+    session = agentSession(2, disks=2)
+    assert len(syncInventory(session, "disk", state=state)) == 2
+    setValue(session.engine.agent, simulator.dsk_entry_oid + (1, 3), ber.INTEGER, 3)
+    setValue(session.engine.agent, simulator.dsk_entry_oid + (2, 3), ber.OCTET_STRING, b"/srv")
+    changes = syncInventory(session, "disk", state=state)
+    assert [(change.change, change.index, change.row["path"]) for change in changes] == [("added", "3", "/srv")]
+
+# The last sync outlives the --state-ttl of the counter samples and index maps
+def testInventoryOutlivesStateTtl(agentSession, tmp_path):
+    state = StateStore(str(tmp_path), ttl=-1.0)
+    session = agentSession(2, interfaces=3)
+    assert len(syncInventory(session, "interface", state=state)) == 3
+    assert state.evictExpired() == 1
+    assert syncInventory(session, "interface", state=state) == []
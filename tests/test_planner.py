@@ -0,0 +1,76 @@
+import pytest
+from snmp_tools import ber, planner
+from snmp_tools.planner import fetchScalars, planRequests, varbindSize
+from snmp_tools.pollers import pollScalars, scalar_metrics
+from snmp_tools.session import QueryError
+
+scalar_oids = [oid for name in sorted(scalar_metrics) for oid in scalar_metrics[name][0]]
+
+@pytest.fixture(autouse=True)
+def deviceLimits(monkeypatch):
+    monkeypatch.setattr(planner, "device_limits", {})
+
+def testPlanRequests():
+    oids = [".1.3.6.1.4.1.2021.4.%d.0" % column for column in range(1, 60)]
+    batches = planRequests(oids, 600, community="public")
+    assert sum(batches, []) == oids
+    budget = 600 - planner.message_overhead - len("public")
+    for batch in batches:
+        assert sum(varbindSize(oid) for oid in batch) <= budget
+    assert len(batches) == -(-sum(varbindSize(oid) for oid in oids) // budget)
+    assert [len(batch) for batch in planRequests(oids, 65535, 25)] == [25, 25, 9]
+
+def testOneGetForAllScalars(agentSession):
+    session = agentSession(2)
+    values = fetchScalars(session, scalar_oids)
+    assert sorted(values) == sorted(set(scalar_oids))
+    assert len(session.engine.requests) == 1
+
+# The agent answers tooBig for the planned PDU, it is split in halves until
+# the responses fit and the smaller size is kept for the next polls
+def testTooBigSplits(agentSession):
+    session = agentSession(2, max_message_size=250)
+    counters = {}
+    values = fetchScalars(session, scalar_oids, counters=counters)
+    assert sorted(values) == sorted(set(scalar_oids))
+    limit = planner.deviceLimit("127.0.0.1:1161")
+    assert limit is not None and limit < len(set(scalar_oids))
+    first = counters["get"]
+    assert first > 2
+    counters = {}
+    assert sorted(fetchScalars(session, scalar_oids, counters=counters)) == sorted(values)
+    assert counters["get"] < first
+
+def testTooBigSingleOid(agentSession):
+    session = agentSession(2, max_message_size=40)
+    with pytest.raises(QueryError):
+        fetchScalars(session, scalar_oids[:1])
+
+# SNMPv1 fails the whole PDU for one unknown OID, only that one is dropped
+def testNoSuchNameDropsOid(agentSession):
+    session = agentSession(1)
+    missing = ".1.3.6.1.4.1.2021.4.99.0"
+    oids = scalar_oids[:3] + [missing] + scalar_oids[3:]
+    values = fetchScalars(session, oids)
+    assert missing not in values
+    assert sorted(values) == sorted(set(scalar_oids))
+    assert len(session.engine.requests) == 2
+    assert [len(request[6]) for request in session.engine.requests] == [len(set(oids)), len(set(scalar_oids))]
+
+def testNoSuchInstanceLeftOut(agentSession):
+    session = agentSession(2)
+    values = fetchScalars(session, scalar_oids + [".1.3.6.1.4.1.2021.4.99.0"])
+    assert sorted(values) == sorted(set(scalar_oids))
+
+# A metric the agent lacks is left out of a combined poll, and fails a poll
+# of that metric alone
+def testPollScalarsMissingMetric(agentSession):
+    session = agentSession(1)
+    agent = session.engine.agent
+    for oid in scalar_metrics["memory"][0][:1]:
+        del agent.values[ber.parseOid(oid)]
+    agent.oids = sorted(agent.values)
+    results = pollScalars(session, sorted(scalar_metrics))
+    assert "memory" not in results and "load" in results
+    with pytest.raises(QueryError):
+        pollScalars(session, ("memory",))
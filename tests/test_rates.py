@@ -0,0 +1,67 @@
+import numpy
+import pytest
+from snmp_tools.rates import AgentRestarted, CounterSample, computeRates, counter_names, decodeSample, \
+                             encodeSample, sampleCounters
+
+def sample(uptime, bits, counters, indexes=(1, 2), timestamp=1000.0):
+    return CounterSample(uptime, timestamp, bits, numpy.array(indexes, dtype=numpy.int64),
+                         ["eth%d" % index for index in indexes],
+                         dict((name, numpy.array(counters, dtype=numpy.uint64)) for name in counter_names))
+
+def testCounter32Wrap():
+    rates = computeRates(sample(1000, 32, [(1 << 32) - 1000, 5000]), sample(2000, 32, [500, 15000]))
+    assert rates.interval == 10.0
+    assert rates.in_pps.tolist() == [150.0, 1000.0]
+    assert rates.in_bps.tolist() == [1200.0, 8000.0]
+
+def testCounter64Wrap():
+    rates = computeRates(sample(0, 64, [(1 << 64) - 10, (1 << 32) - 10]), sample(100, 64, [10, (1 << 32) + 10]))
+    assert rates.out_pps.tolist() == [20.0, 20.0]
+
+def testAgentRestart():
+    with pytest.raises(AgentRestarted):
+        computeRates(sample(50000, 32, [1000, 1000]), sample(300, 32, [10, 10]))
+
+# With the same sysUpTime the wall clock gives the interval
+def testWallClockInterval():
+    rates = computeRates(sample(100, 64, [0, 0], timestamp=10.0), sample(100, 64, [40, 80], timestamp=14.0))
+    assert rates.interval == 4.0
+    assert rates.in_pps.tolist() == [10.0, 20.0]
+
+def testCounterWidthChanged():
+    rates = computeRates(sample(0, 32, [0, 0]), sample(100, 64, [10, 10]))
+    assert numpy.isnan(rates.in_bps).all() and numpy.isnan(rates.out_pps).all()
+
+def testOnlyInterfacesInBothSamples():
+    rates = computeRates(sample(0, 64, [0, 0, 0], indexes=(1, 2, 5)), sample(100, 64, [10, 30], indexes=(2, 3)))
+    assert rates.indexes.tolist() == [2]
+    assert rates.descr == ["eth2"]
+    assert rates.in_pps.tolist() == [10.0]
+
+def testSampleRoundTrip():
+    previous = sample(1234, 32, [1, (1 << 32) - 1])
+    decoded = decodeSample(encodeSample(previous))
+    assert decoded.uptime == 1234 and decoded.bits == 32 and decoded.descr == previous.descr
+    assert decoded.indexes.tolist() == [1, 2]
+    assert decoded.counters["in_octets"].tolist() == [1, (1 << 32) - 1]
+
+# The simulated Counter32 values start 5 seconds before they wrap, 10
+# seconds later every one of them wrapped once
+@pytest.mark.parametrize("version", [1, 2])
+def testSampleCountersAcrossWrap(agentSession, version):
+    session = agentSession(version, wrap=True, interfaces=3)
+    agent = session.engine.agent
+    previous = sampleCounters(session, bits=32)
+    agent.started -= 10.0
+    current = sampleCounters(session, bits=32)
+    assert current.bits == 32
+    assert (current.counters["in_octets"] < previous.counters["in_octets"]).all()
+    rates = computeRates(previous, current)
+    rate = numpy.array([125000 * (1 + index % 100) for index in (1, 2, 3)], dtype=numpy.float64)
+    assert rates.in_bps == pytest.approx(rate * 8, rel=0.01)
+    assert rates.out_bps == pytest.approx(rate * 4, rel=0.01)
+
+def testSampleCountersPrefersCounter64(agentSession):
+    session = agentSession(2, interfaces=2)
+    assert sampleCounters(session).bits == 64
+    assert sampleCounters(agentSession(1, interfaces=2)).bits == 32
@@ -0,0 +1,76 @@
+import pytest
+from snmp_tools import ber, simulator
+from snmp_tools.simulator import SimulatedAgent
+
+def request(agent, version, pdu_type, oids, field1=0, field2=0, community=b"public"):
+    message = ber.encodeMessage(version, community, pdu_type, 7, field1, field2, [(oid, ber.NULL, None) for oid in oids])
+    response = agent.handle(message)
+    return None if response is None else ber.decodeMessage(response)
+
+@pytest.fixture
+def agent():
+    return SimulatedAgent(interfaces=2, disks=2, seed=1)
+
+def testGet(agent):
+    version, community, pdu_type, request_id, status, index, varbinds = \
+        request(agent, 1, ber.GET_REQUEST, [simulator.sys_descr_oid, simulator.if_number_oid])
+    assert (pdu_type, request_id, status) == (ber.GET_RESPONSE, 7, ber.NO_ERROR)
+    assert [(oid, tag, value) for oid, tag, value in varbinds] == [
+        (simulator.sys_descr_oid, ber.OCTET_STRING, b"snmp-tools simulated agent"),
+        (simulator.if_number_oid, ber.INTEGER, 2)]
+
+def testGetMissing(agent):
+    missing = simulator.memory_oid + (99, 0)
+    assert request(agent, 1, ber.GET_REQUEST, [simulator.sys_descr_oid, missing])[6][1][1] == ber.NO_SUCH_INSTANCE
+    reply = request(agent, 0, ber.GET_REQUEST, [simulator.sys_descr_oid, missing])
+    assert (reply[4], reply[5]) == (ber.NO_SUCH_NAME, 2)
+
+def testGetNext(agent):
+    varbinds = request(agent, 1, ber.GET_NEXT_REQUEST, [simulator.if_entry_oid])[6]
+    assert varbinds[0][:2] == (simulator.if_entry_oid + (1, 1), ber.INTEGER)
+    last = agent.oids[-1]
+    assert request(agent, 1, ber.GET_NEXT_REQUEST, [last])[6][0][1] == ber.END_OF_MIB_VIEW
+    assert request(agent, 0, ber.GET_NEXT_REQUEST, [last])[4] == ber.NO_SUCH_NAME
+
+# SNMPv1 has no Counter64, a v1 walk steps over the ifXTable counters
+def testGetNextSkipsCounter64InV1(agent):
+    name = simulator.if_x_entry_oid + (1, 2)
+    assert request(agent, 1, ber.GET_NEXT_REQUEST, [name])[6][0][1] == ber.COUNTER64
+    assert request(agent, 0, ber.GET_NEXT_REQUEST, [name])[6][0][1] != ber.COUNTER64
+
+def testGetBulk(agent):
+    varbinds = request(agent, 1, ber.GET_BULK_REQUEST, [simulator.sys_descr_oid, simulator.if_entry_oid + (2,)], 1, 3)[6]
+    assert [oid for oid, tag, value in varbinds] == [
+        simulator.sys_uptime_oid,
+        simulator.if_entry_oid + (2, 1), simulator.if_entry_oid + (2, 2), simulator.if_entry_oid + (3, 1)]
+
+def testGetBulkFitsTheMessageSize():
+    agent = SimulatedAgent(interfaces=50, max_message_size=400, seed=1)
+    data = agent.handle(ber.encodeMessage(1, b"public", ber.GET_BULK_REQUEST, 7, 0, 100,
+                                          [(simulator.if_entry_oid + (2,), ber.NULL, None)]))
+    assert len(data) <= 400
+    varbinds = ber.decodeMessage(data)[6]
+    assert 1 < len(varbinds) < 50
+    assert [oid for oid, tag, value in varbinds] == [simulator.if_entry_oid + (2, index) for index in range(1, len(varbinds) + 1)]
+
+def testTooBig():
+    agent = SimulatedAgent(max_message_size=60, seed=1)
+    reply = request(agent, 1, ber.GET_REQUEST, [simulator.sys_descr_oid])
+    assert (reply[4], reply[6]) == (ber.TOO_BIG, [])
+
+@pytest.mark.parametrize("version, pdu_type, community", [
+    (1, ber.GET_REQUEST, b"private"),
+    (0, ber.GET_BULK_REQUEST, b"public"),
+    (1, ber.SET_REQUEST, b"public"),
+])
+def testIgnored(agent, version, pdu_type, community):
+    assert request(agent, version, pdu_type, [simulator.sys_descr_oid], community=community) is None
+    assert agent.handle(b"\x30\x03\x02\x01") is None
+
+# Counters move with the clock of the agent
+def testCounters(agent):
+    octets = simulator.if_entry_oid + (10, 1)
+    before = agent.value(octets)[1]
+    agent.started -= 10.0
+    assert agent.value(octets)[1] - before == pytest.approx(125000 * 2 * 10, rel=0.01)
+    assert agent.value(simulator.sys_uptime_oid)[1] >= 1000
@@ -0,0 +1,71 @@
+import os
+import time
+import pytest
+from snmp_tools.state import StateStore, header, magic
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path), ttl=3600.0, evict_probability=0.0)
+
+def entries(store):
+    return sorted(name for root, dirs, names in os.walk(store.directory) for name in names)
+
+def testPutGet(store):
+    value = {"uptime": 1234, "indexes": [1, 2, 3], "descr": ("eth0", b"\x00\x01"), "rate": 1.5}
+    store.put("10.0.0.1:161", "ifTable", value)
+    assert store.get("10.0.0.1:161", "ifTable") == value
+    assert store.get("10.0.0.2:161", "ifTable") is None
+    assert store.get("10.0.0.1:161", "ifXTable") is None
+    store.put("10.0.0.1:161", "ifTable", [4])
+    assert store.get("10.0.0.1:161", "ifTable") == [4]
+
+def testExpiredEntryIgnored(tmp_path):
+    store = StateStore(str(tmp_path), ttl=-1.0, evict_probability=0.0)
+    store.put("10.0.0.1:161", "ifTable", [1])
+    assert store.get("10.0.0.1:161", "ifTable") is None
+    # Ignored by the reader, left for evictExpired
+    assert len(entries(store)) == 1
+
+def testPutTtl(store):
+    store.put("10.0.0.1:161", "old", [1], ttl=-1.0)
+    store.put("10.0.0.1:161", "new", [2], ttl=60.0)
+    assert store.get("10.0.0.1:161", "old") is None
+    assert store.get("10.0.0.1:161", "new") == [2]
+
+def testEvictExpired(store):
+    store.put("10.0.0.1:161", "old", [1], ttl=-1.0)
+    store.put("10.0.0.1:161", "new", [2])
+    directory = os.path.dirname(store.path("10.0.0.1:161", "new"))
+    stale = os.path.join(directory, ".tmpstale")
+    fresh = os.path.join(directory, ".tmpfresh")
+    for path in (stale, fresh):
+        with open(path, "wb") as entry:
+            entry.write(b"partial")
+    past = time.time() - 2 * store.ttl
+    os.utime(stale, (past, past))
+    assert store.evictExpired() == 2
+    assert not os.path.exists(store.path("10.0.0.1:161", "old"))
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert store.get("10.0.0.1:161", "new") == [2]
+    assert store.evictExpired() == 0
+
+def testPutSweeps(tmp_path):
+    store = StateStore(str(tmp_path), ttl=3600.0, evict_probability=1.0)
+    store.put("10.0.0.1:161", "old", [1], ttl=-1.0)
+    store.put("10.0.0.1:161", "new", [2])
+    assert entries(store) == [os.path.basename(store.path("10.0.0.1:161", "new"))]
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"SNST",
+    header.pack(b"XXXX", 1, time.time() + 3600) + b"\x00",
+    header.pack(magic, 99, time.time() + 3600) + b"\x00",
+    header.pack(magic, 1, time.time() + 3600) + b"\xff\xff",
+])
+def testCorruptEntry(store, data):
+    path = store.path("10.0.0.1:161", "ifTable")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as entry:
+        entry.write(data)
+    assert store.get("10.0.0.1:161", "ifTable") is None
@@ -0,0 +1,39 @@
+import socket
+import pytest
+from snmp_tools import stats
+from snmp_tools.cli import run
+from snmp_tools.options import createParser
+
+@pytest.mark.parametrize("address, expected", [
+    ("9100", ("", 9100)),
+    ("127.0.0.1:9100", ("127.0.0.1", 9100)),
+    ("localhost:0", ("localhost", 0)),
+])
+def testListenAddress(address, expected):
+    assert stats.listenAddress(address) == expected
+
+@pytest.mark.parametrize("address", ["", "host", "host:", "127.0.0.1:http", "9100:host", "70000", "-1"])
+def testInvalidListenAddress(address):
+    with pytest.raises(ValueError):
+        stats.listenAddress(address)
+
+def testParserRejectsListenAddress(capsys):
+    with pytest.raises(SystemExit) as exit_request:
+        createParser("%prog").parse_args(["--stats-listen", "localhost:metrics"])
+    assert exit_request.value.code == 2
+    assert "--stats-listen: invalid address 'localhost:metrics'" in capsys.readouterr().err
+
+def testListenFailureIsAUsageError(capsys, monkeypatch):
+    monkeypatch.setattr(stats, "registry", None)
+    taken = socket.socket()
+    taken.bind(("127.0.0.1", 0))
+    taken.listen(1)
+    try:
+        options, args = createParser("%prog").parse_args(["--stats-listen", "127.0.0.1:%d" % taken.getsockname()[1]])
+        polled = []
+        assert run(options, "load", polled.append, None) == 2
+    finally:
+        taken.close()
+    assert polled == []
+    assert "error: option --stats-listen: cannot listen on '127.0.0.1:" in capsys.readouterr().err
+    assert stats.registry is None
@@ -0,0 +1,74 @@
+import pytest
+from snmp_tools import ber
+from snmp_tools.pollers import disk_table_columns, if_table_columns
+from snmp_tools.session import QueryError, checkSession
+from snmp_tools.table import iterTable, walkTable
+
+columns = dict((name, if_table_columns[name]) for name in ("descr", "type", "in_octets"))
+
+@pytest.mark.parametrize("version, max_repetitions", [(1, 25), (2, 25), (2, 3), (2, 0)])
+def testWalk(agentSession, version, max_repetitions):
+    session = agentSession(version, interfaces=12)
+    rows = list(iterTable(session, columns, max_repetitions))
+    assert not session.ErrorStr
+    assert [index for index, row in rows] == [str(index) for index in range(1, 13)]
+    assert rows[9][0] == "10" and rows[9][1]["descr"] == b"eth9" and rows[9][1]["type"] == b"6"
+    assert all(set(row) == set(columns) for index, row in rows)
+
+def testGetbulkCounts(agentSession):
+    session = agentSession(2, interfaces=12)
+    counters = {}
+    walkTable(session, columns, 5, counters)
+    assert counters == {"getbulk": 3}
+
+# The column at the end of the MIB runs out first, an SNMPv1 agent fails the
+# whole GETNEXT with noSuchName for it and the other column goes on alone
+def testV1NoSuchNameDropsColumn(agentSession):
+    replies = []
+    def record(reply):
+        replies.append(reply)
+        return reply
+    session = agentSession(1, rewrite=record, interfaces=2, disks=6)
+    tail = ber.formatOid(session.engine.agent.oids[-1][:-1])
+    rows = walkTable(session, {"path": disk_table_columns["path"], "tail": tail}, 0)
+    assert not session.ErrorStr
+    assert sorted(rows) == ["1", "2", "3", "4", "5", "6"]
+    assert rows["1"]["path"] == b"/" and rows["6"]["path"] == b"/mnt/vol6"
+    assert "tail" in rows["1"] and "tail" not in rows["6"]
+    assert [reply[4] for reply in replies].count(ber.NO_SUCH_NAME) == 1
+
+def testEmptyBulkFallsBackToGetnext(agentSession):
+    session = agentSession(2, max_message_size=150)
+    walkTable(session, if_table_columns)
+    assert session.ErrorNum == ber.TOO_BIG
+    with pytest.raises(QueryError):
+        checkSession(session)
+    pdu_types = [request[2] for request in session.engine.requests]
+    assert pdu_types == [ber.GET_BULK_REQUEST, ber.GET_NEXT_REQUEST]
+
+def testEmptyBulkOfSmallRowsContinues(agentSession):
+    replies = []
+    def emptyFirst(reply):
+        replies.append(reply)
+        if len(replies) == 1:
+            return reply[:6] + ([],)
+        return reply
+    session = agentSession(2, rewrite=emptyFirst, interfaces=3)
+    rows = walkTable(session, columns)
+    assert not session.ErrorStr
+    assert sorted(rows) == ["1", "2", "3"]
+
+@pytest.mark.parametrize("version, max_repetitions", [(1, 0), (2, 25)])
+def testOidNotIncreasing(agentSession, version, max_repetitions):
+    # An agent that answers every request from the start of the column again
+    def restart(reply):
+        version, community, pdu_type, request_id, status, index, varbinds = reply
+        first = ber.parseOid(if_table_columns["descr"] + ".1")
+        return (version, community, pdu_type, request_id, status, index,
+                [(first, ber.OCTET_STRING, b"eth0")] * len(varbinds))
+    session = agentSession(version, rewrite=restart)
+    rows = walkTable(session, {"descr": if_table_columns["descr"]}, max_repetitions)
+    assert session.ErrorStr.startswith("OID not increasing")
+    assert len(session.engine.requests) <= 2
+    with pytest.raises(QueryError):
+        checkSession(session)
@@ -0,0 +1,24 @@
+import pytest
+from snmp_tools.thresholds import Range, ThresholdError, parseRange
+
+inf = float("inf")
+
+@pytest.mark.parametrize("text, expected", [
+    ("10",     Range(0.0, 10.0, False, "10")),
+    ("10:",    Range(10.0, inf, False, "10:")),
+    ("~:10",   Range(-inf, 10.0, False, "~:10")),
+    ("~:",     Range(-inf, inf, False, "~:")),
+    (":5",     Range(0.0, 5.0, False, ":5")),
+    ("10:20",  Range(10.0, 20.0, False, "10:20")),
+    ("@10:20", Range(10.0, 20.0, True, "@10:20")),
+    ("@10",    Range(0.0, 10.0, True, "@10")),
+    (" 2.5 ",  Range(0.0, 2.5, False, "2.5")),
+    ("-5:-1",  Range(-5.0, -1.0, False, "-5:-1")),
+])
+def testParseRange(text, expected):
+    assert parseRange(text) == expected
+
+@pytest.mark.parametrize("text", ["", "@", "abc", "10:x", "~", "20:10", "@5:1"])
+def testParseRangeInvalid(text):
+    with pytest.raises(ThresholdError):
+        parseRange(text)
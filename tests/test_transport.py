@@ -0,0 +1,74 @@
+import pytest
+from snmp_tools.transport import SNMPERR_TIMEOUT, CongestionWindow, RttEstimator, Transport
+
+# A netsnmp session whose get answers with the next of outcomes: a value,
+# an ErrorNum, or an exception to raise
+class ScriptedSession(object):
+    def __init__(self, outcomes, timeout):
+        self.outcomes = outcomes
+        self.Timeout = int(timeout * 1000000)
+        self.Version = 2
+        self.DestHost = "127.0.0.1"
+        self.RemotePort = 161
+        self.ErrorStr = ""
+        self.ErrorNum = 0
+        self.ErrorInd = 0
+
+    def get(self, varlist):
+        outcome = self.outcomes.pop(0)
+        self.ErrorStr, self.ErrorNum = "", 0
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, int):
+            self.ErrorStr, self.ErrorNum = "Timeout", outcome
+            return None
+        return (outcome,)
+
+def scriptedTransport(outcomes, retries=0):
+    created = []
+    def create(timeout):
+        created.append(ScriptedSession(outcomes, timeout))
+        return created[-1]
+    return Transport(create, retries), created
+
+def testSessionReused():
+    transport, created = scriptedTransport([b"a", b"b"])
+    assert transport.request("get", []) == ((b"a",), ("", 0, 0))
+    assert transport.request("get", []) == ((b"b",), ("", 0, 0))
+    assert len(created) == 1
+
+def testSessionReturnedWhenTheCallRaises():
+    transport, created = scriptedTransport([RuntimeError("bindings failed"), b"a"])
+    with pytest.raises(RuntimeError):
+        transport.request("get", [])
+    assert transport.idle == created
+    assert transport.congestion.in_flight == 0
+    assert transport.request("get", []) == ((b"a",), ("", 0, 0))
+    assert len(created) == 1
+
+# A session that timed out may still receive the late answer, the retry
+# goes out on a new one
+def testTimedOutSessionDropped():
+    transport, created = scriptedTransport([SNMPERR_TIMEOUT, b"a"], retries=1)
+    transport.estimator.rto = 0.5
+    assert transport.request("get", []) == ((b"a",), ("", 0, 0))
+    assert len(created) == 2
+    assert transport.idle == created[1:]
+    assert created[1].Timeout == 1000000
+
+def testRttEstimator():
+    estimator = RttEstimator(initial_timeout=1.0, min_timeout=0.05, max_timeout=4.0)
+    estimator.sample(0.1)
+    assert estimator.rto == pytest.approx(0.1 + 4 * 0.05)
+    for attempt in range(5):
+        estimator.backoff()
+    assert estimator.rto == 4.0
+
+def testCongestionWindow():
+    window = CongestionWindow(4)
+    for request in range(4):
+        window.acquire()
+    window.release(timed_out=True)
+    assert window.window == 2.0
+    window.release()
+    assert window.window == 2.5
@@ -0,0 +1,177 @@
+import os
+import numpy
+import pytest
+from snmp_tools import tsdb
+from snmp_tools.tsdb import TimeSeriesStore, readChunk
+
+start = 1700000000.0
+
+@pytest.fixture
+def store(tmp_path):
+    return TimeSeriesStore(str(tmp_path), batch_size=1 << 30, flush_interval=float("inf"))
+
+def testAppendQueryRoundTrip(store):
+    for minute in range(10):
+        store.append("10.0.0.1", "disk", [{"index": 1, "path": "/", "total": 1000, "used": minute * 10},
+                                          {"index": 2, "path": "/var", "total": 2000, "used": minute * 20}],
+                     start + minute * 60)
+    assert store.flush() == 20
+    stamps, values = store.query("10.0.0.1", "disk")
+    assert list(stamps) == [start + minute * 60 for minute in range(10) for index in (1, 2)]
+    assert list(values["index"]) == [1, 2] * 10
+    assert sorted(values) == ["index", "total", "used"]
+    stamps, values = store.query("10.0.0.1", "disk", start + 120, start + 300, index=2)
+    assert list(stamps) == [start + minute * 60 for minute in range(2, 6)]
+    assert list(values["used"]) == [minute * 20.0 for minute in range(2, 6)]
+
+def testAppendAcrossFlushes(store):
+    for second in (0.0, 1.5, 2.25):
+        store.append("h:1161", "load", [{"load1": second, "load5": None}], start + second)
+        store.flush()
+    stamps, values = store.query("h:1161", "load")
+    assert numpy.allclose(stamps, [start, start + 1.5, start + 2.25])
+    assert list(values["load1"]) == [0.0, 1.5, 2.25]
+    assert store.hosts() == ["h:1161"]
+    assert store.metrics("h:1161") == ["load"]
+
+def testOlderRowsAreDropped(store):
+    store.append("h", "load", [{"load1": 1.0}], start + 60)
+    store.flush()
+    store.append("h", "load", [{"load1": 2.0}], start)
+    assert store.flush() == 0
+    stamps, values = store.query("h", "load")
+    assert list(values["load1"]) == [1.0]
+
+def testMissingFieldsAreNan(store):
+    store.append("h", "memory", [{"ram_total": 10, "ram_free": 5}], start)
+    store.append("h", "memory", [{"ram_total": 10}], start + 60)
+    store.flush()
+    path = store.chunkPath("h", "memory", "raw", start)
+    stamps, values = readChunk(path)
+    assert values["ram_total"].tolist() == [10.0, 10.0]
+    assert values["ram_free"][0] == 5.0 and numpy.isnan(values["ram_free"][1])
+
+def testRollup(store):
+    # Aligned to the 5 minute buckets
+    base = 1700000100.0
+    for minute in range(10):
+        store.append("h", "load", [{"load1": float(minute)}], base + minute * 60)
+    store.flush()
+    assert store.rollup(now=base + 86400 * 2) == 1
+    assert store.rollup(now=base + 86400 * 2) == 0
+    stamps, values = store.query("h", "load", resolution="5m")
+    assert list(stamps) == [base, base + 300]
+    assert values["count"].tolist() == [5.0, 5.0]
+    assert values["load1_avg"].tolist() == [2.0, 7.0]
+    assert values["load1_min"].tolist() == [0.0, 5.0]
+    assert values["load1_max"].tolist() == [4.0, 9.0]
+
+def testFieldsAddedLater(store):
+    store.append("h", "disk", [{"index": 1, "total": 100}], start)
+    store.flush()
+    store.append("h", "disk", [{"index": 1, "total": 100, "used": 40}], start + 60)
+    store.append("h", "disk", [{"index": 1, "percent_inodes": 3}], start + 120)
+    assert store.flush() == 2
+    stamps, values = store.query("h", "disk")
+    assert sorted(values) == ["index", "percent_inodes", "total", "used"]
+    assert numpy.allclose(values["total"], [100, 100, numpy.nan], equal_nan=True)
+    assert numpy.allclose(values["used"], [numpy.nan, 40, numpy.nan], equal_nan=True)
+    assert numpy.allclose(values["percent_inodes"], [numpy.nan, numpy.nan, 3], equal_nan=True)
+
+def testFieldsDifferAcrossChunks(store):
+    store.append("h", "load", [{"load1": 1.0}], start)
+    store.append("h", "load", [{"load5": 2.0}], start + 86400)
+    store.flush()
+    stamps, values = store.query("h", "load")
+    assert numpy.allclose(values["load1"], [1.0, numpy.nan], equal_nan=True)
+    assert numpy.allclose(values["load5"], [numpy.nan, 2.0], equal_nan=True)
+
+def testBlockRowsAndDeadlines(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), flush_interval=600.0, block_rows=4)
+    path = store.chunkPath("h", "load", "raw", start)
+    for minute in range(3):
+        store.append("h", "load", [{"load1": float(minute)}], start + minute * 60)
+    assert not os.path.exists(path)
+    store.append("h", "load", [{"load1": 3.0}], start + 180)
+    assert readChunk(path)[1]["load1"].tolist() == [0.0, 1.0, 2.0, 3.0]
+    # The next buffer is written at the latest flush_interval after its first row
+    store.append("h", "load", [{"load1": 4.0}], start + 240)
+    store.append("h", "other", [{"value": 1.0}], start + 240 + 600)
+    assert readChunk(path)[1]["load1"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert store.pending_rows == 1
+
+# The chunks of a host are written together, at the deadline of the first
+def testChunksOfAHostShareTheDeadline(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), flush_interval=600.0)
+    store.append("h", "load", [{"load1": 1.0}], start)
+    store.append("h", "memory", [{"ram_free": 1.0}], start + 5)
+    deadlines = dict((path, deadline) for deadline, sequence, path, buffer in store.deadlines)
+    paths = [store.chunkPath("h", metric, "raw", start) for metric in ("load", "memory")]
+    assert deadlines[paths[0]] == deadlines[paths[1]]
+    assert start + 300 <= deadlines[paths[0]] <= start + 600
+    store.append("g", "load", [{"load1": 1.0}], deadlines[paths[0]])
+    assert all(os.path.exists(path) for path in paths)
+
+def testBatchSizeCapsPendingRows(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), batch_size=3, flush_interval=3600.0)
+    for number in range(5):
+        store.append("h%d" % number, "load", [{"load1": 1.0}], start + number)
+    assert store.pending_rows == 3
+    assert len(store.hosts()) == 2
+    store.flush()
+    assert store.hosts() == ["h0", "h1", "h2", "h3", "h4"]
+
+def testValuesAreCompressed(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), flush_interval=3600.0, block_rows=8)
+    for minute in range(1440):
+        store.append("h", "interface", [{"index": index, "in_octets": 10 ** 9 + index * minute * 7500000,
+                                         "oper_status": 1, "speed": 10 ** 9} for index in range(1, 5)],
+                     start + minute * 60 + minute % 3 * 0.01)
+    store.flush()
+    path = store.chunkPath("h", "interface", "raw", start)
+    rows = 1440 * 4
+    appended = os.path.getsize(path)
+    # Fixed width float64 rows would take 8 bytes of timestamp and index
+    # plus 8 per field
+    assert appended < rows * 32
+    store.rollup(now=start + 86400 * 3)
+    assert os.path.getsize(path) < appended / 4
+    stamps, values = store.query("h", "interface", index=3)
+    assert len(stamps) == 1440
+    assert values["in_octets"][-1] == 10 ** 9 + 3 * 1439 * 7500000
+
+# Chunks of the first format and layout, fixed width rows in a directory
+# per metric, are still queried and rolled up next to the current ones
+def testVersion1Chunk(store, tmp_path):
+    path = os.path.join(str(tmp_path), "h", "load", "raw", "%d.chunk" % (start // 86400 * 86400))
+    os.makedirs(os.path.dirname(path))
+    first = int(start * 1000)
+    row_type = numpy.dtype([("dod", "<i4"), ("index", "<i4"), ("load1", "<f8")])
+    rows = numpy.zeros(2, dtype=row_type)
+    rows["dod"] = [0, 60000]
+    rows["load1"] = [0.5, 0.75]
+    data = tsdb.header_v1.pack(tsdb.magic, 1, 1, 0, 1, first, first + 60000, 60000, 2) + b"load1"
+    with open(path, "wb") as chunk:
+        chunk.write(data + b"\0" * (tsdb.header_size - len(data)) + rows.tobytes())
+    assert readChunk(path)[1]["load1"].tolist() == [0.5, 0.75]
+    store.append("h", "load", [{"load1": 1.0, "load5": 2.0}], start + 120)
+    store.flush()
+    assert store.metrics("h") == ["load"]
+    stamps, values = store.query("h", "load")
+    assert list(stamps) == [start, start + 60, start + 120]
+    assert values["load1"].tolist() == [0.5, 0.75, 1.0]
+    assert numpy.allclose(values["load5"], [numpy.nan, numpy.nan, 2.0], equal_nan=True)
+    assert store.rollup(now=start + 86400 * 2) == 2
+    with open(path, "rb") as chunk:
+        assert tsdb.decodeHeader(chunk.read())["version"] == tsdb.format_version
+    stamps, values = store.query("h", "load", resolution="5m")
+    assert values["count"].tolist() == [2.0, 1.0]
+
+def testChunksOfAHostShareADirectory(store, tmp_path):
+    for metric in ("load", "memory", "cpu.user"):
+        store.append("h", metric, [{"value": 1.0}], start)
+    store.flush()
+    assert os.listdir(os.path.join(str(tmp_path), "h")) == ["raw"]
+    assert len(os.listdir(os.path.join(str(tmp_path), "h", "raw"))) == 3
+    assert store.metrics("h") == ["cpu.user", "load", "memory"]
+    assert [len(store.query("h", metric)[0]) for metric in ("cpu", "cpu.user")] == [0, 1]